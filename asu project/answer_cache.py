@@ -0,0 +1,247 @@
+"""
+Answer cache for context-free chat questions in Lumora AI.
+
+Students often open a chat with the same question in slightly different
+words ("what is normalization in DBMS?", "What's normalisation in dbms").
+``AnswerCache`` keeps recent first-turn answers per language and replays the
+answer of a stored question that asks the same thing, without a model call.
+
+Near misses differ in a single token ("advantages" and "disadvantages",
+"b tree" and "b+ tree", "TCP and UDP" and "UDP and TCP") and still share
+most of their character trigrams, so trigram similarity alone cannot tell
+them apart. A stored question therefore only matches when its content tokens
+(the words left after dropping ``STOPWORDS``, with plural endings and British
+spellings folded by ``canonical_token()``) are the same and in the same
+order. One changed letter inside a longer word is tolerated as a typo, but
+the Jaccard similarity of the trigrams of the content tokens must still be at
+least ``threshold``, which exact matches always reach and a typo only reaches
+in a long question.
+benchmarks/bench_answer_cache.py checks the rule and the threshold against
+paraphrase and near-miss pairs.
+
+Entries expire after ``ttl`` seconds and the oldest entries are evicted once
+``max_entries`` is reached. Each worker keeps its own cache.
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+
+import metrics
+
+ANSWER_CACHE_TOTAL = metrics.Counter('lumora_answer_cache_total', 'Chat answer cache lookups and stores',
+                                     ('result',))
+ANSWER_CACHE_ENTRIES = metrics.Gauge('lumora_answer_cache_entries', 'Chat answers held in the answer cache')
+
+# Words that do not change what an English question asks. Negations, question
+# words and conjunctions are left out on purpose.
+STOPWORDS = frozenset('a an the is are was were be s of in on for to about please me tell can you i '
+                      'do does what define explain'.split())
+
+# Symbols that are part of a term (C++, C#, B+ tree) rather than punctuation
+_TERM_SYMBOLS = '+#'
+
+# Unicode blocks of the scripts used by the supported languages
+_SCRIPT_RANGES = (
+    ('hi', 0x0900, 0x097F),  # Devanagari
+    ('ta', 0x0B80, 0x0BFF),
+    ('te', 0x0C00, 0x0C7F),
+    ('kn', 0x0C80, 0x0CFF),
+    ('ml', 0x0D00, 0x0D7F),
+)
+
+
+def normalize_query(text):
+    """Lowercase, drop punctuation (but not the + and # of terms like C++) and collapse whitespace."""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    # Keep combining marks, which carry vowel signs in Indic scripts
+    text = ''.join(ch if ch.isalnum() or ch in _TERM_SYMBOLS or unicodedata.category(ch).startswith('M') else ' '
+                   for ch in text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+# British spellings folded to American ones (normalisation -> normalization)
+_SPELLING_SUFFIXES = (('isation', 'ization'), ('ising', 'izing'), ('ised', 'ized'), ('ise', 'ize'),
+                      ('yse', 'yze'), ('our', 'or'), ('tre', 'ter'))
+
+
+def canonical_token(word):
+    """Fold a plural ending and British spelling so variants of a word compare equal."""
+    if not word.isalpha() or len(word) < 4:
+        return word
+    if word.endswith('sses'):
+        word = word[:-2]
+    elif word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        word = word[:-1]
+    for british, american in _SPELLING_SUFFIXES:
+        if word.endswith(british) and len(word) >= len(british) + 3:
+            return word[:-len(british)] + american
+    return word
+
+
+def content_tokens(normalized):
+    """Canonical words of a normalized question without stopwords (all words if only stopwords are left)."""
+    words = normalized.split()
+    return tuple(canonical_token(word) for word in words if word not in STOPWORDS) or tuple(words)
+
+
+def same_token(a, b):
+    """Whether two canonical content tokens match: equal, or one letter apart in a longer word (a typo)."""
+    if a == b:
+        return True
+    # Never the first letter nor a change of length, so dis-/un-/a- prefixes and C/C++ stay apart
+    return (len(a) == len(b) >= 6 and a[0] == b[0] and a.isalpha() and b.isalpha()
+            and sum(x != y for x, y in zip(a, b)) == 1)
+
+
+def match_score(tokens, other_tokens):
+    """Trigram Jaccard similarity of two content token tuples, or None when they ask different things."""
+    if len(tokens) != len(other_tokens) or not all(map(same_token, tokens, other_tokens)):
+        return None
+    query_shingles, other_shingles = shingles(' '.join(tokens)), shingles(' '.join(other_tokens))
+    overlap = len(query_shingles & other_shingles)
+    return overlap / (len(query_shingles) + len(other_shingles) - overlap)
+
+
+def detect_language(text):
+    """Guess the language partition from the dominant script ('en' for Latin and others)."""
+    counts = Counter()
+    for ch in text:
+        code = ord(ch)
+        for language, low, high in _SCRIPT_RANGES:
+            if low <= code <= high:
+                counts[language] += 1
+                break
+    if not counts:
+        return 'en'
+    return counts.most_common(1)[0][0]
+
+
+def shingles(normalized, size=3):
+    """Character shingles of the normalized text, padded so short words still count."""
+    padded = f' {normalized} '
+    if len(padded) <= size:
+        return frozenset([padded])
+    return frozenset(padded[i:i + size] for i in range(len(padded) - size + 1))
+
+
+class _Entry:
+    __slots__ = ('query', 'tokens', 'shingles', 'answer', 'created')
+
+    def __init__(self, query, tokens, answer, created):
+        self.query = query
+        self.tokens = tokens
+        self.shingles = shingles(' '.join(tokens))
+        self.answer = answer
+        self.created = created
+
+
+class _Partition:
+    """Entries of one language with an inverted shingle index."""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # normalized query -> _Entry, oldest first
+        self.postings = {}  # shingle -> set of normalized queries
+
+    def add(self, entry):
+        self.remove(entry.query)
+        self.entries[entry.query] = entry
+        for shingle in entry.shingles:
+            self.postings.setdefault(shingle, set()).add(entry.query)
+
+    def remove(self, query):
+        entry = self.entries.pop(query, None)
+        if entry is None:
+            return
+        for shingle in entry.shingles:
+            queries = self.postings.get(shingle)
+            if queries is not None:
+                queries.discard(query)
+                if not queries:
+                    del self.postings[shingle]
+
+
+class AnswerCache:
+    """TTL-bounded similarity cache of chat answers, partitioned by language."""
+
+    def __init__(self, threshold=0.9, ttl=86400, max_entries=2000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._partitions = {}
+        self._size = 0
+
+    def lookup(self, question, language=None, now=None):
+        """Return ``(answer, similarity)`` for the closest cached question, or None."""
+        now = now or time.time()
+        normalized = normalize_query(question)
+        if not normalized:
+            return None
+        language = language or detect_language(question)
+        tokens = content_tokens(normalized)
+        query_shingles = shingles(' '.join(tokens))
+        with self._lock:
+            partition = self._partitions.get(language)
+            if partition is None:
+                ANSWER_CACHE_TOTAL.inc('miss')
+                return None
+            candidates = [partition.entries[normalized]] if normalized in partition.entries else []
+            if not candidates:
+                overlaps = Counter()
+                for shingle in query_shingles:
+                    overlaps.update(partition.postings.get(shingle, ()))
+                candidates = [partition.entries[query] for query, _count in overlaps.most_common(20)]
+            best, best_score = None, 0.0
+            for entry in candidates:
+                if now - entry.created > self.ttl:
+                    partition.remove(entry.query)
+                    self._size -= 1
+                    ANSWER_CACHE_ENTRIES.set(self._size)
+                    continue
+                score = match_score(tokens, entry.tokens)
+                if score is not None and score > best_score:
+                    best, best_score = entry, score
+            if best is None or best_score < self.threshold:
+                ANSWER_CACHE_TOTAL.inc('miss')
+                return None
+        ANSWER_CACHE_TOTAL.inc('hit')
+        return best.answer, best_score
+
+    def store(self, question, answer, language=None, now=None):
+        """Remember ``answer`` for ``question``."""
+        normalized = normalize_query(question)
+        if not normalized or not answer:
+            return
+        language = language or detect_language(question)
+        entry = _Entry(normalized, content_tokens(normalized), answer, now or time.time())
+        with self._lock:
+            partition = self._partitions.setdefault(language, _Partition())
+            if normalized in partition.entries:
+                self._size -= 1
+            partition.add(entry)
+            self._size += 1
+            while self._size > self.max_entries:
+                self._evict_oldest_locked()
+            ANSWER_CACHE_ENTRIES.set(self._size)
+        ANSWER_CACHE_TOTAL.inc('store')
+
+    def _evict_oldest_locked(self):
+        oldest = None
+        for partition in self._partitions.values():
+            if partition.entries:
+                entry = next(iter(partition.entries.values()))
+                if oldest is None or entry.created < oldest[1].created:
+                    oldest = (partition, entry)
+        if oldest is None:
+            self._size = 0
+            return
+        oldest[0].remove(oldest[1].query)
+        self._size -= 1
+
+    def clear(self):
+        with self._lock:
+            self._partitions = {}
+            self._size = 0
+        ANSWER_CACHE_ENTRIES.set(0)
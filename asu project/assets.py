@@ -0,0 +1,174 @@
+"""
+Static asset pipeline for Lumora AI.
+
+``AssetManifest.build()`` runs at startup over every file in static/: CSS is
+minified, each file is fingerprinted with a hash of its content
+(``style.css`` -> ``style.1a2b3c4d5e.css``) and precompressed with gzip and,
+when the optional ``brotli`` package is installed, Brotli. Templates link
+assets with ``asset_url()`` and ``/assets/<name>`` serves the smallest
+encoding the browser accepts with a one-year immutable cache lifetime, so
+repeat page loads fetch nothing until a file changes.
+
+JavaScript is fingerprinted and compressed but not minified; without a JS
+parser, rewriting it is not safe, and compression removes most of the
+whitespace cost anyway.
+
+``python assets.py <output_dir>`` writes the fingerprinted files, their
+``.gz``/``.br`` variants and a manifest.json for serving from a reverse proxy.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+import threading
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Files smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE = re.compile(r'\s+')
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+_CSS_DECLARATION = re.compile(r'([{;][\w-]+):\s+')
+
+
+def minify_css(text):
+    """Drop comments and whitespace that CSS does not need."""
+    text = _CSS_COMMENT.sub('', text)
+    text = _CSS_SPACE.sub(' ', text)
+    text = _CSS_PUNCTUATION.sub(r'\1', text)
+    text = _CSS_DECLARATION.sub(r'\1:', text)
+    return text.replace(';}', '}').strip()
+
+
+class Asset:
+    """One fingerprinted file and its encodings."""
+
+    __slots__ = ('source', 'name', 'mimetype', 'etag', 'mtime', 'variants')
+
+    def __init__(self, source, name, mimetype, etag, mtime, variants):
+        self.source = source
+        self.name = name
+        self.mimetype = mimetype
+        self.etag = etag
+        self.mtime = mtime
+        self.variants = variants  # encoding -> bytes, 'identity' always present
+
+    def negotiate(self, accept_encoding):
+        """Pick the smallest variant allowed by an Accept-Encoding header."""
+        accepted = set()
+        for item in (accept_encoding or '').split(','):
+            coding, _, params = item.strip().partition(';')
+            if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+                continue
+            accepted.add(coding.strip().lower())
+        best = 'identity'
+        for encoding, body in self.variants.items():
+            if encoding in accepted and len(body) < len(self.variants[best]):
+                best = encoding
+        return best
+
+
+def fingerprint_name(relative_path, digest):
+    root, ext = os.path.splitext(relative_path)
+    return f'{root}.{digest}{ext}'
+
+
+def build_asset(static_dir, relative_path):
+    source = os.path.join(static_dir, relative_path)
+    mtime = os.path.getmtime(source)
+    with open(source, 'rb') as asset_file:
+        body = asset_file.read()
+    mimetype = mimetypes.guess_type(relative_path)[0] or 'application/octet-stream'
+    if mimetype == 'text/css':
+        body = minify_css(body.decode('utf-8')).encode('utf-8')
+    digest = hashlib.sha256(body).hexdigest()[:10]
+    variants = {'identity': body}
+    if len(body) >= MIN_COMPRESS_BYTES and mimetype.startswith(COMPRESSIBLE_TYPES):
+        variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+        if BROTLI_AVAILABLE:
+            variants['br'] = brotli.compress(body, quality=11)
+    name = fingerprint_name(relative_path.replace(os.sep, '/'), digest)
+    return Asset(source, name, mimetype, f'"{digest}"', mtime, variants)
+
+
+class AssetManifest:
+    """Fingerprinted, precompressed copies of the files in a static directory."""
+
+    def __init__(self, static_dir):
+        self.static_dir = static_dir
+        self._lock = threading.Lock()
+        self._by_source = {}  # path relative to static_dir -> Asset
+        self._by_name = {}  # fingerprinted name -> Asset
+        self.version = 0  # bumped whenever a fingerprint changes
+
+    def build(self):
+        """(Re)build every asset whose file is new or changed since the last build."""
+        seen = set()
+        for root, _dirs, files in os.walk(self.static_dir):
+            for filename in files:
+                relative_path = os.path.relpath(os.path.join(root, filename), self.static_dir).replace(os.sep, '/')
+                seen.add(relative_path)
+                current = self._by_source.get(relative_path)
+                try:
+                    if current is not None and os.path.getmtime(current.source) == current.mtime:
+                        continue
+                    asset = build_asset(self.static_dir, relative_path)
+                except (OSError, UnicodeDecodeError) as e:
+                    print(f"Error building static asset {relative_path}: {str(e)}")
+                    continue
+                with self._lock:
+                    if current is None or current.name != asset.name:
+                        self.version += 1
+                    self._by_source[relative_path] = asset
+                    self._by_name[asset.name] = asset
+        with self._lock:
+            for relative_path in set(self._by_source) - seen:
+                del self._by_source[relative_path]
+                self.version += 1
+        return self
+
+    def name_for(self, relative_path):
+        """Fingerprinted name of a static file, or None if it is not in the manifest."""
+        asset = self._by_source.get(relative_path)
+        return asset.name if asset is not None else None
+
+    def get(self, name):
+        return self._by_name.get(name)
+
+    def manifest(self):
+        return {source: asset.name for source, asset in sorted(self._by_source.items())}
+
+    def write(self, output_dir):
+        """Write every asset and its compressed variants under ``output_dir``."""
+        suffixes = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+        for asset in self._by_source.values():
+            path = os.path.join(output_dir, asset.name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            for encoding, body in asset.variants.items():
+                with open(path + suffixes[encoding], 'wb') as output:
+                    output.write(body)
+        with open(os.path.join(output_dir, 'manifest.json'), 'w') as output:
+            json.dump(self.manifest(), output, indent=2)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print('Usage: python assets.py <output_dir>')
+        sys.exit(2)
+    assets = AssetManifest(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')).build()
+    assets.write(sys.argv[1])
+    for source, name in assets.manifest().items():
+        asset = assets.get(name)
+        sizes = ', '.join(f'{encoding} {len(body)}' for encoding, body in asset.variants.items())
+        print(f'{source} -> {name} ({sizes})')
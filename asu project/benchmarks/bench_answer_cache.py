@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Answer cache matching on paraphrases and near misses.
+
+Stores the first question of each pair in an AnswerCache and looks up the
+second. Paraphrases should hit; near misses (one word negated, C vs C++,
+swapped operands, a different language or data structure) must not, since
+they would replay a wrong answer. Questions with a one-letter typo are
+the only pairs whose outcome depends on the threshold: a typo should count
+for less in a short question than in a long one.
+
+For each pair it prints the trigram similarity of the whole questions (the
+old matching rule) next to the score of answer_cache.match_score(), then
+sweeps the threshold and reports hits on all three sets for each value.
+Fails (exit code 1) if --threshold (default: AnswerCache's) misses a
+paraphrase or hits a near miss.
+
+Usage:
+    python benchmarks/bench_answer_cache.py --threshold 0.9
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_cache import AnswerCache, content_tokens, match_score, normalize_query, shingles  # noqa: E402
+from common import save_results  # noqa: E402
+
+PARAPHRASES = [
+    ("what is normalization in DBMS?", "What's normalisation in dbms"),
+    ("What is a primary key?", "what is primary key"),
+    ("Explain deadlock in operating systems", "explain deadlock in operating system"),
+    ("what is polymorphism in java", "What is polymorphism in Java?"),
+    ("difference between TCP and UDP", "Difference between TCP and UDP?"),
+    ("what are the advantages of linked list over array", "advantages of linked lists over arrays"),
+    ("what is a b+ tree", "What is B+ tree?"),
+    ("what is recursion", "what's recursion"),
+    ("Define time complexity of binary search", "what is the time complexity of binary search"),
+    ("can you explain the OSI model", "explain OSI model"),
+    ("what is a process and a thread", "what are processes and threads"),
+    ("डेटाबेस सामान्यीकरण क्या है?", "डेटाबेस सामान्यीकरण क्या है"),
+    ("இயக்க முறைமை என்றால் என்ன", "இயக்க முறைமை என்றால் என்ன?"),
+]
+
+NEAR_MISSES = [
+    ("advantages of linked list over array", "disadvantages of linked list over array"),
+    ("b tree", "b+ tree"),
+    ("what is c", "what is c++"),
+    ("what is c++", "what is c#"),
+    ("difference between TCP and UDP", "difference between UDP and TCP"),
+    ("what is a stable sorting algorithm", "what is an unstable sorting algorithm"),
+    ("why is TCP reliable", "why is UDP unreliable"),
+    ("what is normalization", "what is denormalization"),
+    ("what is a deadlock", "what is a livelock"),
+    ("what is inheritance in java", "what is inheritance in python"),
+    ("what is a binary tree", "what is a binary search tree"),
+    ("time complexity of merge sort", "space complexity of merge sort"),
+    ("what is ipv4", "what is ipv6"),
+    ("how does a stack work", "why does a stack work"),
+    ("is java compiled or interpreted", "is java compiled and interpreted"),
+]
+
+TYPOS = [
+    ("what is polymorphism in java", "what is polymorphysm in java"),
+    ("explain normalization", "explain normalizatoin"),
+    ("explain the difference between process synchronization and thread synchronization in operating systems",
+     "explain the difference between process synchronization and thread synchronisation in operating sistems"),
+    ("what are the advantages and disadvantages of dynamic programming compared to greedy algorithms",
+     "what are the advantages and disadvantages of dynamic programming compared to greedy algoritms"),
+]
+
+THRESHOLDS = (0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1.0)
+
+
+def trigram_similarity(question, other):
+    """Jaccard similarity of the trigrams of two whole normalized questions."""
+    question_shingles, other_shingles = shingles(normalize_query(question)), shingles(normalize_query(other))
+    overlap = len(question_shingles & other_shingles)
+    return overlap / (len(question_shingles) + len(other_shingles) - overlap)
+
+
+def cache_hits(pairs, threshold):
+    """Pairs whose second question hits the first one's answer in an AnswerCache."""
+    hits = []
+    for stored, asked in pairs:
+        cache = AnswerCache(threshold=threshold)
+        cache.store(stored, 'answer')
+        if cache.lookup(asked) is not None:
+            hits.append((stored, asked))
+    return hits
+
+
+def describe(pairs):
+    rows = []
+    for stored, asked in pairs:
+        score = match_score(content_tokens(normalize_query(stored)), content_tokens(normalize_query(asked)))
+        rows.append({'stored': stored, 'asked': asked,
+                     'trigram_similarity': round(trigram_similarity(stored, asked), 3),
+                     'match_score': None if score is None else round(score, 3)})
+        print(f"  {rows[-1]['trigram_similarity']:>6}  {str(rows[-1]['match_score']):>6}  {stored!r} / {asked!r}")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threshold', type=float, default=AnswerCache().threshold)
+    parser.add_argument('--output', help='results file (default: benchmarks/results/answer-cache-<time>.json)')
+    args = parser.parse_args(argv)
+
+    print('paraphrases (trigram similarity, match score; None = content tokens differ)')
+    paraphrases = describe(PARAPHRASES)
+    print('near misses')
+    near_misses = describe(NEAR_MISSES)
+    print('typos')
+    typos = describe(TYPOS)
+    print(f"near misses that trigram similarity alone would serve at 0.85: "
+          f"{sum(row['trigram_similarity'] >= 0.85 for row in near_misses)} of {len(near_misses)}")
+
+    print('threshold  paraphrase hits  near-miss hits  typo hits')
+    sweep = {}
+    for threshold in sorted(set(THRESHOLDS) | {args.threshold}):
+        counts = {'paraphrase_hits': len(cache_hits(PARAPHRASES, threshold)),
+                  'near_miss_hits': len(cache_hits(NEAR_MISSES, threshold)),
+                  'typo_hits': len(cache_hits(TYPOS, threshold))}
+        sweep[threshold] = counts
+        marker = '  <- --threshold' if threshold == args.threshold else ''
+        print(f"{threshold:>9}  {counts['paraphrase_hits']:>8} of {len(PARAPHRASES):<4} "
+              f"{counts['near_miss_hits']:>7} of {len(NEAR_MISSES):<4} "
+              f"{counts['typo_hits']:>5} of {len(TYPOS)}{marker}")
+
+    missed = [pair for pair in PARAPHRASES if pair not in cache_hits(PARAPHRASES, args.threshold)]
+    wrong = cache_hits(NEAR_MISSES, args.threshold)
+    for stored, asked in missed:
+        print(f"missed paraphrase: {stored!r} / {asked!r}")
+    for stored, asked in wrong:
+        print(f"wrong answer: {stored!r} / {asked!r}")
+    results = {'threshold': args.threshold, 'paraphrases': paraphrases, 'near_misses': near_misses, 'typos': typos,
+               'sweep': {str(threshold): counts for threshold, counts in sweep.items()},
+               'missed_paraphrases': missed, 'near_miss_hits': wrong}
+    print(f"Results saved to {save_results('answer-cache', results, args.output)}")
+    return 1 if missed or wrong else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
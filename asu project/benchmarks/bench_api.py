@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark for every Lumora AI API route.
+
+Starts the app under gunicorn with the stub model and stub TTS, drives each
+route at the requested concurrency and reports req/s, p50/p95/p99 latency,
+time to first SSE token for /api/chat (first item for the streaming generator
+routes) and RSS per worker. Results are saved as
+JSON under benchmarks/results/ so runs can be compared over time.
+
+Chat sessions live in each worker's memory, so with several workers the
+session_messages route reports 404s for sessions created on another worker;
+run it with --workers 1 for a clean measurement.
+
+Usage:
+    python benchmarks/bench_api.py --concurrency 8 --requests 200
+    python benchmarks/bench_api.py --routes chat,gtts_speak --compare benchmarks/results/api-....json
+    python benchmarks/bench_api.py --url http://127.0.0.1:5000   # existing server
+    python benchmarks/bench_api.py --routes mcqs,mcqs_stream --stub-token-delay-ms 50
+"""
+import argparse
+import io
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from common import (BENCH_PASSWORD, BENCH_USER, latency_summary, load_results, save_results,
+                    start_server, stop_server, stub_env, worker_memory)
+
+SAMPLE_CONTENT = (
+    "Database normalization is the process of structuring a relational database to reduce "
+    "data redundancy and improve data integrity. First normal form requires atomic values. "
+    "Second normal form removes partial dependencies on a composite key. Third normal form "
+    "removes transitive dependencies between non-key attributes. Boyce-Codd normal form is a "
+    "stricter version of the third normal form used in practice."
+)
+
+
+class Client:
+    """One logged-in benchmark user with its own cookie jar."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.http = requests.Session()
+        response = self.http.post(f'{base_url}/login', json={'username': BENCH_USER, 'password': BENCH_PASSWORD})
+        response.raise_for_status()
+        if not response.json().get('success'):
+            raise RuntimeError('benchmark login failed')
+        self.session_id = None
+
+    def url(self, path):
+        return f'{self.base_url}{path}'
+
+
+def run_chat(client):
+    """POST /api/chat and read the SSE stream; returns time to first token."""
+    started = time.perf_counter()
+    first_token = None
+    with client.http.post(client.url('/api/chat'), json={
+        'message': 'Explain normalization in DBMS',
+        'session_id': client.session_id,
+    }, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line.startswith(b'data: '):
+                continue
+            if first_token is None and b'"token"' in line:
+                first_token = time.perf_counter() - started
+            if b'"type": "start"' in line and client.session_id is None:
+                client.session_id = line.split(b'"session_id": "')[1].split(b'"')[0].decode()
+            if b'"type": "error"' in line:
+                raise RuntimeError(line.decode())
+    return first_token
+
+
+def run_upload(client):
+    files = {'file': ('notes.txt', io.BytesIO(SAMPLE_CONTENT.encode() * 20), 'text/plain')}
+    client.http.post(client.url('/api/upload'), files=files).raise_for_status()
+
+
+def run_flashcards(client):
+    client.http.post(client.url('/api/generate-flashcards'), json={'content': SAMPLE_CONTENT}).raise_for_status()
+
+
+def run_mcqs(client):
+    client.http.post(client.url('/api/generate-mcqs'), json={'content': SAMPLE_CONTENT, 'count': 5}).raise_for_status()
+
+
+def run_youtube(client):
+    client.http.post(client.url('/api/youtube-suggestions'), json={'topic': 'DBMS normalization'}).raise_for_status()
+
+
+def run_item_stream(client, path, body):
+    """POST a streaming generator route and read its SSE frames; returns time to the first item."""
+    started = time.perf_counter()
+    first_item = None
+    with client.http.post(client.url(path), json=body, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line.startswith(b'data: '):
+                continue
+            if first_item is None and b'"index"' in line:
+                first_item = time.perf_counter() - started
+            if b'"type": "error"' in line:
+                raise RuntimeError(line.decode())
+    return first_item
+
+
+def run_flashcards_stream(client):
+    return run_item_stream(client, '/api/generate-flashcards/stream', {'content': SAMPLE_CONTENT})
+
+
+def run_mcqs_stream(client):
+    return run_item_stream(client, '/api/generate-mcqs/stream', {'content': SAMPLE_CONTENT, 'count': 5})
+
+
+def run_youtube_stream(client):
+    return run_item_stream(client, '/api/youtube-suggestions/stream', {'topic': 'DBMS normalization'})
+
+
+def run_voice_chat(client):
+    client.http.post(client.url('/api/voice-chat'), json={
+        'message': 'What is a primary key?', 'session_id': f'bench-{id(client)}', 'language': 'en'
+    }).raise_for_status()
+
+
+def run_gtts_speak(client):
+    response = client.http.post(client.url('/api/gtts-speak'), json={
+        'text': 'A primary key uniquely identifies each row in a table.', 'language': 'en'
+    })
+    response.raise_for_status()
+    if response.headers.get('Content-Type', '').split(';')[0] != 'audio/mpeg':
+        raise RuntimeError('unexpected TTS content type')
+
+
+def run_voice_turn(client):
+    """POST /api/voice-turn and read the framed stream; the first audio frame counts as the first token."""
+    started = time.perf_counter()
+    first_audio = None
+    with client.http.post(client.url('/api/voice-turn'), json={
+        'message': 'What is a primary key?', 'session_id': f'bench-{id(client)}', 'language': 'en'
+    }, stream=True) as response:
+        response.raise_for_status()
+        raw = response.raw
+        while True:
+            header = raw.read(5)
+            if len(header) < 5:
+                break
+            payload = raw.read(int.from_bytes(header[1:], 'big'))
+            if header[:1] == b'A' and first_audio is None:
+                first_audio = time.perf_counter() - started
+            elif header[:1] == b'J' and b'"type": "error"' in payload:
+                raise RuntimeError(payload.decode())
+    return first_audio
+
+
+def run_sessions_list(client):
+    client.http.get(client.url('/api/sessions')).raise_for_status()
+
+
+def run_sessions_create(client):
+    client.http.post(client.url('/api/sessions')).raise_for_status()
+
+
+def run_session_messages(client):
+    if client.session_id is None:
+        run_chat(client)
+    client.http.get(client.url(f'/api/sessions/{client.session_id}/messages')).raise_for_status()
+
+
+ROUTES = {
+    'chat': run_chat,
+    'upload': run_upload,
+    'flashcards': run_flashcards,
+    'mcqs': run_mcqs,
+    'youtube': run_youtube,
+    'flashcards_stream': run_flashcards_stream,
+    'mcqs_stream': run_mcqs_stream,
+    'youtube_stream': run_youtube_stream,
+    'voice_chat': run_voice_chat,
+    'gtts_speak': run_gtts_speak,
+    'voice_turn': run_voice_turn,
+    'sessions_list': run_sessions_list,
+    'sessions_create': run_sessions_create,
+    'session_messages': run_session_messages,
+}
+
+
+def bench_route(base_url, name, concurrency, total_requests):
+    """Run ``total_requests`` calls of one route across ``concurrency`` clients."""
+    action = ROUTES[name]
+    clients = [Client(base_url) for _ in range(concurrency)]
+    latencies = []
+    first_tokens = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def worker(client):
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            started = time.perf_counter()
+            try:
+                ttft = action(client)
+            except Exception as exc:  # Count and keep going; one failure should not end the run
+                with lock:
+                    errors.append(str(exc)[:200])
+                continue
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if ttft is not None:
+                    first_tokens.append(ttft)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, clients))
+    duration = time.perf_counter() - started
+
+    result = {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'duration_s': round(duration, 3),
+        'req_per_s': round(len(latencies) / duration, 2) if duration else 0.0,
+        'latency': latency_summary(latencies),
+    }
+    if first_tokens:
+        result['time_to_first_token'] = latency_summary(first_tokens)
+    if errors:
+        result['sample_errors'] = errors[:5]
+    return result
+
+
+def print_report(results, baseline=None):
+    """Print a table of route results, with deltas against ``baseline``."""
+    header = f"{'route':<18}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ttft p50':>10}{'errors':>8}"
+    print(header)
+    print('-' * len(header))
+    for name, route in results['routes'].items():
+        ttft = route.get('time_to_first_token', {}).get('p50_ms', '')
+        line = (f"{name:<18}{route['req_per_s']:>10}{route['latency']['p50_ms']:>10}"
+                f"{route['latency']['p95_ms']:>10}{route['latency']['p99_ms']:>10}{ttft:>10}{route['errors']:>8}")
+        previous = (baseline or {}).get('routes', {}).get(name)
+        if previous and previous.get('req_per_s'):
+            change = (route['req_per_s'] - previous['req_per_s']) / previous['req_per_s'] * 100
+            line += f"   ({change:+.1f}% req/s vs baseline)"
+        print(line)
+    print()
+    for pid, memory in sorted(results.get('worker_memory', {}).items()):
+        print(f"worker {pid}: RSS {memory.get('rss_kb', 0) / 1024:.1f} MiB"
+              + (f", PSS {memory['pss_kb'] / 1024:.1f} MiB" if 'pss_kb' in memory else ''))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--routes', default=','.join(ROUTES), help='comma-separated routes to run')
+    parser.add_argument('--concurrency', type=int, default=4, help='concurrent clients per route')
+    parser.add_argument('--requests', type=int, default=100, help='requests per route')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--worker-class', default='sync', help='gunicorn worker class')
+    parser.add_argument('--threads', type=int, default=1, help='threads per gunicorn worker')
+    parser.add_argument('--stub-words', type=int, default=200, help='words per stub chat answer')
+    parser.add_argument('--stub-latency-ms', type=float, default=0, help='stub model latency')
+    parser.add_argument('--stub-token-delay-ms', type=float, default=0, help='stub model delay between chunks')
+    parser.add_argument('--stub-tts-latency-ms', type=float, default=0, help='stub TTS latency')
+    parser.add_argument('--url', help='benchmark an already running server instead of starting one')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/api-<time>.json)')
+    parser.add_argument('--compare', help='previous results file to compare against')
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.routes.split(',') if name.strip()]
+    unknown = [name for name in names if name not in ROUTES]
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)}")
+
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'compare')}
+    results = {'config': config, 'routes': {}}
+    server = None
+    base_url = args.url
+    if not base_url:
+        server, base_url = start_server(args.workers, args.worker_class, args.threads, env=stub_env({
+            'STUB_LLM_RESPONSE_WORDS': str(args.stub_words),
+            'STUB_LLM_LATENCY_MS': str(args.stub_latency_ms),
+            'STUB_LLM_TOKEN_DELAY_MS': str(args.stub_token_delay_ms),
+            'STUB_TTS_LATENCY_MS': str(args.stub_tts_latency_ms),
+        }))
+    try:
+        for name in names:
+            print(f"Running {name} ({args.requests} requests, concurrency {args.concurrency})...", flush=True)
+            results['routes'][name] = bench_route(base_url, name, args.concurrency, args.requests)
+        if server:
+            results['worker_memory'] = worker_memory(server)
+    finally:
+        if server:
+            stop_server(server)
+
+    path = save_results('api', results, args.output)
+    print()
+    print_report(results, load_results(args.compare) if args.compare else None)
+    print(f"\nResults saved to {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
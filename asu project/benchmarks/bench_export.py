@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Worker memory while exporting and importing chat sessions as NDJSON.
+
+Starts one gunicorn worker with the stub model, imports --sessions sessions
+of --messages-per-session messages through /api/sessions/import, then
+streams /api/sessions/export while sampling the worker's RSS. Reports the
+RSS growth during each phase next to the size of the export.
+
+Usage:
+    python benchmarks/bench_export.py --sessions 500 --messages-per-session 20
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from common import (BENCH_PASSWORD, BENCH_USER, child_pids, memory_kb, save_results, start_server, stop_server,
+                    stub_env)
+
+SAMPLE_ANSWER = (
+    "**1. Normal Forms** • **First normal form:** every column holds atomic values and every row is "
+    "unique. • **Second normal form:** no attribute depends on part of a composite key. • **Third "
+    "normal form:** no attribute depends on another non-key attribute. "
+) * 4
+
+
+def export_lines(sessions, messages_per_session):
+    yield json.dumps({'type': 'export', 'version': 1, 'user': BENCH_USER, 'blobs': 'inline'}) + '\n'
+    for session in range(sessions):
+        session_id = f'{session:016x}'
+        yield json.dumps({'type': 'session', 'id': session_id, 'title': f'Question {session}',
+                          'created_at': '2025-01-01T10:00:00'}) + '\n'
+        for message in range(messages_per_session):
+            role = 'user' if message % 2 == 0 else 'assistant'
+            content = f'Question {session}.{message} about normalization?' if role == 'user' else SAMPLE_ANSWER
+            yield json.dumps({'type': 'message', 'session_id': session_id, 'role': role, 'content': content,
+                              'timestamp': '2025-01-01T10:00:00'}) + '\n'
+
+
+class RssSampler(threading.Thread):
+    """Track the peak RSS of a process while running."""
+
+    def __init__(self, pid, interval=0.01):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = memory_kb(pid).get('rss_kb', 0)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak_kb = max(self.peak_kb, memory_kb(self.pid).get('rss_kb', 0))
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak_kb
+
+
+def measure(pid, action):
+    before = memory_kb(pid).get('rss_kb', 0)
+    sampler = RssSampler(pid)
+    sampler.start()
+    started = time.perf_counter()
+    result = action()
+    elapsed = time.perf_counter() - started
+    peak = sampler.stop()
+    return result, {'rss_before_kb': before, 'rss_peak_kb': peak, 'rss_growth_kb': peak - before,
+                    'seconds': round(elapsed, 2)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--messages-per-session', type=int, default=20)
+    parser.add_argument('--output', help='results file (default: benchmarks/results/export-<time>.json)')
+    args = parser.parse_args(argv)
+
+    spill_dir = tempfile.mkdtemp(prefix='lumora-bench-')
+    server, base_url = start_server(workers=1, env=stub_env({
+        'SESSION_SPILL_PATH': os.path.join(spill_dir, 'sessions.db'),
+        'USAGE_DB_PATH': os.path.join(spill_dir, 'usage.db'),
+    }))
+    try:
+        pid = child_pids(server.pid)[0]
+        http = requests.Session()
+        http.post(f'{base_url}/login', json={'username': BENCH_USER, 'password': BENCH_PASSWORD}).raise_for_status()
+
+        body = ''.join(export_lines(args.sessions, args.messages_per_session)).encode('utf-8')
+        imported, import_stats = measure(pid, lambda: http.post(
+            f'{base_url}/api/sessions/import', data=body, headers={'Content-Type': 'application/x-ndjson'}
+        ).json())
+        print(f"Imported {imported.get('sessions')} sessions / {imported.get('messages')} messages "
+              f"({len(body) / 1e6:.1f} MB) in {import_stats['seconds']}s, "
+              f"RSS +{import_stats['rss_growth_kb'] / 1024:.1f} MB")
+
+        def export():
+            size = 0
+            with http.get(f'{base_url}/api/sessions/export', stream=True) as response:
+                for chunk in response.iter_content(64 * 1024):
+                    size += len(chunk)
+            return size
+
+        exported_bytes, export_stats = measure(pid, export)
+        print(f"Exported {exported_bytes / 1e6:.1f} MB in {export_stats['seconds']}s, "
+              f"RSS +{export_stats['rss_growth_kb'] / 1024:.1f} MB")
+    finally:
+        stop_server(server)
+
+    results = {
+        'sessions': args.sessions,
+        'messages': args.sessions * args.messages_per_session,
+        'import_bytes': len(body),
+        'export_bytes': exported_bytes,
+        'import': import_stats,
+        'export': export_stats,
+    }
+    print(f"Results saved to {save_results('export', results, args.output)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Memory held by chat history: slot records against the old dict layout.
+
+Builds the same conversation twice, once as the dicts chat sessions used to
+hold (uuid4 string ids, ISO timestamp strings, empty attachment keys) and
+once as chat_store.ChatSession/Message records, and reports the bytes
+allocated for each with tracemalloc. Message text is created up front so
+only the per-message overhead is compared.
+
+Usage:
+    python benchmarks/bench_memory.py --messages 100000 --per-session 50
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_store import ChatSession, Message  # noqa: E402
+from common import save_results  # noqa: E402
+
+
+def build_dicts(contents, per_session, user):
+    sessions = {}
+    for start in range(0, len(contents), per_session):
+        session_id = str(uuid.uuid4())
+        messages = []
+        for offset, content in enumerate(contents[start:start + per_session]):
+            if offset % 2 == 0:
+                messages.append({
+                    'id': str(uuid.uuid4()),
+                    'role': 'user',
+                    'content': content,
+                    'timestamp': datetime.now().isoformat(),
+                    'image': None,
+                    'document_content': None,
+                    'filename': ''
+                })
+            else:
+                messages.append({
+                    'id': str(uuid.uuid4()),
+                    'role': 'assistant',
+                    'content': content,
+                    'timestamp': datetime.now().isoformat()
+                })
+        sessions[session_id] = {
+            'id': session_id,
+            'title': contents[start][:50],
+            'messages': messages,
+            'created_at': datetime.now().isoformat(),
+            'user': user
+        }
+    return sessions
+
+
+def build_records(contents, per_session, user):
+    sessions = {}
+    for start in range(0, len(contents), per_session):
+        chat_session = ChatSession(user, title=contents[start][:50])
+        chat_session.messages = [
+            Message('user' if offset % 2 == 0 else 'assistant', content)
+            for offset, content in enumerate(contents[start:start + per_session])
+        ]
+        sessions[chat_session.id] = chat_session
+    return sessions
+
+
+def measure(builder, contents, per_session):
+    # A fresh user string per run, as it would arrive from the login form
+    user = ''.join(['Hemach', 'andaran'])
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    sessions = builder(contents, per_session, user)
+    elapsed = time.perf_counter() - started
+    allocated, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del sessions
+    return allocated, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--per-session', type=int, default=50, help='messages per chat session')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/memory-<time>.json)')
+    args = parser.parse_args(argv)
+
+    contents = [f'message {i} about normalization and indexing' for i in range(args.messages)]
+    dict_bytes, dict_seconds = measure(build_dicts, contents, args.per_session)
+    record_bytes, record_seconds = measure(build_records, contents, args.per_session)
+
+    results = {
+        'messages': args.messages,
+        'per_session': args.per_session,
+        'dict_bytes': dict_bytes,
+        'record_bytes': record_bytes,
+        'dict_bytes_per_message': round(dict_bytes / args.messages, 1),
+        'record_bytes_per_message': round(record_bytes / args.messages, 1),
+        'saving_ratio': round(dict_bytes / record_bytes, 2) if record_bytes else None,
+        'dict_build_seconds': round(dict_seconds, 3),
+        'record_build_seconds': round(record_seconds, 3),
+    }
+    print(f"{'layout':<10}{'MB':>10}{'bytes/msg':>12}{'build s':>10}")
+    print(f"{'dict':<10}{dict_bytes / 1e6:>10.1f}{results['dict_bytes_per_message']:>12.1f}{dict_seconds:>10.3f}")
+    print(f"{'records':<10}{record_bytes / 1e6:>10.1f}{results['record_bytes_per_message']:>12.1f}"
+          f"{record_seconds:>10.3f}")
+    print(f"Records use {results['saving_ratio']}x less memory")
+    print(f"Results saved to {save_results('memory', results, args.output)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
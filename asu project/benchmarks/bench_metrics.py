@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Per-event overhead of the in-process metrics collection.
+
+Measures the cost of Counter.inc(), Histogram.observe() and Histogram.time()
+and fails (exit code 1) if any of them exceeds the budget.
+
+Usage:
+    python benchmarks/bench_metrics.py --events 200000 --budget-us 3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+from common import save_results  # noqa: E402
+
+
+def per_event_us(func, events):
+    started = time.perf_counter()
+    for _ in range(events):
+        func()
+    return (time.perf_counter() - started) / events * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=200000)
+    parser.add_argument('--budget-us', type=float, default=3.0, help='maximum cost per event in microseconds')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/metrics-<time>.json)')
+    args = parser.parse_args(argv)
+
+    counter = metrics.Counter('bench_total', 'benchmark counter', ('path',))
+    histogram = metrics.Histogram('bench_seconds', 'benchmark histogram', ('endpoint',))
+
+    def timed_block():
+        with histogram.time('chat'):
+            pass
+
+    baseline = per_event_us(lambda: None, args.events)
+    results = {
+        'events': args.events,
+        'budget_us': args.budget_us,
+        'counter_inc_us': round(per_event_us(lambda: counter.inc('fallback'), args.events) - baseline, 3),
+        'histogram_observe_us': round(per_event_us(lambda: histogram.observe(0.042, 'chat'), args.events) - baseline, 3),
+        'histogram_time_us': round(per_event_us(timed_block, args.events) - baseline, 3),
+    }
+    for key in ('counter_inc_us', 'histogram_observe_us', 'histogram_time_us'):
+        print(f"{key:<24}{results[key]:>8.3f} us/event")
+    print(f"Results saved to {save_results('metrics', results, args.output)}")
+
+    over_budget = [key for key in results if key.endswith('_us') and key != 'budget_us'
+                   and results[key] > args.budget_us]
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Rate limit check cost and accuracy across processes.
+
+Times RateLimiter.check() with the in-process and SQLite bucket stores, then
+starts --processes processes (like gunicorn workers) that all spend the same
+user's bucket, each sending about --rate checks a second for --seconds. With the SQLite store the number of requests
+allowed should match the limit (capacity plus refill over the run); with the
+in-process store every process has its own bucket. Fails (exit code 1) if the
+p99 SQLite check under contention exceeds the budget.
+
+Usage:
+    python benchmarks/bench_rate_limit.py --processes 4 --seconds 3 --budget-us 1000
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limit import Limit, MemoryBuckets, RateLimiter, SQLiteBuckets  # noqa: E402
+from common import percentile, save_results  # noqa: E402
+
+
+def make_store(kind, path):
+    return SQLiteBuckets(path) if kind == 'sqlite' else MemoryBuckets()
+
+
+def check_cost(kind, path, checks, users):
+    """Median and p99 microseconds per check in one process."""
+    limiter = RateLimiter(make_store(kind, path), {'expensive': Limit(20, 60)})
+    limiter.check('warmup', 'chat', 'expensive')
+    timings = []
+    for i in range(checks):
+        started = time.perf_counter()
+        limiter.check(f'user{i % users}', 'chat', 'expensive')
+        timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    return {'p50_us': round(percentile(timings, 50), 2), 'p99_us': round(percentile(timings, 99), 2)}
+
+
+def spend(kind, path, limit, start_at, seconds, interval, queue):
+    """Send checks for one shared user until the deadline; report allowed count and timings."""
+    limiter = RateLimiter(make_store(kind, path), {'expensive': limit})
+    while time.time() < start_at:
+        time.sleep(0.001)
+    allowed, timings = 0, []
+    while time.time() < start_at + seconds:
+        started = time.perf_counter()
+        decision = limiter.check('student', 'chat', 'expensive')
+        timings.append((time.perf_counter() - started) * 1e6)
+        allowed += decision.allowed
+        time.sleep(interval)
+    queue.put((allowed, timings))
+
+
+def contention(kind, path, processes, seconds, limit, rate):
+    queue = multiprocessing.Queue()
+    start_at = time.time() + 0.5
+    workers = [multiprocessing.Process(target=spend, args=(kind, path, limit, start_at, seconds, 1.0 / rate, queue))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    reports = [queue.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    timings = sorted(t for _, worker_timings in reports for t in worker_timings)
+    return {
+        'checks': len(timings),
+        'allowed': sum(allowed for allowed, _ in reports),
+        'expected_allowed': int(limit.capacity + limit.rate * seconds),
+        'p50_us': round(percentile(timings, 50), 2),
+        'p99_us': round(percentile(timings, 99), 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checks', type=int, default=50000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--rate', type=float, default=500.0, help='checks per second sent by each process')
+    parser.add_argument('--limit', default='20/10', help='shared bucket limit as <requests>/<seconds>')
+    parser.add_argument('--budget-us', type=float, default=1000.0, help='maximum p99 SQLite check under contention')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/rate_limit-<time>.json)')
+    args = parser.parse_args(argv)
+
+    capacity, _, seconds = args.limit.partition('/')
+    limit = Limit(int(capacity), float(seconds))
+    results = {'limit': repr(limit), 'processes': args.processes, 'seconds': args.seconds}
+    with tempfile.TemporaryDirectory(prefix='lumora-bench-') as directory:
+        for kind in ('memory', 'sqlite'):
+            path = os.path.join(directory, f'{kind}.db')
+            results[kind] = {'single': check_cost(kind, path, args.checks, args.users)}
+            print(f"{kind}: p50 {results[kind]['single']['p50_us']} us, "
+                  f"p99 {results[kind]['single']['p99_us']} us per check", flush=True)
+            shared = results[kind]['contention'] = contention(
+                kind, os.path.join(directory, f'{kind}-shared.db'), args.processes, args.seconds, limit, args.rate)
+            print(f"{kind}, {args.processes} processes: allowed {shared['allowed']} of {shared['checks']} "
+                  f"(limit allows {shared['expected_allowed']}), p50 {shared['p50_us']} us, "
+                  f"p99 {shared['p99_us']} us", flush=True)
+    print(f"Results saved to {save_results('rate_limit', results, args.output)}")
+    return 1 if results['sqlite']['contention']['p99_us'] > args.budget_us else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Model call tail latency and retry amplification with injected faults.
+
+Drives the stub model in-process from --concurrency threads: directly, through
+resilience.ResilientCaller, and through the caller behind a
+circuit_breaker.CircuitBreaker (as call_model() does), in three scenarios:
+
+    tail      latencies drawn from --latency (a few calls are very slow)
+    errors    --error-rate of calls fail
+    outage    every call fails, or is slower than the deadline (--outage slow)
+
+For each run it reports p50/p95/p99/max latency, failed calls and model
+attempts per call. Hedging should cut the tail; during the outage the retry
+budget should keep attempts per call near 1 + the budget ratio, and the open
+breaker should stop nearly all of them. Fails (exit code 1) if outage attempts
+per call through the caller exceed --max-amplification.
+
+Usage:
+    python benchmarks/bench_resilience.py --latency bimodal:50:3000:0.05 --calls 400 --concurrency 8
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_backend import StubBackend  # noqa: E402
+from circuit_breaker import CircuitBreaker, CircuitOpenError  # noqa: E402
+from resilience import DeadlineExceeded, LatencyTracker, ResilientCaller, RetryBudget  # noqa: E402
+from common import latency_summary, save_results  # noqa: E402
+
+
+class CountingModel:
+    """Stub model that counts generate_content calls."""
+
+    def __init__(self, latency, error_rate):
+        self.model = StubBackend(response_words=50, latency_ms=latency, error_rate=error_rate).create_model({}, '')
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, **kwargs):
+        with self._lock:
+            self.calls += 1
+        return self.model.generate_content(contents, **kwargs)
+
+
+def drive(call, calls, concurrency):
+    """Run ``calls`` calls from ``concurrency`` threads; return latencies and the failure count."""
+    latencies, failures = [], {}
+    lock = threading.Lock()
+
+    def one(i):
+        started = time.perf_counter()
+        try:
+            call(f'Explain topic {i}')
+            error = None
+        except DeadlineExceeded:
+            error = 'deadline'
+        except Exception as e:
+            error = type(e).__name__
+        with lock:
+            latencies.append(time.perf_counter() - started)
+            if error:
+                failures[error] = failures.get(error, 0) + 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(calls)))
+    return latencies, failures
+
+
+def run(scenario, latency, error_rate, args, mode):
+    model = CountingModel(latency, error_rate)
+    call = model.generate_content
+    if mode != 'direct':
+        caller = ResilientCaller(
+            default_deadline=args.deadline,
+            hedge_percentile=args.hedge_percentile,
+            budget=RetryBudget(ratio=args.budget_ratio, min_per_second=args.budget_per_second),
+            tracker=LatencyTracker(min_samples=20),
+        )
+
+        def call(prompt):
+            return caller.call('bench', lambda: model.generate_content(prompt))
+
+    if mode == 'breaker':
+        breaker = CircuitBreaker('bench', min_calls=20, slow_seconds=args.deadline, open_seconds=1.0)
+        resilient_call = call
+
+        def call(prompt):
+            if not breaker.allow():
+                raise CircuitOpenError('open')
+            started = time.perf_counter()
+            try:
+                result = resilient_call(prompt)
+            except Exception:
+                breaker.record(False, time.perf_counter() - started)
+                raise
+            breaker.record(True, time.perf_counter() - started)
+            return result
+
+    latencies, failures = drive(call, args.calls, args.concurrency)
+    result = {
+        'latency': latency_summary(latencies),
+        'failed': sum(failures.values()),
+        'failures': failures,
+        'attempts_per_call': round(model.calls / args.calls, 3),
+    }
+    summary = result['latency']
+    print(f"{scenario:<8}{mode:<11}p50 {summary['p50_ms']:>8} ms  "
+          f"p95 {summary['p95_ms']:>8} ms  p99 {summary['p99_ms']:>8} ms  max {summary['max_ms']:>8} ms  "
+          f"failed {result['failed']:>4}  attempts/call {result['attempts_per_call']}", flush=True)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', default='bimodal:50:3000:0.05', help='stub latency distribution (ms)')
+    parser.add_argument('--error-rate', type=float, default=0.2, help='failing calls in the errors scenario')
+    parser.add_argument('--outage', choices=('errors', 'slow'), default='errors')
+    parser.add_argument('--deadline', type=float, default=2.0, help='seconds per call')
+    parser.add_argument('--hedge-percentile', type=float, default=90.0)
+    parser.add_argument('--budget-ratio', type=float, default=0.1)
+    parser.add_argument('--budget-per-second', type=float, default=0.5)
+    parser.add_argument('--max-amplification', type=float, default=1.25, help='maximum outage attempts per call')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/resilience-<time>.json)')
+    args = parser.parse_args(argv)
+
+    fast = args.latency.split(':')[1] if args.latency.count(':') >= 2 else args.latency
+    scenarios = {
+        'tail': (args.latency, 0.0),
+        'errors': (fast, args.error_rate),
+        'outage': (fast, 1.0) if args.outage == 'errors' else (str(args.deadline * 2000), 0.0),
+    }
+    results = {'config': {key: value for key, value in vars(args).items() if key != 'output'}}
+    for scenario, (latency, error_rate) in scenarios.items():
+        results[scenario] = {mode: run(scenario, latency, error_rate, args, mode)
+                             for mode in ('direct', 'resilient', 'breaker')}
+    print(f"Results saved to {save_results('resilience', results, args.output)}")
+    return 1 if results['outage']['resilient']['attempts_per_call'] > args.max_amplification else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
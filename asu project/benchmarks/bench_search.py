@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Chat history search latency.
+
+Indexes a user's history of --sessions sessions with --messages-per-session
+messages, then times searches for a mix of rare and common terms. Message
+text is drawn from a Zipf-distributed vocabulary of --vocabulary words (the
+stub model's vocabulary is too small to be representative), with the
+subject terms used in QUERIES mixed in. Fails (exit code 1) if the p95 search time exceeds the budget.
+
+Usage:
+    python benchmarks/bench_search.py --sessions 3000 --messages-per-session 20 --budget-ms 25
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SearchIndex  # noqa: E402
+from common import percentile, save_results  # noqa: E402
+
+QUERIES = [
+    'b-tree index', 'normalization', 'sql join query', 'transaction isolation',
+    'graph search algorithm', 'memory cache', 'network protocol packet', 'binary search tree complexity',
+]
+SUBJECT_WORDS = sorted({word for query in QUERIES for word in query.replace('-', ' ').split()})
+
+
+def vocabulary(size):
+    """Synthetic words with the subject terms spread through the frequency ranks."""
+    words = [f'word{rank}' for rank in range(size)]
+    for position, word in enumerate(SUBJECT_WORDS):
+        words[(position * 37 + 5) % size] = word
+    return words
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=3000)
+    parser.add_argument('--messages-per-session', type=int, default=20)
+    parser.add_argument('--words-per-message', type=int, default=150)
+    parser.add_argument('--vocabulary', type=int, default=20000)
+    parser.add_argument('--searches', type=int, default=400)
+    parser.add_argument('--budget-ms', type=float, default=25.0, help='maximum p95 search time in milliseconds')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/search-<time>.json)')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(42)
+    words = vocabulary(args.vocabulary)
+    cumulative = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(words))))
+    index = SearchIndex()
+    started = time.perf_counter()
+    for session in range(args.sessions):
+        for message in range(args.messages_per_session):
+            text = ' '.join(rng.choices(words, cum_weights=cumulative, k=args.words_per_message))
+            index.add('student', f'session-{session}', session * 1000 + message, text)
+    index_seconds = time.perf_counter() - started
+
+    timings = []
+    for _ in range(args.searches):
+        query = rng.choice(QUERIES)
+        started = time.perf_counter()
+        index.search('student', query)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    results = {
+        'sessions': args.sessions,
+        'messages': index.document_count('student'),
+        'index_seconds': round(index_seconds, 2),
+        'budget_ms': args.budget_ms,
+        'search_p50_ms': round(percentile(timings, 50), 2),
+        'search_p95_ms': round(percentile(timings, 95), 2),
+        'search_max_ms': round(timings[-1], 2),
+    }
+    print(f"Indexed {results['messages']} messages in {results['index_seconds']}s")
+    print(f"search p50 {results['search_p50_ms']} ms, p95 {results['search_p95_ms']} ms, "
+          f"max {results['search_max_ms']} ms")
+    print(f"Results saved to {save_results('search', results, args.output)}")
+    return 1 if results['search_p95_ms'] > args.budget_ms else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
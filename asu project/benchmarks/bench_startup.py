@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Startup time and per-worker memory, with and without a preloaded master.
+
+First imports main in fresh interpreters and times the import and
+main.preload() (the model SDK, document parsers, gTTS and page rendering that
+used to happen at import or in every worker). Then boots gunicorn three ways:
+
+    eager       every worker imports the app and preloads, as before lazy imports
+    lazy        every worker imports the app and loads modules on first use
+    preloaded   gunicorn.conf.py preloads in the master, workers share it
+
+It then warms every worker with page loads, chats and PDF/DOCX uploads, and
+reports boot time plus RSS, PSS and USS per worker. PSS and USS show how much
+memory is shared copy-on-write. RSS counts shared pages in full.
+
+--backend gemini imports the real SDK with a dummy key. No model calls are
+made during warm-up, so lazy workers never load it.
+
+Usage:
+    python benchmarks/bench_startup.py --workers 4 --backend gemini
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from common import (BENCH_PASSWORD, BENCH_USER, PROJECT_DIR, child_pids, memory_kb, save_results, start_server,
+                    stop_server, stub_env)
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.preload()
+preloaded = time.perf_counter()
+print(json.dumps({'import_seconds': imported - started, 'preload_seconds': preloaded - imported}))
+"""
+
+# Loads everything in each worker, like the app did before its imports became lazy
+EAGER_CONFIG = """
+preload_app = False
+
+
+def post_worker_init(worker):
+    import main
+    main.preload()
+"""
+
+PAGES = ['/welcome', '/chatbot', '/flashcards', '/mcq-generator', '/youtube-suggestions', '/voice-assistant']
+
+
+def backend_env(backend, directory):
+    env = stub_env({
+        'USAGE_DB_PATH': os.path.join(directory, 'usage.db'),
+        'SESSION_SPILL_PATH': os.path.join(directory, 'sessions.db'),
+        'SESSION_DB_PATH': os.path.join(directory, 'web_sessions.db'),
+        'RATE_LIMIT_DB_PATH': os.path.join(directory, 'rate_limits.db'),
+        'TRACE_LOG_PATH': '',
+    })
+    if backend == 'gemini':
+        env.update({'LLM_BACKEND': 'gemini', 'GEMINI_API_KEY': 'benchmark-dummy-key'})
+    return env
+
+
+def time_import(env, repeats):
+    """Median import and preload time of main in fresh interpreters."""
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.check_output([sys.executable, '-c', IMPORT_SCRIPT], cwd=PROJECT_DIR, env=env,
+                                         stderr=subprocess.DEVNULL)
+        runs.append(json.loads(output.decode().strip().splitlines()[-1]))
+    return {key: round(statistics.median(run[key] for run in runs), 3) for key in runs[0]}
+
+
+def sample_documents():
+    """A one-page PDF and a one-paragraph DOCX, built with the parsers' own writers."""
+    from docx import Document
+    from PyPDF2 import PdfWriter
+    pdf, docx = io.BytesIO(), io.BytesIO()
+    writer = PdfWriter()
+    writer.add_blank_page(width=200, height=200)
+    writer.write(pdf)
+    document = Document()
+    document.add_paragraph('Normalization removes redundancy from relational tables.')
+    document.save(docx)
+    return pdf.getvalue(), docx.getvalue()
+
+
+def warm(base_url, workers, rounds, backend):
+    """Hit pages, chat and uploads concurrently so every worker serves each kind of request."""
+    pdf, docx = sample_documents()
+
+    def client(_):
+        http = requests.Session()
+        http.post(f'{base_url}/login', json={'username': BENCH_USER, 'password': BENCH_PASSWORD}).raise_for_status()
+        for _ in range(rounds):
+            for page in PAGES:
+                http.get(base_url + page).raise_for_status()
+            for name, body in (('notes.pdf', pdf), ('notes.docx', docx)):
+                http.post(f'{base_url}/api/upload', files={'file': (name, io.BytesIO(body))}).raise_for_status()
+            if backend == 'stub':
+                with http.post(f'{base_url}/api/chat', json={'message': 'Explain normalization'}, stream=True) as response:
+                    for _ in response.iter_lines():
+                        pass
+
+    with ThreadPoolExecutor(max_workers=workers * 2) as pool:
+        list(pool.map(client, range(workers * 2)))
+
+
+def boot(env, workers, rounds, backend, extra_args=None):
+    started = time.perf_counter()
+    server, base_url = start_server(workers=workers, env=env, extra_args=extra_args)
+    try:
+        # start_server waits for the socket; wait until every worker answers too
+        for _ in range(workers * 4):
+            requests.get(f'{base_url}/login').raise_for_status()
+        boot_seconds = time.perf_counter() - started
+        warm(base_url, workers, rounds, backend)
+        per_worker = [memory_kb(pid) for pid in child_pids(server.pid)]
+        master = memory_kb(server.pid)
+    finally:
+        stop_server(server)
+
+    def mean(key):
+        return round(statistics.mean(worker.get(key, 0) for worker in per_worker) / 1024, 1)
+
+    return {
+        'boot_seconds': round(boot_seconds, 2),
+        'worker_rss_mb': mean('rss_kb'),
+        'worker_pss_mb': mean('pss_kb'),
+        'worker_uss_mb': mean('uss_kb'),
+        'total_pss_mb': round((sum(worker.get('pss_kb', 0) for worker in per_worker) + master.get('pss_kb', 0)) / 1024, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--backend', choices=('stub', 'gemini'), default='stub')
+    parser.add_argument('--rounds', type=int, default=3, help='warm-up rounds per client')
+    parser.add_argument('--repeats', type=int, default=3, help='fresh interpreters for the import timing')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/startup-<time>.json)')
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix='lumora-bench-')
+    env = backend_env(args.backend, directory)
+    results = {'workers': args.workers, 'backend': args.backend, 'import': time_import(env, args.repeats)}
+    print(f"import main {results['import']['import_seconds']}s, preload() {results['import']['preload_seconds']}s",
+          flush=True)
+    eager_config = os.path.join(directory, 'eager.conf.py')
+    with open(eager_config, 'w') as config:
+        config.write(EAGER_CONFIG)
+    modes = (
+        ('eager', env, ['--config', eager_config]),
+        ('lazy', dict(env, GUNICORN_PRELOAD='0'), None),
+        ('preloaded', dict(env, GUNICORN_PRELOAD='1'), None),
+    )
+    for mode, mode_env, extra_args in modes:
+        results[mode] = boot(mode_env, args.workers, args.rounds, args.backend, extra_args)
+        print(f"{mode}: boot {results[mode]['boot_seconds']}s, per worker RSS {results[mode]['worker_rss_mb']} MB, "
+              f"PSS {results[mode]['worker_pss_mb']} MB, USS {results[mode]['worker_uss_mb']} MB, "
+              f"total PSS {results[mode]['total_pss_mb']} MB", flush=True)
+    print(f"Results saved to {save_results('startup', results, args.output)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Shared helpers for the Lumora AI benchmark scripts.
+
+Benchmarks run the real app under gunicorn with the offline stub model and
+stub TTS, so they need no API keys or network access.
+"""
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_DIR, 'benchmarks', 'results')
+
+BENCH_USER = 'Hemachandaran'
+BENCH_PASSWORD = 'hemachan'
+
+
+def free_port():
+    """Return a TCP port that is free on localhost."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def stub_env(extra=None):
+    """Environment for running the app fully offline."""
+    env = dict(os.environ)
+    env.update({
+        'LLM_BACKEND': 'stub',
+        'TTS_BACKEND': 'stub',
+        'PYTHONUNBUFFERED': '1',
+        # Load tests send far more requests per user than the rate limits allow
+        'RATE_LIMIT_ENABLED': '0',
+    })
+    env.update(extra or {})
+    return env
+
+
+def start_server(workers=4, worker_class='sync', threads=1, env=None, extra_args=None, timeout=30):
+    """Start gunicorn serving main:app and wait until it accepts requests.
+
+    Returns ``(process, base_url)``.
+    """
+    port = free_port()
+    cmd = [sys.executable, '-m', 'gunicorn',
+           '--bind', f'127.0.0.1:{port}',
+           '--workers', str(workers),
+           '--worker-class', worker_class,
+           '--threads', str(threads),
+           '--timeout', '120',
+           '--log-level', 'warning']
+    cmd += list(extra_args or [])
+    cmd.append('main:app')
+    process = subprocess.Popen(cmd, cwd=PROJECT_DIR, env=env or stub_env(),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    base_url = f'http://127.0.0.1:{port}'
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited early:\n{process.stderr.read().decode(errors='replace')}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                # Give every worker a moment to finish booting
+                time.sleep(0.5)
+                return process, base_url
+        except OSError:
+            time.sleep(0.1)
+    stop_server(process)
+    raise RuntimeError('gunicorn did not start in time')
+
+
+def stop_server(process):
+    """Terminate a server started with start_server()."""
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def child_pids(parent_pid):
+    """Return the pids of direct children of ``parent_pid`` (Linux /proc)."""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                fields = stat.read().rsplit(')', 1)[1].split()
+            if int(fields[1]) == parent_pid:
+                children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return sorted(children)
+
+
+def memory_kb(pid):
+    """Return ``{'rss_kb': ..., 'pss_kb': ..., 'uss_kb': ...}`` for a process, where available."""
+    result = {}
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    result['rss_kb'] = int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as smaps:
+            for line in smaps:
+                if line.startswith('Pss:'):
+                    result['pss_kb'] = int(line.split()[1])
+                elif line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                    result['uss_kb'] = result.get('uss_kb', 0) + int(line.split()[1])
+    except OSError:
+        pass
+    return result
+
+
+def worker_memory(server_process):
+    """Memory usage of every gunicorn worker, keyed by pid."""
+    return {pid: memory_kb(pid) for pid in child_pids(server_process.pid)}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def latency_summary(latencies):
+    """p50/p95/p99/mean/max of a list of latencies in seconds, reported in ms."""
+    if not latencies:
+        return {'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'mean_ms': 0.0, 'max_ms': 0.0}
+    return {
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+    }
+
+
+def git_revision():
+    """Short git revision of the working tree, or None."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(name, results, output=None):
+    """Write benchmark results as JSON and return the file path."""
+    results.setdefault('benchmark', name)
+    results.setdefault('timestamp', datetime.now().isoformat())
+    results.setdefault('git_revision', git_revision())
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f'{name}-{stamp}.json')
+    with open(output, 'w') as fh:
+        json.dump(results, fh, indent=2)
+    return output
+
+
+def load_results(path):
+    """Load a results file written by save_results()."""
+    with open(path) as fh:
+        return json.load(fh)
@@ -0,0 +1,187 @@
+"""
+Chat session bookkeeping for Lumora AI.
+
+``Message`` and ``ChatSession`` are slot-based records: ids are 64-bit
+integers, timestamps are epoch seconds and optional attachments are None
+unless present. They are turned into the JSON shape the API has always
+returned (hex ids, ISO timestamps) only at the edge, with ``to_dict()``.
+
+``to_record()`` / ``from_record()`` give the compact list form sessions are
+stored in when they are spilled to disk (see session_store.py).
+
+``SessionIndex`` keeps each user's session ids ordered by last activity, so
+the session list is served a page at a time without scanning every session
+on the server.
+"""
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from itertools import islice
+
+# Attachment fields of user messages
+BLOB_FIELDS = ('image', 'document_content')
+
+
+def new_id():
+    """Random 64-bit id."""
+    return secrets.randbits(64)
+
+
+def format_id(value):
+    """Render an id as the 16 hex characters used in URLs and JSON."""
+    return f'{value:016x}'
+
+
+def parse_id(text):
+    """Parse a hex id from a URL or request body, or return None."""
+    if not text or len(text) != 16:
+        return None
+    try:
+        return int(text, 16)
+    except ValueError:
+        return None
+
+
+def isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+
+class Message:
+    """One chat message."""
+
+    __slots__ = ('id', 'role', 'content', 'created', 'image', 'document_content', 'filename')
+
+    def __init__(self, role, content, image=None, document_content=None, filename=None, id=None, created=None):
+        self.id = new_id() if id is None else id
+        self.role = role
+        self.content = content
+        self.created = int(time.time()) if created is None else created
+        self.image = image or None
+        self.document_content = document_content or None
+        self.filename = filename or None
+
+    def to_dict(self, include=BLOB_FIELDS):
+        """API representation; attachments not in ``include`` are left out."""
+        data = {
+            'id': format_id(self.id),
+            'role': self.role,
+            'content': self.content,
+            'timestamp': isoformat(self.created)
+        }
+        if self.role == 'user':
+            for field in BLOB_FIELDS:
+                if field in include:
+                    data[field] = getattr(self, field)
+            data['filename'] = self.filename or ''
+        return data
+
+
+class ChatSession:
+    """A user's conversation: title, owner and messages in order."""
+
+    __slots__ = ('id', 'title', 'user', 'created', 'messages')
+
+    def __init__(self, user, title='New Chat', id=None, created=None, messages=None):
+        self.id = format_id(new_id()) if id is None else id
+        self.title = title
+        # Every session of a user shares one string
+        self.user = sys.intern(user)
+        self.created = int(time.time()) if created is None else created
+        self.messages = messages if messages is not None else []
+
+    @property
+    def created_at(self):
+        return isoformat(self.created)
+
+    def find_message(self, message_id):
+        """Position of the message with ``message_id`` searching from the newest, or None."""
+        messages = self.messages
+        for index in range(len(messages) - 1, -1, -1):
+            if messages[index].id == message_id:
+                return index
+        return None
+
+    def approx_bytes(self):
+        """Rough memory footprint, dominated by message text and attachments."""
+        total = 200
+        for message in self.messages:
+            total += (120 + len(message.content) + len(message.image or '')
+                      + len(message.document_content or '') + len(message.filename or ''))
+        return total
+
+    def to_record(self):
+        """Compact JSON-ready form, used when the session is written to disk."""
+        return [self.id, self.title, self.user, self.created, [
+            [message.id, message.role, message.content, message.created,
+             message.image, message.document_content, message.filename]
+            for message in self.messages
+        ]]
+
+    @classmethod
+    def from_record(cls, record):
+        session_id, title, user, created, messages = record
+        return cls(user, title=title, id=session_id, created=created, messages=[
+            Message(role, content, image, document_content, filename, id=message_id, created=message_created)
+            for message_id, role, content, message_created, image, document_content, filename in messages
+        ])
+
+    def to_dict(self, include=BLOB_FIELDS):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'messages': [message.to_dict(include) for message in self.messages],
+            'created_at': self.created_at,
+            'user': self.user
+        }
+
+
+class SessionIndex:
+    """Session ids per user, most recently active last."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_user = {}  # user -> OrderedDict(session_id -> last activity epoch)
+
+    def touch(self, user, session_id):
+        """Record activity on a session now, adding it to the index if needed."""
+        with self._lock:
+            sessions = self._by_user.setdefault(user, OrderedDict())
+            sessions[session_id] = time.time()
+            sessions.move_to_end(session_id)
+
+    def add_many(self, user, entries):
+        """Add ``(session_id, last_active)`` pairs in order of their activity time."""
+        with self._lock:
+            sessions = self._by_user.get(user, OrderedDict())
+            merged = dict(sessions)
+            merged.update(entries)
+            # Imported sessions can be older than existing ones, so rebuild in time order
+            self._by_user[user] = OrderedDict(sorted(merged.items(), key=lambda item: item[1]))
+
+    def remove(self, user, session_id):
+        with self._lock:
+            sessions = self._by_user.get(user)
+            if sessions is not None:
+                sessions.pop(session_id, None)
+                if not sessions:
+                    del self._by_user[user]
+
+    def count(self, user):
+        with self._lock:
+            return len(self._by_user.get(user, ()))
+
+    def last_active(self, user, session_id):
+        with self._lock:
+            return self._by_user.get(user, {}).get(session_id)
+
+    def page(self, user, offset=0, limit=50):
+        """Return ``[(session_id, last_active), ...]`` newest first, skipping ``offset``."""
+        with self._lock:
+            sessions = self._by_user.get(user)
+            if not sessions:
+                return []
+            ids = list(islice(reversed(sessions), offset, offset + limit))
+            return [(session_id, sessions[session_id]) for session_id in ids]
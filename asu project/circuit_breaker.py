@@ -0,0 +1,151 @@
+"""
+Circuit breaker for Lumora AI model backends.
+
+While Gemini is failing or very slow, every request still waits for its own
+failed call (up to the deadline from ``resilience``) before taking its error
+path. ``CircuitBreaker`` watches the outcome and duration of recent calls to a
+backend and opens once too many of them fail or are slow. While open, calls
+fail at once with ``CircuitOpenError``, or get the last result of the same
+call from ``ResultCache`` if there is one. After ``open_seconds`` one probe
+call is let through (half-open): its success closes the circuit, a failure
+opens it again.
+
+State is per worker process. Each gunicorn worker opens its own circuit after
+``min_calls`` calls in the window, so an outage costs a few calls per worker.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+import metrics
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_STATE = metrics.Gauge('lumora_circuit_breaker_state',
+                              'Circuit breaker state by backend (0 closed, 1 half-open, 2 open)', ('backend',),
+                              aggregate='max')
+CIRCUIT_TRANSITIONS_TOTAL = metrics.Counter('lumora_circuit_breaker_transitions_total',
+                                            'Circuit breaker state changes by backend and new state',
+                                            ('backend', 'state'))
+CIRCUIT_SHORT_CIRCUITS_TOTAL = metrics.Counter('lumora_circuit_breaker_short_circuits_total',
+                                               'Calls not sent while the circuit was open, by result',
+                                               ('backend', 'endpoint', 'result'))
+
+
+class CircuitOpenError(RuntimeError):
+    """The backend's circuit is open and no cached result was available."""
+
+
+class ResultCache:
+    """Most recent result per call key, least recently used first out."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over the error and slow-call rates of recent calls."""
+
+    def __init__(self, backend, window_seconds=60, min_calls=10, error_rate=0.5, slow_seconds=15.0,
+                 slow_rate=0.5, open_seconds=30, enabled=True):
+        self.backend = backend
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls = deque()  # (finished, failed, slow) in the window
+        self._failed = 0
+        self._slow = 0
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probe_started = None
+        CIRCUIT_STATE.set(_STATE_VALUES[CLOSED], backend)
+
+    def _transition(self, state, now):
+        if state == self.state:
+            return
+        print(f"Circuit breaker for {self.backend}: {self.state} -> {state}")
+        self.state = state
+        if state == OPEN:
+            self._opened_at = now
+        if state != HALF_OPEN:
+            self._probe_started = None
+        self._calls.clear()
+        self._failed = self._slow = 0
+        CIRCUIT_STATE.set(_STATE_VALUES[state], self.backend)
+        CIRCUIT_TRANSITIONS_TOTAL.inc(self.backend, state)
+
+    def allow(self):
+        """Whether a call may be sent now (in half-open, only one probe at a time)."""
+        if not self.enabled:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if now - self._opened_at < self.open_seconds:
+                    return False
+                self._transition(HALF_OPEN, now)
+            # A probe that never reported back (client went away) is replaced after open_seconds
+            if self._probe_started is not None and now - self._probe_started < self.open_seconds:
+                return False
+            self._probe_started = now
+            return True
+
+    def record(self, ok, seconds):
+        """Record the outcome of a call that allow() let through."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        slow = seconds >= self.slow_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._transition(CLOSED if ok and not slow else OPEN, now)
+                return
+            if self.state == OPEN:
+                return
+            calls = self._calls
+            calls.append((now, not ok, slow))
+            self._failed += not ok
+            self._slow += slow
+            while calls and now - calls[0][0] > self.window_seconds:
+                _, failed, was_slow = calls.popleft()
+                self._failed -= failed
+                self._slow -= was_slow
+            if len(calls) >= self.min_calls and (self._failed >= self.error_rate * len(calls)
+                                                 or self._slow >= self.slow_rate * len(calls)):
+                self._transition(OPEN, now)
+
+    def short_circuit(self, endpoint, cached):
+        """Count a call answered without the backend, from the cache or with CircuitOpenError."""
+        CIRCUIT_SHORT_CIRCUITS_TOTAL.inc(self.backend, endpoint, 'cached' if cached is not None else 'rejected')
+        if cached is None:
+            raise CircuitOpenError(f'{self.backend} circuit is open')
+        return cached
@@ -0,0 +1,56 @@
+"""
+Gunicorn settings for Lumora AI, read automatically from the project directory.
+
+The app is imported once in the master (``preload_app``) and ``when_ready``
+calls ``main.preload()`` there, so the model SDK, document parsers, gTTS and
+rendered pages are loaded before the workers fork and are shared by them
+copy-on-write instead of being loaded by each one. ``gc.freeze()`` then moves
+those objects out of the collector's reach, so collections in a worker do not
+write to the shared pages. GUNICORN_PRELOAD=0 loads the app in each worker.
+
+Workers write their metrics to METRICS_MULTIPROC_DIR, so a scrape of
+/metrics, whichever worker answers it, reports the whole server.
+"""
+import gc
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+timeout = 120
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') != '0'
+
+# Set before the app (and so metrics.py) is imported
+os.environ.setdefault('METRICS_MULTIPROC_DIR',
+                      os.path.join(tempfile.gettempdir(), f"lumora_metrics_{os.getenv('PORT', '5000')}"))
+
+
+def on_starting(server):
+    import metrics
+    # Counters start from zero with the server; Prometheus treats this as a counter reset
+    metrics.clear()
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    import main
+    main.preload()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import metrics
+    metrics.start_flusher()
+
+
+def worker_exit(server, worker):
+    import main
+    import metrics
+    main.usage_store.flush()
+    metrics.flush()
+
+
+def child_exit(server, worker):
+    import metrics
+    metrics.mark_process_dead(worker.pid)
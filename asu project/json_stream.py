@@ -0,0 +1,100 @@
+"""
+Incremental JSON parsing of streamed model output for Lumora AI.
+
+The generator endpoints ask the model for ``{"flashcards": [...]}``,
+``{"mcqs": [...]}`` or ``{"videos": [...]}``. ``ArrayItemParser`` is fed the
+response text chunk by chunk as it streams and returns each element of the
+named top-level array as soon as its closing bracket arrives, so the first
+card can be shown while the model is still writing the rest.
+
+The parser only tracks the nesting structure (brackets, strings and escapes)
+and hands each complete element to ``json.loads``. Text around the JSON
+object, such as Markdown code fences or a sentence of prose, is skipped, as
+the old ``re.search(r'\\{.*\\}')`` extraction did.
+"""
+import json
+
+
+class ArrayItemParser:
+    """Yield the elements of ``{"<key>": [...]}`` from text that arrives in chunks."""
+
+    def __init__(self, key):
+        self.key = key
+        self.items = 0  # elements parsed so far
+        self.invalid = 0  # complete elements json.loads rejected
+        self._stack = []  # open '{' / '[' containers
+        self._keys = []  # per open container: last object key seen (None for arrays)
+        self._expect_key = False
+        self._in_string = False
+        self._escape = False
+        self._string = []  # characters of the string being read, while reading a key
+        self._item_depth = None  # stack depth of the target array, once inside it
+        self._item_parts = None  # text of the element being captured
+
+    def feed(self, chunk):
+        """Consume ``chunk`` and return the elements completed by it."""
+        completed = []
+        capture_from = 0 if self._item_parts is not None else None
+        stack = self._stack
+        for position, char in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._string is not None:
+                        self._keys[-1] = ''.join(self._string)
+                        self._string = None
+                    continue
+                if self._string is not None:
+                    self._string.append(char)
+                continue
+            if char == '"':
+                if not stack:
+                    continue  # prose before the object
+                self._in_string = True
+                self._string = [] if self._expect_key else None
+            elif char in '{[':
+                if not stack and char == '[':
+                    continue
+                if self._item_depth is not None and len(stack) == self._item_depth:
+                    # An element of the target array starts here
+                    self._item_parts = []
+                    capture_from = position
+                stack.append(char)
+                self._keys.append(None)
+                self._expect_key = char == '{'
+                if (char == '[' and len(stack) == 2 and self._item_depth is None
+                        and self._keys[0] == self.key):
+                    self._item_depth = len(stack)
+            elif char in '}]':
+                if not stack:
+                    continue
+                stack.pop()
+                self._keys.pop()
+                self._expect_key = False
+                if self._item_depth is not None:
+                    if len(stack) == self._item_depth and self._item_parts is not None:
+                        self._item_parts.append(chunk[capture_from:position + 1])
+                        self._finish_item(completed)
+                        capture_from = None
+                    elif len(stack) < self._item_depth:
+                        self._item_depth = None  # the target array closed
+            elif char == ',':
+                self._expect_key = bool(stack) and stack[-1] == '{'
+            elif char == ':':
+                self._expect_key = False
+        if self._item_parts is not None and capture_from is not None:
+            self._item_parts.append(chunk[capture_from:])
+        return completed
+
+    def _finish_item(self, completed):
+        text = ''.join(self._item_parts)
+        self._item_parts = None
+        try:
+            completed.append(json.loads(text))
+            self.items += 1
+        except json.JSONDecodeError:
+            self.invalid += 1
@@ -0,0 +1,318 @@
+"""
+LLM backends for Lumora AI.
+
+main.py never talks to a provider SDK directly; it asks ``initialize_model()``
+for a model object and calls ``generate_content()`` on it. Provider SDKs are
+imported by ``configure()`` on first use rather than when the app is imported. The backend that
+builds that object is chosen with the LLM_BACKEND environment variable:
+
+    gemini  - Google Gemini through google-generativeai (default)
+    stub    - local deterministic responses, no network, for load tests
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+
+def _env_int(name, default):
+    """Read an integer setting from the environment."""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name, default):
+    """Read a float setting from the environment."""
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+_configure_lock = threading.Lock()
+
+
+class LLMBackend:
+    """Base class for model providers."""
+
+    name = 'base'
+    _configured = False
+
+    def is_configured(self):
+        """Return True when the backend can serve requests."""
+        return True
+
+    def configure(self):
+        """Perform one-time provider setup."""
+
+    def ensure_configured(self):
+        """Run configure() once: on the first model call, or in the gunicorn master before fork."""
+        if not self._configured:
+            with _configure_lock:
+                if not self._configured:
+                    self.configure()
+                    self._configured = True
+
+    def create_model(self, generation_config, system_instruction):
+        """Return an object exposing generate_content(contents, stream=False)."""
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through the google-generativeai SDK."""
+
+    name = 'gemini'
+
+    def __init__(self, api_key=None, model_name='gemini-1.5-flash'):
+        self.api_key = api_key if api_key is not None else os.getenv('GEMINI_API_KEY')
+        self.model_name = model_name
+
+    def is_configured(self):
+        return bool(self.api_key)
+
+    def configure(self):
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key)
+        print("Gemini API configured successfully!")
+
+    def create_model(self, generation_config, system_instruction):
+        import google.generativeai as genai
+        return genai.GenerativeModel(
+            self.model_name,
+            generation_config=generation_config,
+            system_instruction=system_instruction
+        )
+
+
+def parse_latency(spec):
+    """Parse a latency distribution into a function returning milliseconds, or None for no delay.
+
+        <ms> or fixed:<ms>                    always <ms>
+        uniform:<low ms>:<high ms>
+        lognormal:<median ms>:<sigma>         long-tailed, like a loaded API
+        bimodal:<fast ms>:<slow ms>:<slow fraction>
+    """
+    spec = (spec or '').strip()
+    kind, _, args = spec.partition(':') if ':' in spec else ('fixed', '', spec)
+    try:
+        values = [float(value) for value in args.split(':')] if args else []
+        if kind == 'fixed' and len(values) == 1:
+            ms = values[0]
+            return (lambda: ms) if ms > 0 else None
+        if kind == 'uniform' and len(values) == 2:
+            return lambda: random.uniform(values[0], values[1])
+        if kind == 'lognormal' and len(values) == 2:
+            return lambda: random.lognormvariate(math.log(values[0]), values[1])
+        if kind == 'bimodal' and len(values) == 3:
+            return lambda: values[1] if random.random() < values[2] else values[0]
+    except ValueError:
+        pass
+    if spec:
+        print(f"Ignoring invalid stub latency '{spec}'")
+    return None
+
+
+class StubModelError(RuntimeError):
+    """Failure injected by STUB_LLM_ERROR_RATE."""
+
+
+class StubBackend(LLMBackend):
+    """Offline backend producing deterministic responses for benchmarking.
+
+    Responses are seeded from the prompt, so the same request always gets the
+    same answer. Size and timing are controlled through the environment:
+
+        STUB_LLM_RESPONSE_WORDS   words in a chat answer (default 200)
+        STUB_LLM_LATENCY_MS       delay before the first byte (default 0), or a
+                                  distribution such as lognormal:800:0.6 (see
+                                  parse_latency); drawn independently per call
+        STUB_LLM_ERROR_RATE       fraction of calls that raise StubModelError (default 0)
+        STUB_LLM_TOKEN_DELAY_MS   delay between streamed chunks (default 0)
+        STUB_LLM_CHUNK_WORDS      words per streamed chunk (default 8)
+    """
+
+    name = 'stub'
+
+    def __init__(self, response_words=None, latency_ms=None, token_delay_ms=None, chunk_words=None, error_rate=None):
+        self.response_words = response_words if response_words is not None else _env_int('STUB_LLM_RESPONSE_WORDS', 200)
+        self.latency_ms = latency_ms if latency_ms is not None else os.getenv('STUB_LLM_LATENCY_MS', '0')
+        self.sample_latency_ms = parse_latency(str(self.latency_ms))
+        self.error_rate = error_rate if error_rate is not None else _env_float('STUB_LLM_ERROR_RATE', 0)
+        self.token_delay_ms = token_delay_ms if token_delay_ms is not None else _env_float('STUB_LLM_TOKEN_DELAY_MS', 0)
+        self.chunk_words = max(1, chunk_words if chunk_words is not None else _env_int('STUB_LLM_CHUNK_WORDS', 8))
+
+    def configure(self):
+        print(f"Stub LLM backend active ({self.response_words} words, latency {self.latency_ms} ms)")
+
+    def create_model(self, generation_config, system_instruction):
+        return StubModel(self, generation_config, system_instruction)
+
+
+_STUB_VOCABULARY = (
+    "data structure algorithm normalization database index query table key relation "
+    "process memory thread network protocol packet layer model learning function value "
+    "system design pattern object class method variable loop array list tree graph node "
+    "edge search sort complexity time space cache storage transaction schema join "
+    "example concept definition property rule result step approach student topic"
+).split()
+
+
+def _prompt_text(contents):
+    """Flatten generate_content() input into the text parts of the prompt."""
+    if isinstance(contents, str):
+        return contents
+    parts = []
+    for item in contents or []:
+        if isinstance(item, str):
+            parts.append(item)
+        elif isinstance(item, dict) and isinstance(item.get('data'), (bytes, bytearray)):
+            parts.append(hashlib.sha256(item['data']).hexdigest())
+    return "\n".join(parts)
+
+
+def _response(text, prompt_tokens, output_tokens):
+    """Build an object shaped like a Gemini GenerateContentResponse."""
+    part = SimpleNamespace(text=text)
+    candidate = SimpleNamespace(content=SimpleNamespace(parts=[part]), finish_reason=1)
+    usage = SimpleNamespace(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=output_tokens,
+        total_token_count=prompt_tokens + output_tokens
+    )
+    return SimpleNamespace(text=text, candidates=[candidate], usage_metadata=usage)
+
+
+class StubModel:
+    """Model object returned by StubBackend.create_model()."""
+
+    def __init__(self, backend, generation_config=None, system_instruction=None):
+        self.backend = backend
+        self.generation_config = generation_config or {}
+        self.system_instruction = system_instruction or ''
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        """Return a deterministic response (or stream of chunks) for the prompt."""
+        prompt = _prompt_text(contents)
+        rng = random.Random(hashlib.sha256(prompt.encode('utf-8')).digest())
+        text = self._compose(prompt, rng)
+        prompt_tokens = (len(self.system_instruction) + len(prompt)) // 4
+        output_tokens = len(text) // 4
+
+        if self.backend.sample_latency_ms:
+            time.sleep(self.backend.sample_latency_ms() / 1000.0)
+        if self.backend.error_rate and random.random() < self.backend.error_rate:
+            raise StubModelError('Injected stub model error')
+
+        if not stream:
+            return _response(text, prompt_tokens, output_tokens)
+        return StubStreamResponse(text, prompt_tokens, output_tokens,
+                                  self.backend.chunk_words, self.backend.token_delay_ms)
+
+    def _compose(self, prompt, rng):
+        """Pick a response shape matching what the calling endpoint expects."""
+        if '"flashcards"' in prompt:
+            return self._flashcards(rng)
+        if '"mcqs"' in prompt:
+            match = re.search(r'Create (\d+) multiple choice', prompt)
+            return self._mcqs(rng, int(match.group(1)) if match else 5)
+        if '"videos"' in prompt:
+            return self._videos(rng)
+        if 'natural voice conversation' in prompt:
+            return self._sentences(rng, 3)
+        return self._answer(rng, self.backend.response_words)
+
+    def _words(self, rng, count):
+        return " ".join(rng.choice(_STUB_VOCABULARY) for _ in range(count))
+
+    def _sentences(self, rng, count):
+        return " ".join(self._words(rng, rng.randint(8, 14)).capitalize() + "." for _ in range(count))
+
+    def _answer(self, rng, words):
+        """Markdown-style answer in the layout the system instruction asks for."""
+        paragraphs = []
+        remaining = max(words, 1)
+        section = 1
+        while remaining > 0:
+            take = min(remaining, rng.randint(20, 40))
+            paragraphs.append(f"**{section}. {self._words(rng, 3).title()}**")
+            paragraphs.append(f"• **{self._words(rng, 2).title()}:** {self._words(rng, take)}.")
+            remaining -= take
+            section += 1
+        return "\n\n".join(paragraphs)
+
+    def _flashcards(self, rng):
+        cards = [{'front': f"What is {self._words(rng, 2)}?", 'back': self._sentences(rng, 2)}
+                 for _ in range(8)]
+        return "```json\n" + json.dumps({'flashcards': cards}, indent=2) + "\n```"
+
+    def _mcqs(self, rng, count):
+        mcqs = [{
+            'question': f"Which statement about {self._words(rng, 2)} is correct?",
+            'options': [self._words(rng, 5).capitalize() for _ in range(4)],
+            'correct': rng.randint(0, 3)
+        } for _ in range(count)]
+        return "```json\n" + json.dumps({'mcqs': mcqs}, indent=2) + "\n```"
+
+    def _videos(self, rng):
+        alphabet = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-'
+        videos = []
+        for _ in range(6):
+            video_id = ''.join(rng.choice(alphabet) for _ in range(11))
+            videos.append({
+                'title': self._words(rng, 5).title(),
+                'channel': rng.choice(['freeCodeCamp.org', 'Traversy Media', 'Telusko', 'Apna College']),
+                'description': self._sentences(rng, 2),
+                'duration': f"{rng.randint(5, 90)}:{rng.randint(0, 59):02d}",
+                'views': f"{rng.randint(100, 999)}K views",
+                'published': f"{rng.randint(1, 11)} months ago",
+                'url': f"https://www.youtube.com/watch?v={video_id}",
+                'thumbnail': f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg"
+            })
+        return "```json\n" + json.dumps({'videos': videos}, indent=2) + "\n```"
+
+
+class StubStreamResponse:
+    """Iterable of response chunks, mirroring generate_content(stream=True)."""
+
+    def __init__(self, text, prompt_tokens, output_tokens, chunk_words, token_delay_ms):
+        resolved = _response(text, prompt_tokens, output_tokens)
+        self.text = text
+        self.candidates = resolved.candidates
+        self.usage_metadata = resolved.usage_metadata
+        self._chunk_words = chunk_words
+        self._token_delay_ms = token_delay_ms
+
+    def __iter__(self):
+        # Split on whitespace but keep it, so joined chunks reproduce the text exactly
+        pieces = re.split(r'(\s+)', self.text)
+        words_per_chunk = self._chunk_words * 2
+        for start in range(0, len(pieces), words_per_chunk):
+            if start and self._token_delay_ms:
+                time.sleep(self._token_delay_ms / 1000.0)
+            chunk = ''.join(pieces[start:start + words_per_chunk])
+            yield _response(chunk, 0, len(chunk) // 4)
+
+    def resolve(self):
+        """Match the SDK API; stub responses are always fully resolved."""
+        return self
+
+
+BACKENDS = {
+    GeminiBackend.name: GeminiBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+def get_backend(name=None):
+    """Instantiate the backend named by ``name`` or the LLM_BACKEND variable."""
+    name = (name or os.getenv('LLM_BACKEND', GeminiBackend.name)).strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{name}'. Choose one of: {', '.join(sorted(BACKENDS))}")
+    return BACKENDS[name]()
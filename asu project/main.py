@@ -1,22 +1,20 @@
-from flask import Flask, render_template, request, jsonify, Response, stream_with_context, session, redirect, url_for, send_file
-import google.generativeai as genai
+from flask import Flask, request, jsonify, Response, stream_with_context, session, redirect, url_for, send_file, g
 import os
 import json
 import uuid
 import base64
 import io
 import re
-import PyPDF2
-try:
-    from docx import Document
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
+import importlib.util
+
+# PyPDF2 and python-docx are imported by the first upload that needs them
+DOCX_AVAILABLE = importlib.util.find_spec('docx') is not None
+if not DOCX_AVAILABLE:
     print("Warning: python-docx not available. DOCX file processing will be disabled.")
 
 from werkzeug.utils import secure_filename
 import tempfile
-from datetime import datetime
+from datetime import datetime, timezone
 import threading
 import time
 import hashlib
@@ -26,28 +24,76 @@ import secrets
 from dotenv import load_dotenv
 load_dotenv()
 
+from llm_backend import get_backend
+from assets import CACHE_CONTROL as ASSET_CACHE_CONTROL, AssetManifest
+from page_cache import PageCache
+from answer_cache import AnswerCache
+from sse import ReplayStore, coalesce, parse_last_event_id, sse_event
+from chat_store import BLOB_FIELDS, ChatSession, Message, SessionIndex, format_id, isoformat, parse_id
+from session_store import RESIDENT_MESSAGES, SessionStore
+from search_index import SearchIndex, snippet
+from json_stream import ArrayItemParser
+from tts import (AudioCache, cache_key as tts_cache_key, clean_text_for_speech, pop_complete_sentences,
+                 preload as preload_tts, split_sentences, synthesize as synthesize_speech, synthesize_async,
+                 synthesize_segments)
+import metrics
+import tracing
+from usage import UsageStore, parse_quotas
+from circuit_breaker import CircuitBreaker, ResultCache
+from resilience import LatencyTracker, ResilientCaller, RetryBudget, parse_deadlines
+from rate_limit import MemoryBuckets, RateLimiter, SQLiteBuckets, parse_limit, parse_limits
+from server_session import MemorySessionStore, SQLiteSessionStore, ServerSessionInterface
+
 # Flask app setup
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 16MB
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', secrets.token_hex(32))
 
+# Login sessions are stored server-side and the cookie only holds an opaque id, so it stays small
+# and works on every gunicorn worker. SESSION_STORE=sqlite (default, shared) or memory (one worker);
+# sessions expire after SESSION_LIFETIME idle seconds, and each worker caches lookups for
+# SESSION_CACHE_SECONDS
+app.session_interface = ServerSessionInterface(
+    SQLiteSessionStore(os.getenv('SESSION_DB_PATH', os.path.join('data', 'web_sessions.db')))
+    if os.getenv('SESSION_STORE', 'sqlite') == 'sqlite' else MemorySessionStore(),
+    lifetime=int(os.getenv('SESSION_LIFETIME', str(7 * 86400))),
+    cache_seconds=float(os.getenv('SESSION_CACHE_SECONDS', '30'))
+)
+
+# Minified, fingerprinted and precompressed copies of static/, served from /assets
+asset_manifest = AssetManifest(app.static_folder).build()
+
+def asset_version():
+    """Fingerprint generation of the static assets, rebuilt on every check in debug mode."""
+    return (asset_manifest.build() if app.debug else asset_manifest).version
+
+# Rendered page routes, re-rendered when their template or asset fingerprints change (PAGE_CACHE=0 disables)
+page_cache = PageCache(app, version=asset_version, enabled=os.getenv('PAGE_CACHE', '1') != '0')
+
 # File upload folder (optional)
 UPLOAD_FOLDER = os.path.join(tempfile.gettempdir(), 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-# Configure Gemini API key
-api_key = os.getenv('GEMINI_API_KEY')
-if not api_key:
+# Configure the LLM backend (Gemini by default, LLM_BACKEND=stub for offline benchmarking)
+llm_backend = get_backend()
+if not llm_backend.is_configured():
     raise ValueError("GEMINI_API_KEY is not set. Please add it to your environment or .env file.")
-
-else:
-    genai.configure(api_key=api_key)
-    print("Gemini API configured successfully!")
+# The provider SDK is imported on the first model call, or by preload() in the gunicorn master
 
 # Session memory for voice chat
 session_memory = {}
 
+# Voice chat languages: name used in the prompt and gTTS language code
+VOICE_LANGUAGES = {
+    'en': {'name': 'English', 'tts': 'en'},
+    'ta': {'name': 'Tamil (தமிழ்)', 'tts': 'ta'},
+    'hi': {'name': 'Hindi (हिन्दी)', 'tts': 'hi'},
+    'te': {'name': 'Telugu (తెలుగు)', 'tts': 'te'},
+    'kn': {'name': 'Kannada (ಕನ್ನಡ)', 'tts': 'kn'},
+    'ml': {'name': 'Malayalam (മലയാളം)', 'tts': 'ml'}
+}
+
 # User authentication
 USERS = {
     'Dhinesh': hashlib.sha256('dhineshsin<3'.encode()).hexdigest(),
@@ -55,14 +101,295 @@ USERS = {
     'Dhaanush': hashlib.sha256('220301012'.encode()).hexdigest()
 }
 
-# In-memory storage for chat history (in production, use a database)
-chat_sessions = {}
+# Chat history by session id. Sessions idle for SESSION_IDLE_TTL seconds, and the least recently
+# used ones once resident sessions exceed SESSION_MEMORY_BUDGET_MB, are spilled to SQLite and
+# loaded back on their next use (0 disables either limit; both 0 keeps everything in memory)
+chat_sessions = SessionStore(
+    os.getenv('SESSION_SPILL_PATH', os.path.join('data', 'sessions.db')),
+    idle_ttl=int(os.getenv('SESSION_IDLE_TTL', '1800')),
+    max_bytes=int(float(os.getenv('SESSION_MEMORY_BUDGET_MB', '0')) * 1024 * 1024),
+    sweep_seconds=float(os.getenv('SESSION_SWEEP_SECONDS', '30')),
+    max_age=int(os.getenv('SESSION_SPILL_MAX_AGE', str(30 * 86400)))
+)
 current_session_id = None
+# Each user's session ids ordered by last activity, for the session list
+session_index = SessionIndex()
+
+# Full-text index over every user's chat messages, for /api/search
+search_index = SearchIndex()
+
+# Session export/import: NDJSON responses are written in chunks of about EXPORT_CHUNK_BYTES,
+# and imported sessions are stored IMPORT_BATCH_SESSIONS at a time
+EXPORT_FORMAT_VERSION = 1
+EXPORT_CHUNK_BYTES = 64 * 1024
+IMPORT_BATCH_SESSIONS = 50
+IMPORT_BATCH_MESSAGES = 2000
 
 # Memory management configuration
 MAX_CONTEXT_MESSAGES = 20  # Keep last 20 message pairs for context
 CONTEXT_WINDOW_TOKENS = 8000  # Approximate token limit for context
 
+# Admin users (comma separated) may request per-request profiles
+ADMIN_USERS = {user.strip() for user in os.getenv('ADMIN_USERS', '').split(',') if user.strip()}
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+
+# Disk cache for synthesized speech, shared by all workers
+tts_cache = AudioCache(
+    os.getenv('TTS_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'lumora_tts_cache')),
+    int(os.getenv('TTS_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+)
+TTS_CACHE_MAX_AGE = int(os.getenv('TTS_CACHE_MAX_AGE', '86400'))  # Browser cache lifetime for spoken text
+
+# Cache of answers to first-turn chat questions without attachments (ANSWER_CACHE_TTL=0 disables it)
+answer_cache = AnswerCache(
+    threshold=float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.9')),
+    ttl=int(os.getenv('ANSWER_CACHE_TTL', '86400')),
+    max_entries=int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', '2000'))
+)
+
+# Chat streaming: frames are flushed every SSE_FLUSH_CHARS characters or SSE_FLUSH_MS,
+# and kept for SSE_REPLAY_TTL seconds so dropped clients can resume with Last-Event-ID
+SSE_FLUSH_CHARS = int(os.getenv('SSE_FLUSH_CHARS', '64'))
+SSE_FLUSH_MS = float(os.getenv('SSE_FLUSH_MS', '50'))
+SSE_WORD_DELAY_MS = float(os.getenv('SSE_WORD_DELAY_MS', '8'))  # typing pace of streamed answers
+replay_store = ReplayStore(ttl=int(os.getenv('SSE_REPLAY_TTL', '600')))
+
+# Token usage accounting; DAILY_TOKEN_QUOTA=0 means unlimited. Token prices are
+# per million tokens and price the usage report
+usage_store = UsageStore(
+    os.getenv('USAGE_DB_PATH', os.path.join('data', 'usage.db')),
+    daily_quota=int(os.getenv('DAILY_TOKEN_QUOTA', '0') or 0),
+    endpoint_quotas=parse_quotas(os.getenv('ENDPOINT_TOKEN_QUOTAS')),
+    flush_seconds=float(os.getenv('USAGE_FLUSH_SECONDS', '5')),
+    prompt_price=float(os.getenv('PROMPT_TOKEN_PRICE', '0') or 0),
+    output_price=float(os.getenv('OUTPUT_TOKEN_PRICE', '0') or 0)
+)
+
+# Per-user token buckets as "<requests>/<seconds>": expensive routes call the model or synthesize
+# speech, cheap ones read the user's own history. RATE_LIMITS overrides single endpoints
+# ("chat=10/60,tts=0", 0 = unlimited). RATE_LIMIT_STORE=sqlite (default) shares the buckets
+# between gunicorn workers, memory keeps them per worker; RATE_LIMIT_ENABLED=0 disables limiting
+RATE_LIMIT_STORE = os.getenv('RATE_LIMIT_STORE', 'sqlite')
+rate_limiter = RateLimiter(
+    SQLiteBuckets(os.getenv('RATE_LIMIT_DB_PATH', os.path.join('data', 'rate_limits.db')))
+    if RATE_LIMIT_STORE == 'sqlite' else MemoryBuckets(),
+    tiers={
+        'expensive': parse_limit(os.getenv('RATE_LIMIT_EXPENSIVE', '20/60')),
+        'cheap': parse_limit(os.getenv('RATE_LIMIT_CHEAP', '240/60')),
+    },
+    overrides=parse_limits(os.getenv('RATE_LIMITS')),
+    enabled=os.getenv('RATE_LIMIT_ENABLED', '1') != '0'
+)
+
+# Model calls wait at most MODEL_DEADLINE_SECONDS (MODEL_DEADLINES overrides single endpoints,
+# "chat=60,voice_chat=30"). A second attempt is hedged once a call has run longer than the
+# MODEL_HEDGE_PERCENTILE latency of recent calls (0 disables hedging), and a failed call is retried
+# once; hedges and retries spend a per-worker budget of MODEL_RETRY_BUDGET_RATIO extra attempts per
+# call plus MODEL_RETRY_BUDGET_PER_SECOND. MODEL_RESILIENCE_ENABLED=0 calls the model directly
+model_caller = ResilientCaller(
+    deadlines=parse_deadlines(os.getenv('MODEL_DEADLINES', 'voice_chat=30,youtube_suggestions=30')),
+    default_deadline=float(os.getenv('MODEL_DEADLINE_SECONDS', '60')),
+    hedge_percentile=float(os.getenv('MODEL_HEDGE_PERCENTILE', '95')),
+    budget=RetryBudget(
+        ratio=float(os.getenv('MODEL_RETRY_BUDGET_RATIO', '0.1')),
+        min_per_second=float(os.getenv('MODEL_RETRY_BUDGET_PER_SECOND', '0.5'))
+    ),
+    tracker=LatencyTracker(min_samples=int(os.getenv('MODEL_HEDGE_MIN_SAMPLES', '20'))),
+    enabled=os.getenv('MODEL_RESILIENCE_ENABLED', '1') != '0'
+)
+
+# The model backend's circuit opens when, among at least MODEL_BREAKER_MIN_CALLS calls in the last
+# MODEL_BREAKER_WINDOW_SECONDS, the MODEL_BREAKER_ERROR_RATE fraction failed or the
+# MODEL_BREAKER_SLOW_RATE fraction took MODEL_BREAKER_SLOW_SECONDS or more (time to first chunk for
+# streams). While open, calls fail at once or get the last result of the same call (up to
+# MODEL_RESULT_CACHE_ENTRIES kept), and after MODEL_BREAKER_OPEN_SECONDS one probe call is let through
+model_breaker = CircuitBreaker(
+    llm_backend.name,
+    window_seconds=float(os.getenv('MODEL_BREAKER_WINDOW_SECONDS', '60')),
+    min_calls=int(os.getenv('MODEL_BREAKER_MIN_CALLS', '10')),
+    error_rate=float(os.getenv('MODEL_BREAKER_ERROR_RATE', '0.5')),
+    slow_seconds=float(os.getenv('MODEL_BREAKER_SLOW_SECONDS', '15')),
+    slow_rate=float(os.getenv('MODEL_BREAKER_SLOW_RATE', '0.5')),
+    open_seconds=float(os.getenv('MODEL_BREAKER_OPEN_SECONDS', '30')),
+    enabled=os.getenv('MODEL_BREAKER_ENABLED', '1') != '0'
+)
+model_results = ResultCache(int(os.getenv('MODEL_RESULT_CACHE_ENTRIES', '256')))
+
+# Metrics exposed on /metrics (set METRICS_TOKEN to require a bearer token)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+REQUEST_SECONDS = metrics.Histogram('lumora_http_request_duration_seconds',
+                                    'Time to produce a response, per route', ('endpoint', 'method', 'status'))
+MODEL_CALL_SECONDS = metrics.Histogram('lumora_model_call_seconds',
+                                       'Duration of generate_content calls', ('endpoint',))
+DOCUMENT_EXTRACTION_SECONDS = metrics.Histogram('lumora_document_extraction_seconds',
+                                                'Text extraction time for uploaded documents', ('file_type',))
+TTS_SYNTHESIS_SECONDS = metrics.Histogram('lumora_tts_synthesis_seconds',
+                                          'Speech synthesis time', ('language',))
+JSON_EXTRACTION_SECONDS = metrics.Histogram('lumora_json_extraction_seconds',
+                                            'Time to locate and parse JSON in model output', ('endpoint',))
+CONTEXT_BUILD_SECONDS = metrics.Histogram('lumora_chat_context_build_seconds',
+                                          'Time to build and trim chat conversation context')
+SEARCH_SECONDS = metrics.Histogram('lumora_chat_search_seconds',
+                                   'Time to search a user\'s chat history')
+SSE_DELIVERY_SECONDS = metrics.Histogram('lumora_sse_delivery_seconds',
+                                         'Time to stream a chat answer to the client')
+FALLBACK_TOTAL = metrics.Counter('lumora_fallback_total',
+                                 'Responses produced by a fallback path instead of model JSON', ('path',))
+metrics.Gauge('lumora_model_retry_budget', 'Hedges and retries the workers may start now',
+              callback=lambda: model_caller.budget.balance())
+metrics.Gauge('lumora_chat_sessions', 'Chat sessions held in memory',
+              callback=lambda: len(chat_sessions))
+# Counted in SQLite by the worker answering the scrape; lumora_chat_messages is kept by SessionStore
+metrics.Gauge('lumora_chat_sessions_spilled', 'Idle chat sessions spilled to disk',
+              callback=lambda: chat_sessions.spilled_count(), shared=True)
+metrics.Gauge('lumora_voice_sessions', 'Voice chat sessions in session_memory',
+              callback=lambda: len(session_memory))
+VOICE_EXCHANGES = metrics.Gauge('lumora_voice_exchanges', 'Voice chat exchanges in session_memory')
+
+@app.before_request
+def start_request_timer():
+    """Remember when the request started for the route latency histogram."""
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def start_request_trace():
+    """Trace the request, profiling it when an admin asks or it is sampled."""
+    if request.endpoint in ('static', 'serve_asset'):
+        return
+    profile_header = request.headers.get(tracing.PROFILE_HEADER)
+    profile = bool(profile_header) and (is_admin() or bool(PROFILE_TOKEN and profile_header == PROFILE_TOKEN))
+    tracing.start_trace(
+        request.headers.get('X-Request-ID'),
+        profile=profile,
+        method=request.method,
+        path=request.path,
+        endpoint=request.endpoint,
+        user=session.get('user')
+    )
+
+@app.after_request
+def record_request_metrics(response):
+    """Observe the route latency once the view has produced its response."""
+    started = g.pop('request_started', None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                request.endpoint or 'unmatched', request.method, str(response.status_code))
+    rate_limit_decision = g.pop('rate_limit', None)
+    if rate_limit_decision is not None:
+        response.headers.update(rate_limit_decision.headers())
+    trace = g.get('trace')
+    if trace is not None:
+        response.headers['X-Request-ID'] = trace.request_id
+        status = response.status_code
+        if response.is_streamed and not response.direct_passthrough:
+            # Generators close after the last SSE frame, so the trace covers delivery too
+            response.call_on_close(lambda: tracing.finish_trace(trace, status=status))
+        else:
+            tracing.finish_trace(trace, status=status)
+    return response
+
+def is_admin():
+    """Check whether the logged-in user is listed in ADMIN_USERS."""
+    return session.get('user') in ADMIN_USERS
+
+def model_result_key(endpoint, contents, stream=False):
+    """Key of a model call (endpoint, streaming and every prompt part) in the circuit breaker's result cache."""
+    digest = hashlib.sha256(f"{endpoint}\0{'stream' if stream else ''}\0".encode('utf-8'))
+    for part in [contents] if isinstance(contents, str) else contents:
+        if isinstance(part, str):
+            digest.update(part.encode('utf-8'))
+        elif isinstance(part, dict) and isinstance(part.get('data'), (bytes, bytearray)):
+            digest.update(part['data'])
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def call_model(model, contents, endpoint, stream=False, **kwargs):
+    """Call generate_content on ``model`` through ``model_caller`` and record how long it took.
+
+    With ``stream=True`` this returns a generator of text chunks instead. Raises
+    DeadlineExceeded when the endpoint's deadline passes first, and
+    CircuitOpenError while the backend's circuit is open and the same call has
+    no cached result.
+    """
+    if stream:
+        return stream_model(model, contents, endpoint, **kwargs)
+    key = model_result_key(endpoint, contents)
+    if not model_breaker.allow():
+        tracing.annotate(circuit=model_breaker.state)
+        return model_breaker.short_circuit(endpoint, model_results.get(key))
+    started = time.perf_counter()
+    try:
+        with MODEL_CALL_SECONDS.time(endpoint), tracing.span('model_call', endpoint=endpoint):
+            response = model_caller.call(endpoint, lambda: model.generate_content(contents, **kwargs))
+    except Exception:
+        model_breaker.record(False, time.perf_counter() - started)
+        raise
+    model_breaker.record(True, time.perf_counter() - started)
+    model_results.put(key, response)
+    record_token_usage(endpoint, contents, response)
+    return response
+
+def stream_model(model, contents, endpoint, **kwargs):
+    """Yield text chunks of a streamed generate_content call as they arrive."""
+    key = model_result_key(endpoint, contents, stream=True)
+    if not model_breaker.allow():
+        tracing.annotate(circuit=model_breaker.state)
+        yield from model_breaker.short_circuit(endpoint, model_results.get(key))
+        return
+    parts = []
+    started = time.perf_counter()
+    first_chunk_seconds = None
+    try:
+        with MODEL_CALL_SECONDS.time(endpoint), tracing.span('model_call', endpoint=endpoint, stream=True):
+            response = model_caller.stream(endpoint, lambda: model.generate_content(contents, stream=True, **kwargs))
+            for chunk in response:
+                if first_chunk_seconds is None:
+                    first_chunk_seconds = time.perf_counter() - started
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. only safety ratings)
+                    continue
+                if text:
+                    parts.append(text)
+                    yield text
+    except Exception:
+        model_breaker.record(False, time.perf_counter() - started)
+        raise
+    model_breaker.record(True, first_chunk_seconds if first_chunk_seconds is not None else time.perf_counter() - started)
+    model_results.put(key, parts)
+    # Usage metadata is only complete once the stream is exhausted
+    record_token_usage(endpoint, contents, response.source, ''.join(parts))
+
+def record_token_usage(endpoint, contents, response, response_text=None):
+    """Record token usage reported by the model, estimating when it is missing."""
+    try:
+        usage_metadata = getattr(response, 'usage_metadata', None)
+        prompt_tokens = getattr(usage_metadata, 'prompt_token_count', 0) or 0
+        output_tokens = getattr(usage_metadata, 'candidates_token_count', 0) or 0
+        estimated = not (prompt_tokens or output_tokens)
+        if estimated:
+            if isinstance(contents, str):
+                contents = [contents]
+            prompt_text = SYSTEM_INSTRUCTION + ''.join(part for part in contents if isinstance(part, str))
+            prompt_tokens = estimate_token_count(prompt_text)
+            if response_text is not None:
+                output_tokens = estimate_token_count(response_text)
+            elif response.candidates and response.candidates[0].content.parts:
+                output_tokens = estimate_token_count(response.candidates[0].content.parts[0].text)
+        usage_store.record(session.get('user'), endpoint, prompt_tokens, output_tokens, estimated=estimated)
+        tracing.annotate(prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+    except Exception as e:
+        print(f"Error recording token usage: {str(e)}")
+
+def extract_json_object(response_text, endpoint):
+    """Find and parse the JSON object in a model response (None if there is none)."""
+    with JSON_EXTRACTION_SECONDS.time(endpoint), tracing.span('json_extraction', endpoint=endpoint):
+        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+        if not json_match:
+            return None
+        return json.loads(json_match.group())
+
 def require_auth(f):
     """Decorator to require authentication"""
     def decorated_function(*args, **kwargs):
@@ -75,18 +402,53 @@ def require_auth(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
-def initialize_model():
-    """Initialize the Nova AI model with professional ChatGPT-style behavior."""
-    generation_config = {
-        "temperature": 0.7,
-        "top_p": 0.9,
-        "top_k": 40,
-        "max_output_tokens": 2048,
-        "candidate_count": 1,
-    }
-    
-    # Lumora AI system instruction with perfect ChatGPT/Gemini formatting
-    system_instruction = """You are Lumora AI, designed to respond exactly like ChatGPT/Gemini with structured, polished, and concise answers.
+def require_admin(f):
+    """Decorator to require a user listed in ADMIN_USERS"""
+    def decorated_function(*args, **kwargs):
+        if 'user' not in session:
+            return jsonify({'success': False, 'message': 'Authentication required'}), 401
+        if not is_admin():
+            return jsonify({'success': False, 'message': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
+def enforce_token_quota(endpoint):
+    """Decorator rejecting requests once the user's daily token quota is used up"""
+    def decorator(f):
+        def decorated_function(*args, **kwargs):
+            exceeded = usage_store.quota_exceeded(session.get('user'), endpoint)
+            if exceeded:
+                return jsonify({'success': False, 'message': f'Usage limit reached ({exceeded}). Please try again tomorrow.'}), 429
+            return f(*args, **kwargs)
+        decorated_function.__name__ = f.__name__
+        return decorated_function
+    return decorator
+
+def rate_limit(endpoint, tier='expensive'):
+    """Decorator taking a request from the user's token bucket for the endpoint"""
+    def decorator(f):
+        def decorated_function(*args, **kwargs):
+            decision = rate_limiter.check(session.get('user') or request.remote_addr, endpoint, tier)
+            if decision is not None:
+                g.rate_limit = decision
+                if not decision.allowed:
+                    return jsonify({'success': False, 'message': f'Too many requests. Please try again in {decision.retry_after} seconds.'}), 429
+            return f(*args, **kwargs)
+        decorated_function.__name__ = f.__name__
+        return decorated_function
+    return decorator
+
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "top_k": 40,
+    "max_output_tokens": 2048,
+    "candidate_count": 1,
+}
+
+# Lumora AI system instruction with perfect ChatGPT/Gemini formatting
+SYSTEM_INSTRUCTION = """You are Lumora AI, designed to respond exactly like ChatGPT/Gemini with structured, polished, and concise answers.
 
 CRITICAL FORMATTING RULES - FOLLOW EXACTLY:
 
@@ -150,12 +512,11 @@ CRITICAL FORMATTING RULES - FOLLOW EXACTLY:
    - Never break character or ignore formatting rules
 
 GOAL: Every response should feel indistinguishable from ChatGPT/Gemini, with rich formatting, adaptive style, and polished presentation."""
-    
-    return genai.GenerativeModel(
-        "gemini-1.5-flash", 
-        generation_config=generation_config,
-        system_instruction=system_instruction
-    )
+
+def initialize_model():
+    """Initialize the Nova AI model with professional ChatGPT-style behavior."""
+    llm_backend.ensure_configured()
+    return llm_backend.create_model(GENERATION_CONFIG, SYSTEM_INSTRUCTION)
 
 def build_conversation_context(messages, max_messages=MAX_CONTEXT_MESSAGES):
     """Build conversation context from message history for continuous memory."""
@@ -169,12 +530,12 @@ def build_conversation_context(messages, max_messages=MAX_CONTEXT_MESSAGES):
     
     # Add conversation history with role indicators
     for msg in recent_messages:
-        role = "Human" if msg['role'] == 'user' else "Assistant"
-        content = msg['content']
+        role = "Human" if msg.role == 'user' else "Assistant"
+        content = msg.content
         
         # Include document content if present
-        if msg.get('document_content'):
-            content = f"[Document: {msg.get('filename', 'uploaded file')}]\n{msg['document_content']}\n\nUser question: {content}"
+        if msg.document_content:
+            content = f"[Document: {msg.filename or 'uploaded file'}]\n{msg.document_content}\n\nUser question: {content}"
         
         context_parts.append(f"{role}: {content}")
     
@@ -212,9 +573,11 @@ def trim_context_if_needed(context, max_tokens=CONTEXT_WINDOW_TOKENS):
     
     return "\n\n".join(trimmed_messages)
 
+@tracing.traced('extract_text_from_pdf')
 def extract_text_from_pdf(file_path):
     """Extract text from PDF file."""
     try:
+        import PyPDF2
         with open(file_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
             text = ""
@@ -224,12 +587,14 @@ def extract_text_from_pdf(file_path):
     except Exception as e:
         return f"Error reading PDF: {str(e)}"
 
+@tracing.traced('extract_text_from_docx')
 def extract_text_from_docx(file_path):
     """Extract text from DOCX file."""
     if not DOCX_AVAILABLE:
         return "Error: DOCX processing not available. Please install python-docx package."
     
     try:
+        from docx import Document
         doc = Document(file_path)
         text = ""
         for paragraph in doc.paragraphs:
@@ -238,6 +603,7 @@ def extract_text_from_docx(file_path):
     except Exception as e:
         return f"Error reading DOCX: {str(e)}"
 
+@tracing.traced('extract_text_from_txt')
 def extract_text_from_txt(file_path):
     """Extract text from TXT file."""
     try:
@@ -252,22 +618,23 @@ def process_uploaded_file(file):
     file_ext = filename.split('.')[-1].lower()
     
     # Save file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_ext}') as temp_file:
+    with tracing.span('save_upload'), tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_ext}') as temp_file:
         file.save(temp_file.name)
         temp_path = temp_file.name
     
     try:
-        if file_ext == 'pdf':
-            content = extract_text_from_pdf(temp_path)
-        elif file_ext == 'docx':
-            if DOCX_AVAILABLE:
-                content = extract_text_from_docx(temp_path)
+        with DOCUMENT_EXTRACTION_SECONDS.time(file_ext), tracing.span('document_extraction', file_type=file_ext):
+            if file_ext == 'pdf':
+                content = extract_text_from_pdf(temp_path)
+            elif file_ext == 'docx':
+                if DOCX_AVAILABLE:
+                    content = extract_text_from_docx(temp_path)
+                else:
+                    content = "Error: DOCX processing not available. Please install python-docx package."
+            elif file_ext == 'txt':
+                content = extract_text_from_txt(temp_path)
             else:
-                content = "Error: DOCX processing not available. Please install python-docx package."
-        elif file_ext == 'txt':
-            content = extract_text_from_txt(temp_path)
-        else:
-            content = f"Unsupported file type: {file_ext}"
+                content = f"Unsupported file type: {file_ext}"
         
         return content
     finally:
@@ -279,7 +646,7 @@ def process_uploaded_file(file):
 def login():
     """Handle login page and authentication."""
     if request.method == 'GET':
-        return render_template('login.html')
+        return page_cache.response('login.html')
     
     data = request.get_json()
     username = data.get('username', '').strip()
@@ -291,6 +658,8 @@ def login():
     # Check credentials
     password_hash = hashlib.sha256(password.encode()).hexdigest()
     if username in USERS and USERS[username] == password_hash:
+        # A new session id on login, so an id set before authentication cannot be reused
+        session.regenerate()
         session['user'] = username
         return jsonify({'success': True, 'message': 'Login successful'})
     else:
@@ -314,43 +683,68 @@ def index():
 @require_auth
 def student_details():
     """Serve the student details page."""
-    return render_template('student_details.html')
+    return page_cache.response('student_details.html')
 
 @app.route('/welcome')
 @require_auth
 def welcome():
     """Serve the welcome dashboard page."""
-    return render_template('welcome.html')
+    return page_cache.response('welcome.html')
 
 @app.route('/chatbot')
 @require_auth
 def chatbot():
     """Serve the main chatbot page."""
-    return render_template('index.html')
+    return page_cache.response('index.html')
 
 @app.route('/flashcards')
 @require_auth
 def flashcards():
     """Serve the flashcards page."""
-    return render_template('flashcards.html')
+    return page_cache.response('flashcards.html')
 
 @app.route('/mcq-generator')
 @require_auth
 def mcq_generator():
     """Serve the MCQ generator page."""
-    return render_template('mcq_generator.html')
+    return page_cache.response('mcq_generator.html')
 
 @app.route('/youtube-suggestions')
 @require_auth
 def youtube_suggestions():
     """Serve the YouTube suggestions page."""
-    return render_template('youtube_suggestions.html')
+    return page_cache.response('youtube_suggestions.html')
 
 @app.route('/voice-assistant')
 @require_auth
 def voice_assistant():
     """Serve the voice assistant page."""
-    return render_template('voice_assistant.html')
+    return page_cache.response('voice_assistant.html')
+
+@app.template_global()
+def asset_url(filename):
+    """URL of a static file under its content fingerprint, for long-lived caching."""
+    if app.debug:
+        # Pick up edits without a restart during development
+        asset_manifest.build()
+    name = asset_manifest.name_for(filename)
+    if name is None:
+        return url_for('static', filename=filename)
+    return url_for('serve_asset', name=name)
+
+@app.route('/assets/<path:name>')
+def serve_asset(name):
+    """Serve a fingerprinted asset in the best encoding the browser accepts."""
+    asset = asset_manifest.get(name)
+    if asset is None:
+        return jsonify({'error': 'Asset not found'}), 404
+    headers = {'Cache-Control': ASSET_CACHE_CONTROL, 'ETag': asset.etag, 'Vary': 'Accept-Encoding'}
+    if asset.etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers=headers)
+    encoding = asset.negotiate(request.headers.get('Accept-Encoding'))
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return Response(asset.variants[encoding], mimetype=asset.mimetype, headers=headers)
 
 @app.route('/api/student-details', methods=['POST'])
 @require_auth
@@ -400,26 +794,69 @@ def get_student_info():
         print(f"Error getting student info: {str(e)}")
         return jsonify({'success': False, 'message': 'Failed to get student info'}), 500
 
-@app.route('/api/generate-flashcards', methods=['POST'])
-@require_auth
-def generate_flashcards():
-    """Generate flash cards from content using Gemini API."""
+def event_stream(events):
+    """Response streaming SSE frames from a generator without proxy buffering."""
+    return Response(stream_with_context(events),
+                    mimetype='text/event-stream',
+                    headers={
+                        'Cache-Control': 'no-cache',
+                        'X-Accel-Buffering': 'no'
+                    })
+
+def stream_json_items(endpoint, prompt, key, kind, accept=None, limit=None, minimum=1, fallback=None):
+    """SSE frames with each item of the ``key`` array in the model's JSON answer, as soon as it is complete.
+
+    ``accept`` cleans an item or returns None to drop it, and at most ``limit``
+    items are sent. If the answer yields fewer than ``minimum`` items,
+    ``fallback(response_text, sent)`` supplies more. Frames are 'start', one
+    ``kind`` frame per item ({'index', kind: item}), then 'end' or 'error'.
+    """
+    def frame(payload):
+        return f"data: {json.dumps(payload)}\n\n"
+
+    def item_frame(item):
+        if sent == 0:
+            tracing.annotate(first_item_ms=round((time.perf_counter() - started) * 1000, 3))
+        return frame({'type': kind, 'index': sent, kind: item})
+
+    started = time.perf_counter()
+    sent = 0
+    parse_seconds = 0.0
+    parts = []
+    yield frame({'type': 'start', 'kind': kind})
     try:
-        data = request.get_json()
-        content = data.get('content', '').strip()
-        
-        if not content:
-            return jsonify({'success': False, 'message': 'No content provided'})
-        
-        # Check if API key is configured
-        if not api_key:
-            return jsonify({'success': False, 'message': 'AI service not configured. Please set GEMINI_API_KEY environment variable.'}), 500
-        
-        # Initialize Gemini model
         model = initialize_model()
-        
-        # Create prompt for flash card generation
-        prompt = f"""Create flash cards from the following content. Generate 5-10 flash cards with clear front (question/keyword) and back (answer/explanation) pairs.
+        parser = ArrayItemParser(key)
+        for chunk in call_model(model, prompt, endpoint, stream=True):
+            parts.append(chunk)
+            parse_started = time.perf_counter()
+            items = parser.feed(chunk)
+            parse_seconds += time.perf_counter() - parse_started
+            for item in items:
+                item = accept(item) if accept else item
+                if item is None or (limit and sent >= limit):
+                    continue
+                yield item_frame(item)
+                sent += 1
+        JSON_EXTRACTION_SECONDS.observe(parse_seconds, endpoint)
+        used_fallback = sent < minimum and fallback is not None
+        if used_fallback:
+            for item in fallback(''.join(parts), sent):
+                if limit and sent >= limit:
+                    break
+                yield item_frame(item)
+                sent += 1
+        if not sent:
+            yield frame({'type': 'error', 'error': f'No {key} were generated'})
+            return
+        yield frame({'type': 'end', 'count': sent, 'fallback': used_fallback})
+    except Exception as e:
+        print(f"Error streaming {key}: {str(e)}")
+        yield frame({'type': 'error', 'error': f'Failed to generate {key}'})
+
+def flashcards_prompt(content):
+    """Prompt asking the model for flash cards as JSON."""
+    return f"""Create flash cards from the following content. Generate 5-10 flash cards with clear front (question/keyword) and back (answer/explanation) pairs.
 
 Content:
 {content}
@@ -435,9 +872,31 @@ Format the response as JSON with this structure:
 }}
 
 Make sure the front side contains concise questions or key terms, and the back side contains detailed explanations or answers. Focus on the most important concepts."""
+
+@app.route('/api/generate-flashcards', methods=['POST'])
+@require_auth
+@rate_limit('flashcards')
+@enforce_token_quota('flashcards')
+def generate_flashcards():
+    """Generate flash cards from content using Gemini API."""
+    try:
+        data = request.get_json()
+        content = data.get('content', '').strip()
+        
+        if not content:
+            return jsonify({'success': False, 'message': 'No content provided'})
+        
+        # Check if the model backend is configured
+        if not llm_backend.is_configured():
+            return jsonify({'success': False, 'message': 'AI service not configured. Please set GEMINI_API_KEY environment variable.'}), 500
+        
+        # Initialize Gemini model
+        model = initialize_model()
+        
+        prompt = flashcards_prompt(content)
         
         # Generate response
-        response = model.generate_content(prompt)
+        response = call_model(model, prompt, 'flashcards')
         
         if response.candidates and response.candidates[0].content.parts:
             response_text = response.candidates[0].content.parts[0].text
@@ -445,10 +904,8 @@ Make sure the front side contains concise questions or key terms, and the back s
             # Try to extract JSON from response
             try:
                 # Find JSON in the response
-                import re
-                json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-                if json_match:
-                    flashcards_data = json.loads(json_match.group())
+                flashcards_data = extract_json_object(response_text, 'flashcards')
+                if flashcards_data is not None:
                     return jsonify({
                         'success': True,
                         'flashcards': flashcards_data.get('flashcards', [])
@@ -474,8 +931,31 @@ Make sure the front side contains concise questions or key terms, and the back s
         print(f"Error generating flash cards: {str(e)}")
         return jsonify({'success': False, 'message': 'Failed to generate flash cards'}), 500
 
+@app.route('/api/generate-flashcards/stream', methods=['POST'])
+@require_auth
+@rate_limit('flashcards')
+@enforce_token_quota('flashcards')
+def generate_flashcards_stream():
+    """Stream flash cards over SSE as the model writes them."""
+    try:
+        data = request.get_json()
+        content = data.get('content', '').strip()
+        
+        if not content:
+            return jsonify({'success': False, 'message': 'No content provided'}), 400
+        
+        return event_stream(stream_json_items(
+            'flashcards', flashcards_prompt(content), 'flashcards', 'flashcard',
+            fallback=lambda text, sent: parse_flashcards_manually(text)
+        ))
+    except Exception as e:
+        print(f"Error streaming flash cards: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to generate flash cards'}), 500
+
+@tracing.traced('parse_flashcards_manually')
 def parse_flashcards_manually(text):
     """Parse flash cards from text when JSON parsing fails."""
+    FALLBACK_TOTAL.inc('parse_flashcards_manually')
     flashcards = []
     lines = text.split('\n')
     
@@ -512,26 +992,11 @@ def parse_flashcards_manually(text):
                     'back': chunks[i + 1][:200] + '...' if len(chunks[i + 1]) > 200 else chunks[i + 1]
                 })
     
-@app.route('/api/generate-mcqs', methods=['POST'])
-@require_auth
-def generate_mcqs():
-    """Generate MCQs from content using Gemini API."""
-    try:
-        data = request.get_json()
-        content = data.get('content', '').strip()
-        count = data.get('count', 5)
-        
-        if not content:
-            return jsonify({'success': False, 'message': 'No content provided'})
-        
-        if count < 1 or count > 20:
-            return jsonify({'success': False, 'message': 'Count must be between 1 and 20'})
-        
-        # Initialize Gemini model
-        model = initialize_model()
-        
-        # Create prompt for MCQ generation
-        prompt = f"""Create {count} multiple choice questions from the following content. Each question should have 4 options (A, B, C, D) with only one correct answer.
+    return flashcards
+
+def mcqs_prompt(content, count):
+    """Prompt asking the model for ``count`` multiple choice questions as JSON."""
+    return f"""Create {count} multiple choice questions from the following content. Each question should have 4 options (A, B, C, D) with only one correct answer.
 
 Content:
 {content}
@@ -554,9 +1019,40 @@ Important:
 - Make questions clear and relevant to the content
 - Ensure options are plausible but only one is correct
 - Focus on important concepts and key information"""
+
+def valid_mcq(mcq):
+    """True for a question with four options and a correct index between 0 and 3."""
+    return (isinstance(mcq, dict) and
+            'question' in mcq and
+            isinstance(mcq.get('options'), list) and
+            len(mcq['options']) == 4 and
+            isinstance(mcq.get('correct'), int) and
+            0 <= mcq['correct'] <= 3)
+
+@app.route('/api/generate-mcqs', methods=['POST'])
+@require_auth
+@rate_limit('mcqs')
+@enforce_token_quota('mcqs')
+def generate_mcqs():
+    """Generate MCQs from content using Gemini API."""
+    try:
+        data = request.get_json()
+        content = data.get('content', '').strip()
+        count = data.get('count', 5)
+        
+        if not content:
+            return jsonify({'success': False, 'message': 'No content provided'})
+        
+        if count < 1 or count > 20:
+            return jsonify({'success': False, 'message': 'Count must be between 1 and 20'})
+        
+        # Initialize Gemini model
+        model = initialize_model()
+        
+        prompt = mcqs_prompt(content, count)
         
         # Generate response
-        response = model.generate_content(prompt)
+        response = call_model(model, prompt, 'mcqs')
         
         if response.candidates and response.candidates[0].content.parts:
             response_text = response.candidates[0].content.parts[0].text
@@ -564,22 +1060,12 @@ Important:
             # Try to extract JSON from response
             try:
                 # Find JSON in the response
-                import re
-                json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-                if json_match:
-                    mcqs_data = json.loads(json_match.group())
+                mcqs_data = extract_json_object(response_text, 'mcqs')
+                if mcqs_data is not None:
                     mcqs = mcqs_data.get('mcqs', [])
                     
                     # Validate MCQs
-                    validated_mcqs = []
-                    for mcq in mcqs:
-                        if (isinstance(mcq, dict) and 
-                            'question' in mcq and 
-                            'options' in mcq and 
-                            'correct' in mcq and
-                            len(mcq['options']) == 4 and
-                            0 <= mcq['correct'] <= 3):
-                            validated_mcqs.append(mcq)
+                    validated_mcqs = [mcq for mcq in mcqs if valid_mcq(mcq)]
                     
                     if len(validated_mcqs) >= count:
                         return jsonify({
@@ -614,8 +1100,37 @@ Important:
         print(f"Error generating MCQs: {str(e)}")
         return jsonify({'success': False, 'message': 'Failed to generate MCQs'}), 500
 
+@app.route('/api/generate-mcqs/stream', methods=['POST'])
+@require_auth
+@rate_limit('mcqs')
+@enforce_token_quota('mcqs')
+def generate_mcqs_stream():
+    """Stream MCQs over SSE as the model writes them, topped up by fallback questions."""
+    try:
+        data = request.get_json()
+        content = data.get('content', '').strip()
+        count = data.get('count', 5)
+        
+        if not content:
+            return jsonify({'success': False, 'message': 'No content provided'}), 400
+        
+        if not isinstance(count, int) or count < 1 or count > 20:
+            return jsonify({'success': False, 'message': 'Count must be between 1 and 20'}), 400
+        
+        return event_stream(stream_json_items(
+            'mcqs', mcqs_prompt(content, count), 'mcqs', 'mcq',
+            accept=lambda mcq: mcq if valid_mcq(mcq) else None,
+            limit=count, minimum=count,
+            fallback=lambda text, sent: generate_fallback_mcqs(content, count - sent)
+        ))
+    except Exception as e:
+        print(f"Error streaming MCQs: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to generate MCQs'}), 500
+
+@tracing.traced('generate_fallback_mcqs')
 def generate_fallback_mcqs(content, count):
     """Generate simple MCQs when JSON parsing fails."""
+    FALLBACK_TOTAL.inc('generate_fallback_mcqs')
     mcqs = []
     
     # Split content into sentences
@@ -642,51 +1157,29 @@ def generate_fallback_mcqs(content, count):
             'correct': 0
         })
     
-@app.route('/api/voice-chat', methods=['POST'])
-@require_auth
-def voice_chat():
-    """Handle voice chat requests with natural conversation."""
-    try:
-        data = request.get_json()
-        message = data.get('message', '').strip()
-        session_id = data.get('session_id')
-        language = data.get('language', 'en')
-        
-        if not message:
-            return jsonify({'success': False, 'message': 'No message provided'})
-        
-        # Initialize Gemini model
-        model = initialize_model()
-        
-        # Create natural conversation prompt
-        # Enhanced prompt for natural, human-like speech in regional languages
-        language_names = {
-            'en': 'English',
-            'ta': 'Tamil (தமிழ்)',
-            'hi': 'Hindi (हिन्दी)',
-            'te': 'Telugu (తెలుగు)',
-            'kn': 'Kannada (ಕನ್ನಡ)',
-            'ml': 'Malayalam (മലയാളം)'
-        }
-        
-        current_lang_name = language_names.get(language, 'English')
-        
-        # Build conversation context
-        context = ""
-        if session_id and session_id in session_memory:
-            recent_conversations = session_memory[session_id][-3:]  # Last 3 exchanges
-            if recent_conversations:
-                context = "\n\nPrevious conversation context:\n"
-                for conv in recent_conversations:
-                    context += f"User: {conv['user']}\n"
-                    context += f"Assistant: {conv['assistant']}\n"
-                context += "\nCurrent user message: " + message
-            else:
-                context = f"\nUser message: {message}"
+    return mcqs
+
+def build_voice_prompt(message, session_id, language):
+    """Build the natural-speech prompt for a voice turn, including recent exchanges."""
+    # Enhanced prompt for natural, human-like speech in regional languages
+    current_lang_name = VOICE_LANGUAGES.get(language, VOICE_LANGUAGES['en'])['name']
+    
+    # Build conversation context
+    context = ""
+    if session_id and session_id in session_memory:
+        recent_conversations = session_memory[session_id][-3:]  # Last 3 exchanges
+        if recent_conversations:
+            context = "\n\nPrevious conversation context:\n"
+            for conv in recent_conversations:
+                context += f"User: {conv['user']}\n"
+                context += f"Assistant: {conv['assistant']}\n"
+            context += "\nCurrent user message: " + message
         else:
             context = f"\nUser message: {message}"
+    else:
+        context = f"\nUser message: {message}"
 
-        prompt = f"""You are a helpful AI assistant having a natural voice conversation in {current_lang_name}. 
+    prompt = f"""You are a helpful AI assistant having a natural voice conversation in {current_lang_name}. 
         
         CRITICAL INSTRUCTIONS FOR NATURAL SPEECH:
         - Respond in {current_lang_name} if the user is speaking in that language
@@ -711,28 +1204,55 @@ def voice_chat():
         {context}
         
         Provide a natural, conversational response in {current_lang_name} that maintains conversation flow and sounds perfect when spoken aloud:"""
+    return prompt
+
+def remember_voice_exchange(session_id, message, ai_response):
+    """Store a voice exchange in session memory, keeping the last 10."""
+    if not session_id:
+        return
+    if session_id not in session_memory:
+        session_memory[session_id] = []
+    
+    session_memory[session_id].append({
+        'user': message,
+        'assistant': ai_response,
+        'timestamp': datetime.now().isoformat()
+    })
+    VOICE_EXCHANGES.inc()
+    
+    # Keep only last 10 exchanges
+    if len(session_memory[session_id]) > 10:
+        VOICE_EXCHANGES.dec(amount=len(session_memory[session_id]) - 10)
+        session_memory[session_id] = session_memory[session_id][-10:]
+
+@app.route('/api/voice-chat', methods=['POST'])
+@require_auth
+@rate_limit('voice_chat')
+@enforce_token_quota('voice_chat')
+def voice_chat():
+    """Handle voice chat requests with natural conversation."""
+    try:
+        data = request.get_json()
+        message = data.get('message', '').strip()
+        session_id = data.get('session_id')
+        language = data.get('language', 'en')
+        
+        if not message:
+            return jsonify({'success': False, 'message': 'No message provided'})
+        
+        # Initialize Gemini model
+        model = initialize_model()
+        
+        prompt = build_voice_prompt(message, session_id, language)
         
         # Generate response
-        response = model.generate_content(prompt)
+        response = call_model(model, prompt, 'voice_chat')
         
         if response.candidates and response.candidates[0].content.parts:
             ai_response = response.candidates[0].content.parts[0].text.strip()
             
             # Store in session memory
-            if session_id:
-                if session_id not in session_memory:
-                    session_memory[session_id] = []
-                
-                # Add to memory (keep last 10 exchanges)
-                session_memory[session_id].append({
-                    'user': message,
-                    'assistant': ai_response,
-                    'timestamp': datetime.now().isoformat()
-                })
-                
-                # Keep only last 10 exchanges
-                if len(session_memory[session_id]) > 10:
-                    session_memory[session_id] = session_memory[session_id][-10:]
+            remember_voice_exchange(session_id, message, ai_response)
             
             return jsonify({
                 'success': True,
@@ -745,80 +1265,290 @@ def voice_chat():
         print(f"Error in voice chat: {str(e)}")
         return jsonify({'success': False, 'message': 'Failed to process voice chat request'}), 500
 
-@app.route('/api/gtts-speak', methods=['POST'])
+def voice_reply_events(message, session_id, language, include_audio=False, slow=False):
+    """Generate a voice reply as (kind, payload) events while the model streams.
+
+    Kinds are 'sentence' ({'index', 'text'}), 'audio' ((index, mp3 bytes), in
+    sentence order) and finally 'end' ({'response', 'sentences'}) or 'error'.
+    Voice memory is updated before 'end' is produced.
+    """
+    prompt = build_voice_prompt(message, session_id, language)
+    gtts_lang = VOICE_LANGUAGES.get(language, VOICE_LANGUAGES['en'])['tts']
+    started = time.perf_counter()
+    sentences = []
+    pending_audio = []  # (index, future) in sentence order
+    
+    def sentence_event(sentence):
+        index = len(sentences)
+        sentences.append(sentence)
+        if index == 0:
+            tracing.annotate(first_sentence_ms=round((time.perf_counter() - started) * 1000, 3))
+        if include_audio:
+            speech_text = clean_text_for_speech(sentence)
+            if speech_text:
+                pending_audio.append((index, synthesize_async(speech_text, gtts_lang, slow, tts_cache,
+                                                              synthesize_timed)))
+        return 'sentence', {'index': index, 'text': sentence}
+    
+    def audio_events(wait=False):
+        # Audio goes out in sentence order, as soon as the next segment is ready
+        while pending_audio and (wait or pending_audio[0][1].done()):
+            index, future = pending_audio.pop(0)
+            yield 'audio', (index, future.result())
+    
+    try:
+        model = initialize_model()
+        buffer = ''
+        for chunk in call_model(model, prompt, 'voice_chat', stream=True):
+            buffer += chunk
+            complete, buffer = pop_complete_sentences(buffer)
+            for sentence in complete:
+                yield sentence_event(sentence)
+            yield from audio_events()
+        if buffer.strip():
+            yield sentence_event(buffer.strip())
+        yield from audio_events(wait=True)
+        
+        if not sentences:
+            yield 'error', {'error': 'Failed to generate response'}
+            return
+        ai_response = ' '.join(sentences)
+        remember_voice_exchange(session_id, message, ai_response)
+        yield 'end', {'response': ai_response, 'sentences': len(sentences)}
+    except Exception as e:
+        print(f"Error generating voice reply: {str(e)}")
+        yield 'error', {'error': 'Failed to process voice chat request'}
+    finally:
+        for _index, future in pending_audio:
+            future.cancel()
+
+@app.route('/api/voice-chat/stream', methods=['POST'])
 @require_auth
-def gtts_speak():
-    """Generate speech using Google Text-to-Speech for regional languages."""
+@rate_limit('voice_chat')
+@enforce_token_quota('voice_chat')
+def voice_chat_stream():
+    """Stream a voice reply sentence by sentence, optionally with synthesized audio."""
     try:
-        from gtts import gTTS
-        import io
-        import tempfile
-        import os
+        data = request.get_json()
+        message = data.get('message', '').strip()
+        session_id = data.get('session_id')
+        language = data.get('language', 'en')
+        include_audio = bool(data.get('audio'))
+        slow = bool(data.get('slow'))
         
+        if not message:
+            return jsonify({'success': False, 'message': 'No message provided'}), 400
+        
+        def generate_reply():
+            yield sse_event({'type': 'start', 'session_id': session_id, 'audio': include_audio})
+            for kind, payload in voice_reply_events(message, session_id, language, include_audio, slow):
+                if kind == 'audio':
+                    index, audio = payload
+                    payload = {'index': index, 'mime': 'audio/mpeg', 'data': base64.b64encode(audio).decode('ascii')}
+                yield sse_event({'type': kind, **payload})
+        
+        return event_stream(generate_reply())
+        
+    except Exception as e:
+        print(f"Error in voice chat stream: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to process voice chat request'}), 500
+
+# Frame kinds of the /api/voice-turn binary stream
+VOICE_FRAME_JSON = b'J'
+VOICE_FRAME_AUDIO = b'A'
+
+def voice_frame(kind, payload):
+    """Encode one /api/voice-turn frame: kind byte, 4-byte big-endian length, payload."""
+    return kind + len(payload).to_bytes(4, 'big') + payload
+
+@app.route('/api/voice-turn', methods=['POST'])
+@require_auth
+@rate_limit('voice_chat')
+@enforce_token_quota('voice_chat')
+def voice_turn():
+    """Answer a voice turn with reply text and speech in a single framed binary response.
+
+    The body is a sequence of frames (see voice_frame). 'J' frames carry UTF-8
+    JSON events: start, sentence, end or error. 'A' frames carry a 4-byte
+    big-endian sentence index followed by that sentence's MP3 audio; they
+    arrive in sentence order, so a client can play sentence N while later ones
+    are still coming.
+    """
+    try:
         data = request.get_json()
-        text = data.get('text', '').strip()
+        message = data.get('message', '').strip()
+        session_id = data.get('session_id')
         language = data.get('language', 'en')
+        slow = bool(data.get('slow'))
         
-        if not text:
-            return jsonify({'success': False, 'message': 'No text provided'}), 400
+        if not message:
+            return jsonify({'success': False, 'message': 'No message provided'}), 400
         
-        # Enhanced text cleaning for better speech
-        clean_text = text.replace('\n', ' ').replace('\r', ' ').strip()
-        # Remove special characters that shouldn't be spoken
-        clean_text = re.sub(r'[^\w\s.,!?;:()\-]', '', clean_text)
-        # Remove extra spaces
-        clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-        
-        # Language mapping for gTTS
-        gtts_lang_map = {
-            'en': 'en',
-            'ta': 'ta',
-            'hi': 'hi',
-            'te': 'te',
-            'kn': 'kn',
-            'ml': 'ml'
-        }
+        def json_frame(event):
+            return voice_frame(VOICE_FRAME_JSON, json.dumps(event).encode('utf-8'))
         
-        gtts_lang = gtts_lang_map.get(language, 'en')
-        tts = gTTS(text=clean_text, lang=gtts_lang, slow=False)
+        def generate_turn():
+            yield json_frame({'type': 'start', 'session_id': session_id, 'mime': 'audio/mpeg'})
+            for kind, payload in voice_reply_events(message, session_id, language, include_audio=True, slow=slow):
+                if kind == 'audio':
+                    index, audio = payload
+                    yield voice_frame(VOICE_FRAME_AUDIO, index.to_bytes(4, 'big') + audio)
+                else:
+                    yield json_frame({'type': kind, **payload})
         
-        # Generate audio in memory
-        audio_buffer = io.BytesIO()
-        tts.write_to_fp(audio_buffer)
-        audio_buffer.seek(0)
+        return Response(stream_with_context(generate_turn()),
+                        mimetype='application/vnd.lumora.voice-turn',
+                        headers={
+                            'Cache-Control': 'no-cache',
+                            'X-Accel-Buffering': 'no'
+                        })
         
-        # Return audio as response
-        return send_file(
-            audio_buffer,
-            mimetype='audio/mpeg',
-            as_attachment=False,
-            download_name='speech.mp3'
-        )
+    except Exception as e:
+        print(f"Error in voice turn: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to process voice turn'}), 500
+
+def synthesize_timed(text, lang, slow=False):
+    """Synthesize speech, recording the upstream TTS time."""
+    with TTS_SYNTHESIS_SECONDS.time(lang), tracing.span('tts_synthesis', language=lang, chars=len(text)):
+        return synthesize_speech(text, lang, slow=slow)
+
+def send_cached_audio(key, path, max_age):
+    """Serve a cached MP3 with ETag, Range and browser caching support."""
+    response = send_file(
+        path,
+        mimetype='audio/mpeg',
+        as_attachment=False,
+        download_name='speech.mp3',
+        etag=key,
+        conditional=True,
+        max_age=max_age
+    )
+    response.headers['Cache-Control'] = f'private, max-age={max_age}' + (', immutable' if max_age >= 31536000 else '')
+    response.headers['X-Audio-URL'] = url_for('gtts_audio', key=key)
+    return response
+
+def speech_response(clean_text, gtts_lang, slow):
+    """Serve speech for cleaned text from the cache, or synthesize and stream it sentence by sentence."""
+    # Serve from the disk cache when this exact text was spoken before
+    key = tts_cache_key(clean_text, gtts_lang, slow)
+    path = tts_cache.get(key)
+    if path:
+        tracing.annotate(tts_cache='hit')
+        return send_cached_audio(key, path, TTS_CACHE_MAX_AGE)
+    tracing.annotate(tts_cache='miss')
+    
+    sentences = split_sentences(clean_text)
+    if len(sentences) <= 1:
+        key, path, _hit = tts_cache.get_or_synthesize(clean_text, gtts_lang, slow, synthesize_func=synthesize_timed)
+        return send_cached_audio(key, path, TTS_CACHE_MAX_AGE)
+    
+    # Synthesize sentences in parallel and stream each MP3 segment as soon as it is ready
+    def generate_audio():
+        segments = []
+        with tracing.span('tts_pipeline', sentences=len(sentences)):
+            for segment in synthesize_segments(sentences, gtts_lang, slow, tts_cache, synthesize_timed):
+                segments.append(segment)
+                yield segment
+        # Keep the whole reply too, so replays are served with ETag and Range support
+        tts_cache.put(key, b''.join(segments))
+    
+    return Response(stream_with_context(generate_audio()),
+                    mimetype='audio/mpeg',
+                    headers={
+                        'Cache-Control': 'no-cache',
+                        'X-Accel-Buffering': 'no',
+                        'X-Audio-URL': url_for('gtts_audio', key=key),
+                        'X-TTS-Segments': str(len(sentences))
+                    })
+
+def speech_request():
+    """Read text, language and speed from a TTS request body as ``(clean_text, gtts_lang, slow)``."""
+    data = request.get_json()
+    text = (data.get('text') or '').strip()
+    language = data.get('language', 'en')
+    slow = str(data.get('slow', '')).lower() in ('1', 'true', 'yes')
+    if not text:
+        return None
+    
+    # Enhanced text cleaning for better speech
+    with tracing.span('clean_text'):
+        clean_text = clean_text_for_speech(text)
+    
+    # Language mapping for gTTS
+    return clean_text, VOICE_LANGUAGES.get(language, VOICE_LANGUAGES['en'])['tts'], slow
+
+@app.route('/api/gtts-speak', methods=['POST'])
+@require_auth
+@rate_limit('tts')
+def gtts_speak():
+    """Generate speech using Google Text-to-Speech for regional languages."""
+    try:
+        speech = speech_request()
+        if speech is None:
+            return jsonify({'success': False, 'message': 'No text provided'}), 400
+        return speech_response(*speech)
         
     except Exception as e:
         print(f"Error in GTTS: {str(e)}")
         return jsonify({'success': False, 'message': 'Failed to generate speech'}), 500
 
-@app.route('/api/youtube-suggestions', methods=['POST'])
+@app.route('/api/gtts-speak/request', methods=['POST'])
 @require_auth
-def generate_youtube_suggestions():
-    """Generate YouTube video suggestions using Gemini API."""
+@rate_limit('tts')
+def gtts_speak_request():
+    """Store text for speech and return the URL that plays it, for use as an ``<audio src>``."""
     try:
-        data = request.get_json()
-        topic = data.get('topic', '').strip()
-        language = data.get('language', 'english')
-        
-        if not topic:
-            return jsonify({'success': False, 'message': 'No topic provided'})
-        
-        # Initialize Gemini model
-        model = initialize_model()
+        speech = speech_request()
+        if speech is None:
+            return jsonify({'success': False, 'message': 'No text provided'}), 400
+        clean_text, gtts_lang, slow = speech
+        # The text stays out of the audio URL (and so out of access logs); the key is its cache key
+        key = tts_cache_key(clean_text, gtts_lang, slow)
+        if not tts_cache.get(key):
+            tts_cache.put_request(clean_text, gtts_lang, slow)
+        return jsonify({'success': True, 'key': key, 'url': url_for('gtts_speak_key', key=key)})
         
-        # Create prompt for YouTube suggestions
-        language_instruction = "in Tamil language" if language == 'tamil' else "in English language"
+    except Exception as e:
+        print(f"Error in GTTS request: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to prepare speech'}), 500
+
+@app.route('/api/gtts-speak/<key>', methods=['GET'])
+@require_auth
+@rate_limit('tts')
+def gtts_speak_key(key):
+    """Speak text posted to /api/gtts-speak/request, streaming it the first time it is played."""
+    if not re.fullmatch(r'[0-9a-f]{32}', key):
+        return jsonify({'success': False, 'message': 'Invalid audio key'}), 400
+    try:
+        path = tts_cache.get(key)
+        if path:
+            tracing.annotate(tts_cache='hit')
+            return send_cached_audio(key, path, TTS_CACHE_MAX_AGE)
+        speech = tts_cache.get_request(key)
+        if speech is None:
+            return jsonify({'success': False, 'message': 'Audio not found'}), 404
+        return speech_response(*speech)
         
-        if language == 'tamil':
-            prompt = f"""Find 5-8 high-quality educational YouTube videos specifically about "{topic}" in Tamil language. 
+    except Exception as e:
+        print(f"Error in GTTS: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to generate speech'}), 500
+
+@app.route('/api/gtts-audio/<key>', methods=['GET'])
+@require_auth
+def gtts_audio(key):
+    """Serve previously synthesized speech by its cache key."""
+    if not re.fullmatch(r'[0-9a-f]{32}', key):
+        return jsonify({'success': False, 'message': 'Invalid audio key'}), 400
+    path = tts_cache.get(key)
+    if not path:
+        return jsonify({'success': False, 'message': 'Audio not found'}), 404
+    # Keys are content hashes, so the audio behind a URL never changes
+    return send_cached_audio(key, path, 31536000)
+
+def youtube_prompt(topic, language):
+    """Prompt asking the model for YouTube videos about ``topic`` as JSON."""
+    if language == 'tamil':
+        return f"""Find 5-8 high-quality educational YouTube videos specifically about "{topic}" in Tamil language. 
 
 IMPORTANT: The videos MUST be directly related to "{topic}" and MUST be in Tamil language - not general programming, not random songs, not unrelated content.
 
@@ -868,8 +1598,7 @@ CRITICAL REQUIREMENTS FOR TAMIL VIDEOS:
 - Mix different difficulty levels (beginner to advanced) for {topic}
 - Include both recent and classic Tamil videos about {topic}
 - Make sure URLs are valid YouTube links"""
-        else:
-            prompt = f"""Find 5-8 high-quality educational YouTube videos specifically about "{topic}" in English language. 
+    return f"""Find 5-8 high-quality educational YouTube videos specifically about "{topic}" in English language. 
 
 IMPORTANT: Generate realistic, available videos with actual video IDs from popular educational channels.
 
@@ -914,9 +1643,38 @@ CRITICAL REQUIREMENTS:
 - Mix different difficulty levels (beginner to advanced) for {topic}
 - Include both recent and classic videos about {topic}
 - Make sure URLs are valid YouTube links"""
+
+def clean_video(video):
+    """Return the video with its thumbnail URL set, or None if it is not a YouTube link."""
+    if not (isinstance(video, dict) and 'title' in video and 'youtube.com' in str(video.get('url', ''))):
+        return None
+    # Extract video ID for thumbnail
+    video_id = extract_video_id(video['url'])
+    if video_id:
+        video['thumbnail'] = f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg"
+    return video
+
+@app.route('/api/youtube-suggestions', methods=['POST'])
+@require_auth
+@rate_limit('youtube_suggestions')
+@enforce_token_quota('youtube_suggestions')
+def generate_youtube_suggestions():
+    """Generate YouTube video suggestions using Gemini API."""
+    try:
+        data = request.get_json()
+        topic = data.get('topic', '').strip()
+        language = data.get('language', 'english')
+        
+        if not topic:
+            return jsonify({'success': False, 'message': 'No topic provided'})
+        
+        # Initialize Gemini model
+        model = initialize_model()
+        
+        prompt = youtube_prompt(topic, language)
         
         # Generate response
-        response = model.generate_content(prompt)
+        response = call_model(model, prompt, 'youtube_suggestions')
         
         if response.candidates and response.candidates[0].content.parts:
             response_text = response.candidates[0].content.parts[0].text
@@ -924,26 +1682,12 @@ CRITICAL REQUIREMENTS:
             # Try to extract JSON from response
             try:
                 # Find JSON in the response
-                import re
-                json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-                if json_match:
-                    videos_data = json.loads(json_match.group())
+                videos_data = extract_json_object(response_text, 'youtube_suggestions')
+                if videos_data is not None:
                     videos = videos_data.get('videos', [])
                     
                     # Validate and clean videos
-                    validated_videos = []
-                    for video in videos:
-                        if (isinstance(video, dict) and 
-                            'title' in video and 
-                            'url' in video and
-                            'youtube.com' in video.get('url', '')):
-                            
-                            # Extract video ID for thumbnail
-                            video_id = extract_video_id(video['url'])
-                            if video_id:
-                                video['thumbnail'] = f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg"
-                            
-                            validated_videos.append(video)
+                    validated_videos = [video for video in map(clean_video, videos) if video is not None]
                     
                     if validated_videos:
                         return jsonify({
@@ -978,6 +1722,29 @@ CRITICAL REQUIREMENTS:
         print(f"Error generating YouTube suggestions: {str(e)}")
         return jsonify({'success': False, 'message': 'Failed to generate video suggestions'}), 500
 
+@app.route('/api/youtube-suggestions/stream', methods=['POST'])
+@require_auth
+@rate_limit('youtube_suggestions')
+@enforce_token_quota('youtube_suggestions')
+def generate_youtube_suggestions_stream():
+    """Stream YouTube video suggestions over SSE as the model writes them."""
+    try:
+        data = request.get_json()
+        topic = data.get('topic', '').strip()
+        language = data.get('language', 'english')
+        
+        if not topic:
+            return jsonify({'success': False, 'message': 'No topic provided'}), 400
+        
+        return event_stream(stream_json_items(
+            'youtube_suggestions', youtube_prompt(topic, language), 'videos', 'video',
+            accept=clean_video, limit=8,
+            fallback=lambda text, sent: generate_fallback_videos(topic, language)
+        ))
+    except Exception as e:
+        print(f"Error streaming YouTube suggestions: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to generate video suggestions'}), 500
+
 def extract_video_id(url):
     """Extract YouTube video ID from URL."""
     import re
@@ -992,8 +1759,10 @@ def extract_video_id(url):
             return match.group(1)
     return None
 
+@tracing.traced('generate_fallback_videos')
 def generate_fallback_videos(topic, language):
     """Generate fallback video suggestions when API fails."""
+    FALLBACK_TOTAL.inc('generate_fallback_videos')
     videos = []
     
     # Real educational videos for fallback - these are popular, available videos
@@ -1052,13 +1821,50 @@ def generate_fallback_videos(topic, language):
     
     return sample_videos[:5]
 
+def get_user_session(session_id):
+    """Return the logged-in user's chat session ``session_id``, or None."""
+    chat_session = chat_sessions.get(session_id)
+    if chat_session is None or chat_session.user != session['user']:
+        return None
+    return chat_session
+
+def session_summary(session_id, info, last_active):
+    """List entry for a session: title, preview of the last message and counts."""
+    preview = info['preview']
+    return {
+        'id': session_id,
+        'title': info['title'],
+        'preview': preview[:120] + '...' if len(preview) > 120 else preview,
+        'message_count': info['message_count'],
+        'created_at': isoformat(info['created']),
+        'updated_at': datetime.fromtimestamp(last_active).isoformat()
+    }
+
 @app.route('/api/sessions', methods=['GET'])
 @require_auth
+@rate_limit('sessions', tier='cheap')
 def get_sessions():
-    """Get all chat sessions."""
-    user_sessions = {k: v for k, v in chat_sessions.items() if v.get('user') == session['user']}
+    """Get the user's chat sessions, most recently active first, a page at a time."""
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = min(max(1, int(request.args.get('limit', 50))), 200)
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be integers'}), 400
+    user = session['user']
+    sessions = []
+    # Spilled sessions are listed from their stored summary without loading them back
+    for session_id, last_active in session_index.page(user, offset, limit):
+        info = chat_sessions.describe(session_id)
+        if info is None or info['user'] != user:
+            # Purged after a long time on disk
+            session_index.remove(user, session_id)
+            continue
+        sessions.append(session_summary(session_id, info, last_active))
+    total = session_index.count(user)
     return jsonify({
-        'sessions': list(user_sessions.keys()),
+        'sessions': sessions,
+        'total': total,
+        'next_offset': offset + limit if offset + limit < total else None,
         'current_session': current_session_id
     })
 
@@ -1067,14 +1873,10 @@ def get_sessions():
 def create_session():
     """Create a new chat session."""
     global current_session_id
-    session_id = str(uuid.uuid4())
-    chat_sessions[session_id] = {
-        'id': session_id,
-        'title': 'New Chat',
-        'messages': [],
-        'created_at': datetime.now().isoformat(),
-        'user': session['user']
-    }
+    chat_session = ChatSession(session['user'])
+    session_id = chat_session.id
+    chat_sessions[session_id] = chat_session
+    session_index.touch(session['user'], session_id)
     current_session_id = session_id
     return jsonify({'session_id': session_id})
 
@@ -1083,8 +1885,9 @@ def create_session():
 def update_session(session_id):
     """Update session title."""
     data = request.get_json()
-    if session_id in chat_sessions and chat_sessions[session_id].get('user') == session['user']:
-        chat_sessions[session_id]['title'] = data.get('title', 'New Chat')
+    chat_session = get_user_session(session_id)
+    if chat_session is not None:
+        chat_session.title = data.get('title', 'New Chat')
         return jsonify({'success': True})
     return jsonify({'error': 'Session not found'}), 404
 
@@ -1093,23 +1896,349 @@ def update_session(session_id):
 def delete_session(session_id):
     """Delete a chat session."""
     global current_session_id
-    if session_id in chat_sessions and chat_sessions[session_id].get('user') == session['user']:
+    if get_user_session(session_id) is not None:
         del chat_sessions[session_id]
+        session_index.remove(session['user'], session_id)
+        search_index.remove_session(session['user'], session_id)
         if current_session_id == session_id:
             current_session_id = None
         return jsonify({'success': True})
     return jsonify({'error': 'Session not found'}), 404
 
+def project_message(message, include=()):
+    """Message as returned by listings, without the blobs that were not asked for."""
+    projected = message.to_dict(include)
+    projected['has_image'] = message.image is not None
+    projected['has_document'] = message.document_content is not None
+    return projected
+
 @app.route('/api/sessions/<session_id>/messages', methods=['GET'])
 @require_auth
+@rate_limit('sessions', tier='cheap')
 def get_messages(session_id):
-    """Get messages for a specific session."""
-    if session_id in chat_sessions and chat_sessions[session_id].get('user') == session['user']:
-        return jsonify({'messages': chat_sessions[session_id]['messages']})
-    return jsonify({'error': 'Session not found'}), 404
+    """Get messages for a specific session.
+
+    Pages go from the newest messages backwards: pass ``before=<next_cursor>``
+    for the previous page. ``since=<message id>`` returns only messages added
+    after that one. Images and document text are left out unless listed in
+    ``include``.
+    """
+    chat_session = get_user_session(session_id)
+    if chat_session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    try:
+        limit = min(max(1, int(request.args.get('limit', 50))), 200)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    include = {field.strip() for field in request.args.get('include', '').split(',')} & set(BLOB_FIELDS)
+    messages = chat_session.messages
+    total = len(messages)
+    
+    since = request.args.get('since')
+    if since:
+        index = chat_session.find_message(parse_id(since))
+        if index is not None:
+            page = messages[index + 1:index + 1 + limit]
+            return jsonify({
+                'messages': [project_message(msg, include) for msg in page],
+                'total': total,
+                'has_more': index + 1 + limit < total,
+                'next_since': format_id(page[-1].id) if page else since
+            })
+        # Unknown message (e.g. the session was cleared): fall back to the newest page
+    
+    end = total
+    before = request.args.get('before')
+    if before:
+        end = chat_session.find_message(parse_id(before))
+        if end is None:
+            return jsonify({'error': 'Unknown cursor'}), 400
+    start = max(0, end - limit)
+    page = messages[start:end]
+    return jsonify({
+        'messages': [project_message(msg, include) for msg in page],
+        'total': total,
+        'next_cursor': format_id(page[0].id) if start > 0 else None,
+        'reset': bool(since)
+    })
+
+@app.route('/api/sessions/<session_id>/messages/<message_id>', methods=['GET'])
+@require_auth
+@rate_limit('sessions', tier='cheap')
+def get_message(session_id, message_id):
+    """Get one message with all of its fields, including images and document text."""
+    chat_session = get_user_session(session_id)
+    if chat_session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    index = chat_session.find_message(parse_id(message_id))
+    if index is None:
+        return jsonify({'error': 'Message not found'}), 404
+    return jsonify({'message': project_message(chat_session.messages[index], BLOB_FIELDS)})
+
+def export_session_lines(user, inline_blobs):
+    """NDJSON lines of a user's sessions, oldest first, one session in memory at a time."""
+    yield json.dumps({
+        'type': 'export',
+        'version': EXPORT_FORMAT_VERSION,
+        'user': user,
+        'exported_at': datetime.now().isoformat(),
+        'blobs': 'inline' if inline_blobs else 'ref'
+    }) + '\n'
+    include = BLOB_FIELDS if inline_blobs else ()
+    for session_id, last_active in reversed(session_index.page(user, 0, session_index.count(user))):
+        # Spilled sessions are decoded without becoming resident again
+        chat_session = chat_sessions.peek(session_id)
+        if chat_session is None or chat_session.user != user:
+            continue
+        yield json.dumps({
+            'type': 'session',
+            'id': session_id,
+            'title': chat_session.title,
+            'created_at': chat_session.created_at,
+            'updated_at': datetime.fromtimestamp(last_active).isoformat()
+        }) + '\n'
+        for message in chat_session.messages:
+            record = message.to_dict(include)
+            record['type'] = 'message'
+            record['session_id'] = session_id
+            if not inline_blobs and (message.image is not None or message.document_content is not None):
+                record['blob_url'] = f"/api/sessions/{session_id}/messages/{record['id']}"
+            yield json.dumps(record) + '\n'
+
+def chunked(lines, size):
+    """Join lines into chunks of about ``size`` characters."""
+    chunk = []
+    length = 0
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(chunk)
+            chunk = []
+            length = 0
+    if chunk:
+        yield ''.join(chunk)
+
+@app.route('/api/sessions/export', methods=['GET'])
+@require_auth
+@rate_limit('export', tier='cheap')
+def export_sessions():
+    """Stream the user's chat sessions and messages as NDJSON (blobs=inline to embed attachments)."""
+    user = session['user']
+    inline_blobs = request.args.get('blobs', 'ref') == 'inline'
+    filename = f"lumora-sessions-{secure_filename(user)}-{datetime.now():%Y%m%d}.ndjson"
+    return Response(stream_with_context(chunked(export_session_lines(user, inline_blobs), EXPORT_CHUNK_BYTES)),
+                    mimetype='application/x-ndjson',
+                    headers={
+                        'Content-Disposition': f'attachment; filename="{filename}"',
+                        'X-Accel-Buffering': 'no'
+                    })
+
+def parse_export_timestamp(value, default):
+    if not value:
+        return default
+    return int(datetime.fromisoformat(value).timestamp())
+
+def store_imported_sessions(user, imported):
+    """Store a batch of imported sessions and index their messages."""
+    chat_sessions.add_spilled(imported)
+    session_index.add_many(user, ((chat_session.id, chat_session.messages[-1].created
+                                   if chat_session.messages else chat_session.created)
+                                  for chat_session in imported))
+    search_index.add_many(user, ((chat_session.id, message.id, message.content)
+                                 for chat_session in imported for message in chat_session.messages))
+
+@app.route('/api/sessions/import', methods=['POST'])
+@require_auth
+@rate_limit('import')
+def import_sessions():
+    """Import NDJSON written by /api/sessions/export into the user's sessions."""
+    user = session['user']
+    pending = []
+    current = None
+    current_export_id = None
+    totals = {'sessions': 0, 'messages': 0}
+    line_number = 0
+
+    def flush():
+        if pending:
+            store_imported_sessions(user, pending)
+            totals['sessions'] += len(pending)
+            totals['messages'] += sum(len(chat_session.messages) for chat_session in pending)
+            pending.clear()
+
+    try:
+        # Read line by line so the upload is never held in memory as a whole
+        for line_number, line in enumerate(io.BufferedReader(request.stream, EXPORT_CHUNK_BYTES), 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError('line is not a JSON object')
+            kind = record.get('type')
+            if kind == 'export':
+                if record.get('version') != EXPORT_FORMAT_VERSION:
+                    raise ValueError(f"unsupported export version {record.get('version')}")
+            elif kind == 'session':
+                if current is not None:
+                    pending.append(current)
+                    if (len(pending) >= IMPORT_BATCH_SESSIONS
+                            or sum(len(chat_session.messages) for chat_session in pending) >= IMPORT_BATCH_MESSAGES):
+                        flush()
+                created = parse_export_timestamp(record.get('created_at'), int(time.time()))
+                current = ChatSession(user, title=record.get('title') or 'New Chat', created=created)
+                current_export_id = record.get('id')
+            elif kind == 'message':
+                if current is None or record.get('session_id') != current_export_id:
+                    raise ValueError('message does not follow its session')
+                if record.get('role') not in ('user', 'assistant'):
+                    raise ValueError(f"unknown role {record.get('role')!r}")
+                current.messages.append(Message(
+                    record['role'], record.get('content') or '',
+                    image=record.get('image'),
+                    document_content=record.get('document_content'),
+                    filename=record.get('filename'),
+                    id=parse_id(record.get('id')),
+                    created=parse_export_timestamp(record.get('timestamp'), current.created)
+                ))
+            else:
+                raise ValueError(f"unknown record type {kind!r}")
+        if current is not None:
+            pending.append(current)
+        flush()
+    except (ValueError, KeyError, TypeError) as e:
+        # Sessions before the bad line stay imported, including the messages
+        # of the session being read that came before it
+        partial = {}
+        if current is not None and (not pending or pending[-1] is not current):
+            pending.append(current)
+            partial = {'partial_session': current_export_id}
+        flush()
+        return jsonify({'success': False, 'message': f'Invalid import at line {line_number}: {str(e)}',
+                        **totals, **partial}), 400
+    except Exception as e:
+        print(f"Error importing sessions: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to import sessions'}), 500
+    return jsonify({'success': True, **totals})
+
+def generate_chat_answer(session_id, user_message, image_data=None, document_content=None, filename=''):
+    """Ask the model to answer ``user_message`` with the session's conversation as context."""
+    model = initialize_model()
+    
+    # Build conversation context for memory
+    with CONTEXT_BUILD_SECONDS.time(), tracing.span('context_build'):
+        conversation_history = chat_sessions[session_id].messages[:-1]  # Exclude current message
+        context = build_conversation_context(conversation_history)
+        context = trim_context_if_needed(context)
+    
+    # Prepare content for Gemini with context
+    content_parts = []
+    
+    # Add conversation context if exists
+    if context:
+        content_parts.append(f"Previous conversation context:\n{context}\n\n---\n\n")
+    
+    # Add current message components
+    if image_data:
+        # Handle image
+        image_bytes = base64.b64decode(image_data.split(',')[1])
+        content_parts.append({
+            'mime_type': 'image/jpeg',
+            'data': image_bytes
+        })
+    
+    if document_content:
+        content_parts.append(f"Document content ({filename}):\n{document_content}\n\n")
+    
+    # Add the current user message
+    current_query = f"Current question/request: {user_message}"
+    content_parts.append(current_query)
+    
+    # Generate response with context
+    response = call_model(model, content_parts, 'chat')
+    
+    if response.candidates and response.candidates[0].content.parts:
+        assistant_message = response.candidates[0].content.parts[0].text
+        # Clean up any remaining \n characters
+        return assistant_message.replace('\\n', '').replace('\n\n', '\n').strip()
+    return None
+
+def answer_pieces(assistant_message):
+    """Split an answer into the words and paragraph breaks it is streamed as."""
+    paragraphs = assistant_message.split('\n\n')
+    for para_idx, paragraph in enumerate(paragraphs):
+        if paragraph.strip():
+            for word in paragraph.split():
+                yield word + ' '
+            # Add paragraph break if not the last paragraph
+            if para_idx < len(paragraphs) - 1:
+                yield '\n\n'
+
+def paced_answer_pieces(assistant_message):
+    """Yield answer pieces at typing speed."""
+    for piece in answer_pieces(assistant_message):
+        yield piece
+        time.sleep(0.02 if piece == '\n\n' else SSE_WORD_DELAY_MS / 1000.0)
+
+def stream_answer(replay, assistant_message):
+    """Yield coalesced token frames for an answer, recording each one in ``replay``."""
+    for text in coalesce(paced_answer_pieces(assistant_message), SSE_FLUSH_CHARS, SSE_FLUSH_MS / 1000.0):
+        yield sse_event({'type': 'token', 'content': text}, replay.append(text))
+
+def complete_replay(replay, assistant_message):
+    """Add whatever was not streamed yet to ``replay`` and mark it finished."""
+    remainder = ''.join(answer_pieces(assistant_message))[replay.length:]
+    if remainder:
+        replay.append(remainder)
+    replay.finish()
+
+@app.route('/api/search', methods=['GET'])
+@require_auth
+@rate_limit('search', tier='cheap')
+def search_messages():
+    """Search the user's chat history, best matches first, with snippets."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    try:
+        limit = min(max(1, int(request.args.get('limit', 20))), 100)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    user = session['user']
+    with SEARCH_SECONDS.time(), tracing.span('chat_search'):
+        matches, terms = search_index.search(user, query, limit, request.args.get('session_id'))
+        results = []
+        # peek() reads spilled sessions without making them resident again; decode each one once
+        peeked = {}
+        for session_id, message_id, score in matches:
+            if session_id not in peeked:
+                chat_session = chat_sessions.peek(session_id)
+                peeked[session_id] = chat_session if chat_session is not None and chat_session.user == user else None
+            chat_session = peeked[session_id]
+            index = chat_session.find_message(message_id) if chat_session is not None else None
+            if index is None:
+                # The session was purged from disk since it was indexed
+                search_index.remove_session(user, session_id)
+                continue
+            message = chat_session.messages[index]
+            text, highlights = snippet(message.content, terms)
+            results.append({
+                'session_id': session_id,
+                'session_title': chat_session.title,
+                'message_id': format_id(message.id),
+                'role': message.role,
+                'timestamp': isoformat(message.created),
+                'score': round(score, 3),
+                'snippet': text,
+                'highlights': highlights
+            })
+    return jsonify({'success': True, 'query': query, 'results': results})
 
 @app.route('/api/chat', methods=['POST'])
 @require_auth
+@rate_limit('chat')
+@enforce_token_quota('chat')
 def chat():
     """Handle chat messages with streaming response and continuous memory."""
     try:
@@ -1123,113 +2252,74 @@ def chat():
             return jsonify({'error': 'No message provided'}), 400
         
         # Get or create session
-        if not session_id or session_id not in chat_sessions:
-            session_id = str(uuid.uuid4())
-            chat_sessions[session_id] = {
-                'id': session_id,
-                'title': user_message[:50] + '...' if len(user_message) > 50 else user_message,
-                'messages': [],
-                'created_at': datetime.now().isoformat(),
-                'user': session['user']
-            }
+        chat_session = get_user_session(session_id) if session_id else None
+        if chat_session is None:
+            chat_session = ChatSession(session['user'])
+            chat_sessions[chat_session.id] = chat_session
+        session_id = chat_session.id
+        tracing.annotate(session_id=session_id)
         
         # Store filename for context
         filename = data.get('filename', '')
         
         # Add user message to session
-        user_msg = {
-            'id': str(uuid.uuid4()),
-            'role': 'user',
-            'content': user_message,
-            'timestamp': datetime.now().isoformat(),
-            'image': image_data,
-            'document_content': document_content,
-            'filename': filename
-        }
-        chat_sessions[session_id]['messages'].append(user_msg)
+        user_msg = Message('user', user_message, image=image_data,
+                           document_content=document_content, filename=filename)
+        chat_session.messages.append(user_msg)
+        RESIDENT_MESSAGES.inc()
+        search_index.add(chat_session.user, session_id, user_msg.id, user_message)
+        if len(chat_session.messages) == 1 and chat_session.title == 'New Chat' and user_message:
+            # New sessions take their title from the first question
+            chat_session.title = user_message[:50] + '...' if len(user_message) > 50 else user_message
+        session_index.touch(chat_session.user, session_id)
+        
+        # Context-free first questions can be answered from the answer cache
+        cacheable = (answer_cache.ttl > 0 and len(chat_session.messages) == 1
+                     and not image_data and not document_content)
         
         def generate_response():
             try:
-                model = initialize_model()
-                
-                # Build conversation context for memory
-                conversation_history = chat_sessions[session_id]['messages'][:-1]  # Exclude current message
-                context = build_conversation_context(conversation_history)
-                context = trim_context_if_needed(context)
-                
-                # Prepare content for Gemini with context
-                content_parts = []
-                
-                # Add conversation context if exists
-                if context:
-                    content_parts.append(f"Previous conversation context:\n{context}\n\n---\n\n")
-                
-                # Add current message components
-                if image_data:
-                    # Handle image
-                    image_bytes = base64.b64decode(image_data.split(',')[1])
-                    content_parts.append({
-                        'mime_type': 'image/jpeg',
-                        'data': image_bytes
-                    })
+                cached = None
+                if cacheable:
+                    with tracing.span('answer_cache_lookup'):
+                        cached = answer_cache.lookup(user_message)
+                    tracing.annotate(answer_cache='hit' if cached else 'miss')
                 
-                if document_content:
-                    content_parts.append(f"Document content ({filename}):\n{document_content}\n\n")
-                
-                # Add the current user message
-                current_query = f"Current question/request: {user_message}"
-                content_parts.append(current_query)
-                
-                # Generate response with context
-                response = model.generate_content(content_parts)
-                
-                if response.candidates and response.candidates[0].content.parts:
-                    assistant_message = response.candidates[0].content.parts[0].text
-                    # Clean up any remaining \n characters
-                    assistant_message = assistant_message.replace('\\n', '').replace('\n\n', '\n').strip()
+                if cached:
+                    assistant_message = cached[0]
                 else:
+                    assistant_message = generate_chat_answer(session_id, user_message, image_data,
+                                                             document_content, filename)
+                    if assistant_message and cacheable:
+                        answer_cache.store(user_message, assistant_message)
+                if not assistant_message:
                     assistant_message = "I apologize, but I couldn't generate a response at the moment. Please try again."
                 
                 # Add assistant message to session for future context
-                assistant_msg = {
-                    'id': str(uuid.uuid4()),
-                    'role': 'assistant',
-                    'content': assistant_message,
-                    'timestamp': datetime.now().isoformat()
-                }
-                chat_sessions[session_id]['messages'].append(assistant_msg)
+                assistant_msg = Message('assistant', assistant_message)
+                chat_session.messages.append(assistant_msg)
+                RESIDENT_MESSAGES.inc()
+                search_index.add(chat_session.user, session_id, assistant_msg.id, assistant_message)
+                session_index.touch(chat_session.user, session_id)
+                message_id = format_id(assistant_msg.id)
                 
                 # Stream the response with improved formatting
-                yield f"data: {json.dumps({'type': 'start', 'session_id': session_id})}\n\n"
-                
-                # Split response into chunks for better streaming
-                paragraphs = assistant_message.split('\n\n')
-                for para_idx, paragraph in enumerate(paragraphs):
-                    if paragraph.strip():
-                        # Stream paragraph word by word
-                        words = paragraph.split()
-                        for word_idx, word in enumerate(words):
-                            yield f"data: {json.dumps({'type': 'token', 'content': word + ' '})}\n\n"
-                            time.sleep(0.008)  # Optimized streaming speed
-                        
-                        # Add paragraph break if not the last paragraph
-                        if para_idx < len(paragraphs) - 1:
-                            newline_content = '\n\n'
-                            yield f"data: {json.dumps({'type': 'token', 'content': newline_content})}\n\n"
-                            time.sleep(0.02)
-                
-                yield f"data: {json.dumps({'type': 'end', 'message_id': assistant_msg['id']})}\n\n"
+                replay = replay_store.create(message_id, session_id)
+                try:
+                    with SSE_DELIVERY_SECONDS.time(), tracing.span('sse_delivery', chars=len(assistant_message)):
+                        yield sse_event({'type': 'start', 'session_id': session_id, 'message_id': message_id,
+                                         'cached': bool(cached)}, 0)
+                        yield from stream_answer(replay, assistant_message)
+                        yield sse_event({'type': 'end', 'message_id': message_id})
+                finally:
+                    # A client that went away can resume at once instead of waiting on pacing
+                    complete_replay(replay, assistant_message)
                 
             except Exception as e:
                 error_message = f"I encountered an error while processing your request. Please try again. Error: {str(e)}"
-                yield f"data: {json.dumps({'type': 'error', 'error': error_message})}\n\n"
+                yield sse_event({'type': 'error', 'error': error_message})
         
-        return Response(stream_with_context(generate_response()), 
-                      mimetype='text/event-stream',
-                      headers={
-                          'Cache-Control': 'no-cache',
-                          'X-Accel-Buffering': 'no'  # Disable nginx buffering
-                      })
+        return event_stream(generate_response())
         
     except Exception as e:
         print(f"Error in chat endpoint: {str(e)}")
@@ -1238,8 +2328,46 @@ def chat():
             'error': 'An error occurred while processing your message. Please try again.'
         }), 500
 
+@app.route('/api/chat/stream/<message_id>', methods=['GET'])
+@require_auth
+@rate_limit('chat_resume', tier='cheap')
+def resume_chat_stream(message_id):
+    """Resume an interrupted chat answer after the client's Last-Event-ID."""
+    offset = parse_last_event_id(request.headers.get('Last-Event-ID', request.args.get('last_event_id')))
+    replay = replay_store.get(message_id)
+    content = None
+    session_id = replay.session_id if replay is not None else request.args.get('session_id')
+    # peek() does not bring a spilled session back into memory
+    chat_session = chat_sessions.peek(session_id) if session_id else None
+    if chat_session is None or chat_session.user != session['user']:
+        return jsonify({'success': False, 'message': 'Message not found'}), 404
+    if replay is None:
+        # The buffer expired, so rebuild the stream from the saved answer
+        index = chat_session.find_message(parse_id(message_id))
+        if index is None or chat_session.messages[index].role != 'assistant':
+            return jsonify({'success': False, 'message': 'Message not found'}), 404
+        content = chat_session.messages[index].content
+    tracing.annotate(session_id=session_id, resume_offset=offset)
+    
+    def generate_resume():
+        yield sse_event({'type': 'start', 'session_id': session_id, 'message_id': message_id, 'resumed': True})
+        if replay is not None:
+            for event_id, text in replay.read_from(offset):
+                yield sse_event({'type': 'token', 'content': text}, event_id)
+            if not replay.done:
+                yield sse_event({'type': 'error', 'error': 'The answer stream stalled. Please try again.'})
+                return
+        else:
+            streamed = ''.join(answer_pieces(content))
+            if offset < len(streamed):
+                yield sse_event({'type': 'token', 'content': streamed[offset:]}, len(streamed))
+        yield sse_event({'type': 'end', 'message_id': message_id})
+    
+    return event_stream(generate_resume())
+
 @app.route('/api/upload', methods=['POST'])
 @require_auth
+@rate_limit('upload')
 def upload_file():
     """Handle file uploads (images and documents)."""
     try:
@@ -1285,6 +2413,7 @@ def upload_file():
 
 @app.route('/api/voice', methods=['POST'])
 @require_auth
+@rate_limit('tts')
 def text_to_speech():
     """Convert text to speech."""
     try:
@@ -1309,8 +2438,11 @@ def text_to_speech():
 @require_auth
 def clear_session_memory(session_id):
     """Clear session memory while keeping the session active."""
-    if session_id in chat_sessions and chat_sessions[session_id].get('user') == session['user']:
-        chat_sessions[session_id]['messages'] = []
+    chat_session = get_user_session(session_id)
+    if chat_session is not None:
+        RESIDENT_MESSAGES.dec(amount=len(chat_session.messages))
+        chat_session.messages = []
+        search_index.remove_session(chat_session.user, session_id)
         return jsonify({'success': True, 'message': 'Session memory cleared'})
     return jsonify({'error': 'Session not found'}), 404
 
@@ -1318,17 +2450,18 @@ def clear_session_memory(session_id):
 @require_auth
 def get_session_summary(session_id):
     """Get a summary of the session conversation."""
-    if session_id not in chat_sessions or chat_sessions[session_id].get('user') != session['user']:
+    chat_session = get_user_session(session_id)
+    if chat_session is None:
         return jsonify({'error': 'Session not found'}), 404
     
-    messages = chat_sessions[session_id]['messages']
+    messages = chat_session.messages
     if not messages:
         return jsonify({'summary': 'No conversation yet'})
     
     # Generate a simple summary based on message count and topics
-    user_messages = [msg for msg in messages if msg['role'] == 'user']
+    user_messages = [msg for msg in messages if msg.role == 'user']
     total_messages = len(messages)
-    topics = [msg['content'][:50] + '...' if len(msg['content']) > 50 else msg['content'] 
+    topics = [msg.content[:50] + '...' if len(msg.content) > 50 else msg.content 
               for msg in user_messages[:5]]  # First 5 topics
     
     summary = {
@@ -1336,14 +2469,87 @@ def get_session_summary(session_id):
         'user_messages': len(user_messages),
         'recent_topics': topics,
         'session_duration': 'Active session',
-        'created_at': chat_sessions[session_id]['created_at']
+        'created_at': chat_session.created_at
     }
     
     return jsonify({'summary': summary})
 
+@app.route('/api/usage', methods=['GET'])
+@require_auth
+def get_own_usage():
+    """Get today's token usage and quota for the logged-in user."""
+    user = session['user']
+    return jsonify({
+        'success': True,
+        'tokens_today': usage_store.tokens_today(user),
+        'daily_quota': usage_store.daily_quota or None,
+        'endpoint_quotas': usage_store.endpoint_quotas,
+        'rate_limits': rate_limiter.describe()
+    })
+
+@app.route('/api/admin/usage', methods=['GET'])
+@require_admin
+def get_usage_report():
+    """Aggregate token usage by user, endpoint, hour or day."""
+    try:
+        def parse_time(value):
+            if not value:
+                return None
+            if value.isdigit():
+                return int(value)
+            return int(datetime.fromisoformat(value).timestamp())
+
+        group_by = [column.strip() for column in request.args.get('group_by', 'user,endpoint').split(',')]
+        rows = usage_store.query(
+            user=request.args.get('user'),
+            endpoint=request.args.get('endpoint'),
+            since=parse_time(request.args.get('since')),
+            until=parse_time(request.args.get('until')),
+            group_by=group_by
+        )
+        for row in rows:
+            for column in ('hour', 'day'):
+                if column in row:
+                    row[column] = datetime.fromtimestamp(row[column], timezone.utc).isoformat()
+        return jsonify({'success': True, 'usage': rows})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Invalid query: {str(e)}'}), 400
+    except Exception as e:
+        print(f"Error building usage report: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to build usage report'}), 500
+
+@app.route('/api/admin/sessions', methods=['GET'])
+@require_admin
+def get_session_stats():
+    """Chat sessions resident in this worker and spilled to disk."""
+    return jsonify({
+        'success': True,
+        'resident': len(chat_sessions),
+        'spilled': chat_sessions.spilled_count(),
+        'idle_ttl': chat_sessions.idle_ttl,
+        'memory_budget_bytes': chat_sessions.max_bytes
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Expose metrics in the Prometheus text format."""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+def preload():
+    """Load heavy modules and render the pages once in the gunicorn master, before it forks the workers."""
+    llm_backend.ensure_configured()
+    preload_tts()
+    import PyPDF2  # noqa: F401
+    if DOCX_AVAILABLE:
+        import docx  # noqa: F401
+    page_cache.warm(['login.html', 'student_details.html', 'welcome.html', 'index.html', 'flashcards.html',
+                     'mcq_generator.html', 'youtube_suggestions.html', 'voice_assistant.html'])
+
 if __name__ == '__main__':
     # Check if API key is set
-    if not os.getenv('GEMINI_API_KEY'):
+    if llm_backend.name == 'gemini' and not os.getenv('GEMINI_API_KEY'):
         print("Warning: GEMINI_API_KEY environment variable not set!")
         print("Please set your Google API key: set GEMINI_API_KEY=your_api_key_here")
     
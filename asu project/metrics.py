@@ -0,0 +1,348 @@
+"""
+In-process metrics for Lumora AI, exposed in the Prometheus text format.
+
+Counters, gauges and histograms keep plain Python numbers behind a per-metric
+lock, so recording an event costs about a microsecond.
+
+Under gunicorn every worker keeps its own values, and a scrape reaches only
+one of them. When METRICS_MULTIPROC_DIR is set, each worker writes a snapshot
+of its values to ``<dir>/metrics-<pid>.json`` every METRICS_FLUSH_SECONDS
+(``start_flusher()``), and ``render()`` merges the snapshots of the other
+workers with its own live values, so one scrape reports the whole server.
+Counters and histograms are summed, including those of workers that have
+exited, so totals never go backwards when a worker is replaced. Gauges are
+summed or maxed across live workers only, and gauges of shared state are
+computed by the worker answering the scrape (see ``Gauge``).
+"""
+import bisect
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Latency buckets in seconds, from sub-millisecond parsing up to slow model calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Shared directory for worker snapshots; unset keeps metrics per process
+MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')
+FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '1'))
+
+_registry = []
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Shared bookkeeping for all metric types."""
+
+    kind = 'untyped'
+    shared = False  # computed at scrape time only, never written to snapshots
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _check(self, labelvalues):
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labelvalues}")
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def items(self):
+        """Current ``(labelvalues, value)`` pairs of this process."""
+        return []
+
+    def merge(self, value, other):
+        """Combine the values of one series from two processes."""
+        return value + other
+
+    def samples(self, items=None):
+        return []
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. fallback paths taken."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        """Add ``amount`` to the series identified by ``labelvalues``."""
+        with self._lock:
+            current = self._values.get(labelvalues)
+            if current is None:
+                self._check(labelvalues)
+                current = 0
+            self._values[labelvalues] = current + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+    def samples(self, items=None):
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                for labels, value in (self.items() if items is None else items)]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down.
+
+    Pass ``callback`` to compute the value at scrape time instead of keeping it
+    up to date on every change; it must return a number (no labels) or a dict
+    mapping label tuples to numbers. ``aggregate`` says how the values of
+    several workers combine: 'sum' for state each worker holds on its own,
+    'max' for state they share (a common cache directory or database) or
+    where the worst worker matters. ``shared=True`` is for a callback that
+    reads state all workers see alike and is too costly to run on every
+    flush: only the worker answering a scrape runs it.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None, aggregate='sum', shared=False):
+        super().__init__(name, documentation, labelnames)
+        if aggregate not in ('sum', 'max'):
+            raise ValueError(f"{name}: aggregate must be 'sum' or 'max', got {aggregate!r}")
+        if shared and callback is None:
+            raise ValueError(f"{name}: a shared gauge needs a callback")
+        self._values = {}
+        self._callback = callback
+        self.aggregate = aggregate
+        self.shared = shared
+
+    def set(self, value, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def items(self):
+        if self._callback is not None:
+            try:
+                current = self._callback()
+            except Exception as e:
+                print(f"Error collecting gauge {self.name}: {str(e)}")
+                return []
+            return list(current.items()) if isinstance(current, dict) else [((), current)]
+        with self._lock:
+            return list(self._values.items())
+
+    def merge(self, value, other):
+        return max(value, other) if self.aggregate == 'max' else value + other
+
+    def samples(self, items=None):
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                for labels, value in (self.items() if items is None else items)]
+
+
+class _Timer:
+    """Context manager observing elapsed wall time into a histogram."""
+
+    __slots__ = ('_histogram', '_labelvalues', '_start')
+
+    def __init__(self, histogram, labelvalues):
+        self._histogram = histogram
+        self._labelvalues = labelvalues
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.observe(time.perf_counter() - self._start, *self._labelvalues)
+        return False
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (latencies in seconds by default)."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [bucket counts..., +Inf count, sum]
+        self._series = {}
+
+    def observe(self, value, *labelvalues):
+        """Record one observation."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                self._check(labelvalues)
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *labelvalues):
+        """Time a ``with`` block and observe its duration."""
+        return _Timer(self, labelvalues)
+
+    def count(self, *labelvalues):
+        series = self._series.get(labelvalues)
+        return sum(series[:-1]) if series else 0
+
+    def items(self):
+        with self._lock:
+            return [(labels, list(series)) for labels, series in self._series.items()]
+
+    def merge(self, value, other):
+        if len(other) != len(value):
+            # Written by a process with different buckets
+            return value
+        return [mine + theirs for mine, theirs in zip(value, other)]
+
+    def samples(self, items=None):
+        lines = []
+        for labels, series in (self.items() if items is None else items):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = ('le', _format_value(bound))
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(series[-1])}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+def _snapshot_path(pid):
+    return os.path.join(MULTIPROC_DIR, f'metrics-{pid}.json')
+
+
+def _write_snapshot(path, snapshot):
+    fd, temp_path = tempfile.mkstemp(dir=MULTIPROC_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'w') as temp_file:
+        json.dump(snapshot, temp_file)
+    os.replace(temp_path, path)
+
+
+def flush():
+    """Write this process's values to its snapshot file (multiprocess mode only)."""
+    if not MULTIPROC_DIR:
+        return
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+    snapshot = {metric.name: {'kind': metric.kind,
+                              'samples': [[list(labels), value] for labels, value in metric.items()]}
+                for metric in _registry if not metric.shared}
+    _write_snapshot(_snapshot_path(os.getpid()), snapshot)
+
+
+def start_flusher(interval=None):
+    """Flush this process's values every ``interval`` seconds from a daemon thread (call once per worker)."""
+    if not MULTIPROC_DIR:
+        return
+    interval = interval or FLUSH_SECONDS
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                flush()
+            except Exception as e:
+                print(f"Error flushing metrics: {str(e)}")
+
+    threading.Thread(target=run, name='metrics-flush', daemon=True).start()
+
+
+def mark_process_dead(pid):
+    """Drop the gauges of an exited worker; its counters and histograms keep counting in the totals."""
+    if not MULTIPROC_DIR:
+        return
+    path = _snapshot_path(pid)
+    try:
+        with open(path) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except (OSError, ValueError):
+        return
+    _write_snapshot(path, {name: metric for name, metric in snapshot.items() if metric.get('kind') != 'gauge'})
+
+
+def clear():
+    """Remove all snapshots, e.g. when the server starts (multiprocess mode only)."""
+    if not MULTIPROC_DIR:
+        return
+    for path in glob.glob(os.path.join(MULTIPROC_DIR, 'metrics-*.json')):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _other_snapshots():
+    own = _snapshot_path(os.getpid())
+    snapshots = []
+    for path in glob.glob(os.path.join(MULTIPROC_DIR, 'metrics-*.json')):
+        if path == own:
+            continue
+        try:
+            with open(path) as snapshot_file:
+                snapshots.append(json.load(snapshot_file))
+        except (OSError, ValueError):
+            # Removed, or replaced between listing and reading
+            continue
+    return snapshots
+
+
+def render():
+    """Render every registered metric in the Prometheus text exposition format.
+
+    In multiprocess mode the values of the other workers' snapshots are merged in.
+    """
+    snapshots = _other_snapshots() if MULTIPROC_DIR else []
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.header())
+        if not snapshots or metric.shared:
+            lines.extend(metric.samples())
+            continue
+        merged = dict(metric.items())
+        for snapshot in snapshots:
+            for labels, value in snapshot.get(metric.name, {}).get('samples', ()):
+                labels = tuple(labels)
+                merged[labels] = metric.merge(merged[labels], value) if labels in merged else value
+        lines.extend(metric.samples(merged.items()))
+    return '\n'.join(lines) + '\n'
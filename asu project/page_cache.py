@@ -0,0 +1,96 @@
+"""
+Rendered page cache for Lumora AI.
+
+The page routes render templates whose output does not depend on the
+request, so ``PageCache`` keeps each rendered page together with a gzip copy
+and an ETag. An entry is rebuilt when its template file changes or when the
+``version`` callable returns something new (the static asset fingerprints the
+page links to). A hit never touches Jinja: ``response()`` answers
+If-None-Match with 304 and otherwise serves the gzip copy to clients that
+accept it.
+"""
+import gzip
+import hashlib
+import os
+import threading
+
+from flask import Response, render_template, request
+
+import metrics
+
+PAGE_CACHE_TOTAL = metrics.Counter('lumora_page_cache_total', 'Page route responses by cache result', ('result',))
+
+# Pages must be revalidated, and only the logged-in browser may keep them
+CACHE_CONTROL = 'private, no-cache'
+
+
+class _Page:
+    __slots__ = ('filename', 'signature', 'body', 'gzip_body', 'etag')
+
+    def __init__(self, filename, signature, body):
+        self.filename = filename
+        self.signature = signature
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=6, mtime=0)
+        self.etag = hashlib.sha256(body).hexdigest()[:16]
+
+
+class PageCache:
+    """Rendered templates by name, invalidated by template mtime and ``version()``."""
+
+    def __init__(self, app, version=None, enabled=True):
+        self.app = app
+        self.version = version or (lambda: None)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._pages = {}
+
+    def _signature(self, filename):
+        return os.stat(filename).st_mtime_ns, self.version()
+
+    def _page(self, template_name):
+        """Return ``(page, cached)``, rendering the template if needed."""
+        page = self._pages.get(template_name)
+        if page is not None:
+            try:
+                if self._signature(page.filename) == page.signature:
+                    return page, True
+            except OSError:
+                pass
+        with self._lock:
+            if page is not None and self.app.jinja_env.cache is not None:
+                # Without auto_reload Jinja would keep compiling the old template
+                self.app.jinja_env.cache.clear()
+            filename = self.app.jinja_env.get_template(template_name).filename
+            signature = self._signature(filename)
+            page = _Page(filename, signature, render_template(template_name).encode('utf-8'))
+            self._pages[template_name] = page
+        return page, False
+
+    def warm(self, template_names):
+        """Render ``template_names`` ahead of the first request (in the gunicorn master before fork)."""
+        if not self.enabled:
+            return
+        with self.app.test_request_context():
+            for template_name in template_names:
+                self._page(template_name)
+
+    def response(self, template_name):
+        """Response for ``template_name``: 304, gzip or plain HTML."""
+        if not self.enabled:
+            return render_template(template_name)
+        page, cached = self._page(template_name)
+        headers = {'Cache-Control': CACHE_CONTROL, 'Vary': 'Accept-Encoding'}
+        if request.accept_encodings['gzip']:
+            headers['ETag'] = f'"{page.etag}-gz"'
+            headers['Content-Encoding'] = 'gzip'
+            body = page.gzip_body
+        else:
+            headers['ETag'] = f'"{page.etag}"'
+            body = page.body
+        if page.etag in request.headers.get('If-None-Match', ''):
+            PAGE_CACHE_TOTAL.inc('not_modified')
+            headers.pop('Content-Encoding', None)
+            return Response(status=304, headers=headers)
+        PAGE_CACHE_TOTAL.inc('hit' if cached else 'miss')
+        return Response(body, mimetype='text/html', headers=headers)
@@ -0,0 +1,229 @@
+"""
+Per-user request rate limiting for Lumora AI.
+
+Each (user, endpoint) pair has a token bucket that holds up to ``capacity``
+requests and refills at ``capacity / seconds`` requests per second, so a user
+can burst up to the limit and is then held to the average rate. Routes are
+split into tiers (model calls are "expensive", reads of the user's own data
+are "cheap") and single endpoints can be given their own limit.
+
+``MemoryBuckets`` keeps the buckets in a dict and is exact only within one
+process. ``SQLiteBuckets`` keeps them in a SQLite table that every gunicorn
+worker updates with one UPSERT per check, so the limit holds for the whole
+server. A check that cannot reach the store lets the request through.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: SQLite's own locking only
+    fcntl = None
+
+import metrics
+
+RATE_LIMIT_TOTAL = metrics.Counter('lumora_rate_limit_total', 'Rate limit checks by endpoint and result',
+                                   ('endpoint', 'result'))
+
+# Buckets idle this long are full again and can be forgotten
+PRUNE_SECONDS = 600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    allowed INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
+# Tokens after refilling, from the row's values before the update
+_REFILLED = 'MIN(:capacity, tokens + MAX(0, :now - updated) * :rate)'
+
+_TAKE = f"""
+INSERT INTO rate_buckets (key, tokens, updated, allowed) VALUES (:key, :capacity - :cost, :now, 1)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = {_REFILLED} - CASE WHEN {_REFILLED} >= :cost THEN :cost ELSE 0 END,
+    updated = :now,
+    allowed = {_REFILLED} >= :cost
+RETURNING tokens, allowed
+"""
+
+
+class Limit:
+    """``capacity`` requests per ``seconds``."""
+
+    __slots__ = ('capacity', 'seconds', 'rate')
+
+    def __init__(self, capacity, seconds):
+        self.capacity = capacity
+        self.seconds = seconds
+        self.rate = capacity / seconds
+
+    def __repr__(self):
+        return f'{self.capacity}/{self.seconds:g}'
+
+
+class Decision:
+    """Outcome of one check, with the values for the X-RateLimit-* headers."""
+
+    __slots__ = ('allowed', 'limit', 'remaining', 'retry_after', 'reset')
+
+    def __init__(self, allowed, limit, tokens):
+        self.allowed = allowed
+        self.limit = limit.capacity
+        self.remaining = max(0, int(tokens))
+        # Seconds until one request is allowed again, and until the bucket is full
+        self.retry_after = 0 if allowed else max(1, math.ceil((1 - tokens) / limit.rate))
+        self.reset = max(0, math.ceil((limit.capacity - tokens) / limit.rate))
+
+    def headers(self):
+        headers = {
+            'X-RateLimit-Limit': str(self.limit),
+            'X-RateLimit-Remaining': str(self.remaining),
+            'X-RateLimit-Reset': str(self.reset),
+        }
+        if not self.allowed:
+            headers['Retry-After'] = str(self.retry_after)
+        return headers
+
+
+def parse_limit(spec):
+    """Parse "20/60" (20 requests per 60 seconds) into a Limit; "0" or "" means unlimited."""
+    spec = (spec or '').strip()
+    if spec in ('', '0'):
+        return None
+    capacity, _, seconds = spec.partition('/')
+    try:
+        limit = Limit(int(capacity), float(seconds or 60))
+    except (ValueError, ZeroDivisionError):
+        print(f"Ignoring invalid rate limit '{spec}'")
+        return None
+    return limit if limit.capacity > 0 and limit.seconds > 0 else None
+
+
+def parse_limits(spec):
+    """Parse "chat=10/60,tts=60/60" into {'chat': Limit(10, 60), 'tts': Limit(60, 60)}."""
+    limits = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            name, _, value = item.partition('=')
+            limits[name.strip()] = parse_limit(value)
+    return limits
+
+
+class MemoryBuckets:
+    """Token buckets of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> [tokens, updated]
+        self._last_prune = time.time()
+
+    def take(self, key, limit, now, cost=1):
+        """Take ``cost`` tokens if available; return ``(allowed, tokens left)``."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(limit.capacity), now]
+            tokens = min(limit.capacity, bucket[0] + max(0.0, now - bucket[1]) * limit.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            bucket[0] = tokens
+            bucket[1] = now
+            if now - self._last_prune >= PRUNE_SECONDS:
+                self._prune(now)
+        return allowed, tokens
+
+    def _prune(self, now):
+        self._last_prune = now
+        for key in [key for key, (_, updated) in self._buckets.items() if now - updated >= PRUNE_SECONDS]:
+            del self._buckets[key]
+
+
+class SQLiteBuckets:
+    """Token buckets in a SQLite table shared by every worker."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._last_prune = time.time()
+
+    def _connection(self):
+        # SQLite connections must not cross threads or forked workers
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Losing bucket state in a crash only refills the buckets early
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._local.lock_file = open(self.path + '.lock', 'a') if fcntl else None
+        return conn
+
+    def take(self, key, limit, now, cost=1):
+        """Take ``cost`` tokens if available; return ``(allowed, tokens left)``."""
+        conn = self._connection()
+        lock_file = self._local.lock_file
+        params = {'key': key, 'capacity': limit.capacity, 'rate': limit.rate, 'now': now, 'cost': cost}
+        if lock_file is None:
+            tokens, allowed = conn.execute(_TAKE, params).fetchall()[0]
+        else:
+            # SQLite retries a busy write after sleeping at least a millisecond; an flock
+            # queues the workers and wakes the next one as soon as the update commits
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                tokens, allowed = conn.execute(_TAKE, params).fetchall()[0]
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        if now - self._last_prune >= PRUNE_SECONDS:
+            self._last_prune = now
+            conn.execute('DELETE FROM rate_buckets WHERE updated < ?', (now - PRUNE_SECONDS,))
+        return bool(allowed), tokens
+
+
+class RateLimiter:
+    """Per-user, per-endpoint token buckets with tier defaults and endpoint overrides."""
+
+    def __init__(self, store, tiers, overrides=None, enabled=True):
+        self.store = store
+        self.tiers = tiers  # tier name -> Limit or None
+        self.overrides = overrides or {}  # endpoint -> Limit or None
+        self.enabled = enabled
+
+    def limit_for(self, endpoint, tier):
+        if endpoint in self.overrides:
+            return self.overrides[endpoint]
+        return self.tiers.get(tier)
+
+    def check(self, user, endpoint, tier, cost=1, now=None):
+        """Take a request from ``user``'s bucket for ``endpoint``; None when the endpoint is unlimited."""
+        limit = self.limit_for(endpoint, tier) if self.enabled else None
+        if limit is None:
+            return None
+        now = now or time.time()
+        try:
+            allowed, tokens = self.store.take(f'{endpoint}\0{user}', limit, now, cost)
+        except sqlite3.Error as e:
+            print(f"Error checking rate limit: {str(e)}")
+            return None
+        RATE_LIMIT_TOTAL.inc(endpoint, 'allowed' if allowed else 'limited')
+        return Decision(allowed, limit, tokens)
+
+    def describe(self):
+        """Configured limits, for the admin API."""
+        return {
+            'enabled': self.enabled,
+            'store': type(self.store).__name__,
+            'tiers': {tier: repr(limit) if limit else None for tier, limit in self.tiers.items()},
+            'overrides': {endpoint: repr(limit) if limit else None for endpoint, limit in self.overrides.items()},
+        }
@@ -0,0 +1,362 @@
+"""
+Deadlines, hedged requests and a retry budget for Lumora AI model calls.
+
+``ResilientCaller`` runs each generate_content call in a thread pool and
+waits at most the endpoint's deadline for it. If the call is still running
+once it has taken longer than the ``hedge_percentile`` latency of recent
+calls to the same endpoint, a second identical attempt is started and
+whichever answers first wins. A call that fails is retried once. Hedges and
+retries are paid for from a ``RetryBudget`` shared by every endpoint of the
+process, so during an outage the extra attempts stay a small fraction of
+normal traffic instead of doubling it.
+
+Python threads cannot be interrupted, and the pinned google-generativeai
+release takes no per-call timeout, so a losing or late attempt is abandoned
+rather than killed: an attempt still queued is cancelled, a finished one is
+discarded and a losing stream is closed as soon as its first chunk arrives.
+For streams, attempts race to the first chunk; the rest of the winner is
+read by a pool thread into a queue, so the deadline also holds while the
+upstream stalls between chunks.
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import tracing
+
+MODEL_ATTEMPTS_TOTAL = metrics.Counter('lumora_model_attempts_total',
+                                       'Model call attempts by endpoint, kind and outcome',
+                                       ('endpoint', 'kind', 'outcome'))
+MODEL_DEADLINE_TOTAL = metrics.Counter('lumora_model_deadline_exceeded_total',
+                                       'Model calls abandoned at their deadline', ('endpoint',))
+RETRY_BUDGET_DENIED_TOTAL = metrics.Counter('lumora_model_retry_budget_exhausted_total',
+                                            'Hedges and retries skipped because the retry budget was empty',
+                                            ('endpoint', 'kind'))
+
+_END = object()
+
+
+class DeadlineExceeded(TimeoutError):
+    """The model did not answer within the endpoint's deadline."""
+
+
+def parse_deadlines(spec):
+    """Parse "chat=60,voice_chat=30" into {'chat': 60.0, 'voice_chat': 30.0}."""
+    deadlines = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        name, _, value = item.partition('=')
+        try:
+            deadlines[name.strip()] = float(value)
+        except ValueError:
+            print(f"Ignoring invalid model deadline '{item.strip()}'")
+    return deadlines
+
+
+class RetryBudget:
+    """Tokens for hedges and retries: ``ratio`` per call plus ``min_per_second``, up to ``capacity``."""
+
+    def __init__(self, ratio=0.1, min_per_second=1.0, capacity=10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._balance = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self._balance = min(self.capacity, self._balance + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        """Credit one first attempt."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._balance = min(self.capacity, self._balance + self.ratio)
+
+    def withdraw(self):
+        """Take a token for one extra attempt; False when the budget is spent."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+    def balance(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._balance
+
+
+class LatencyTracker:
+    """Recent successful attempt latencies per endpoint."""
+
+    def __init__(self, window=200, min_samples=20):
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples = {}  # endpoint -> deque of seconds
+
+    def record(self, endpoint, seconds):
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def endpoints(self):
+        with self._lock:
+            return sorted(self._samples)
+
+    def percentile(self, endpoint, pct):
+        """The ``pct`` percentile in seconds, or None until ``min_samples`` calls have finished."""
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class _Attempt:
+    __slots__ = ('kind', 'started', 'future')
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.started = time.monotonic()
+        self.future = None
+
+
+class _Race:
+    """Attempts of one call; the first to succeed wins and later ones are discarded."""
+
+    def __init__(self, endpoint, tracker, discard):
+        self.endpoint = endpoint
+        self.tracker = tracker
+        self.discard = discard
+        self.changed = threading.Condition()
+        self.attempts = []
+        self.winner = None
+        self.closed = False
+
+    def settle(self, attempt):
+        # Runs in the pool thread when an attempt finishes (or in the caller's if it was cancelled)
+        future = attempt.future
+        if future.cancelled():
+            MODEL_ATTEMPTS_TOTAL.inc(self.endpoint, attempt.kind, 'cancelled')
+            return
+        error = future.exception()
+        if error is None:
+            self.tracker.record(self.endpoint, time.monotonic() - attempt.started)
+        with self.changed:
+            won = error is None and self.winner is None and not self.closed
+            if won:
+                self.winner = attempt
+            self.changed.notify_all()
+        if error is not None:
+            MODEL_ATTEMPTS_TOTAL.inc(self.endpoint, attempt.kind, 'error')
+        elif won:
+            MODEL_ATTEMPTS_TOTAL.inc(self.endpoint, attempt.kind, 'won')
+        else:
+            MODEL_ATTEMPTS_TOTAL.inc(self.endpoint, attempt.kind, 'lost')
+            if self.discard is not None:
+                try:
+                    self.discard(future.result())
+                except Exception as e:
+                    print(f"Error discarding model attempt: {str(e)}")
+
+    def cancel_pending(self):
+        for attempt in self.attempts:
+            if attempt is not self.winner:
+                attempt.future.cancel()
+
+
+class Stream:
+    """Chunks of the winning streamed attempt; ``source`` is what its ``start()`` returned."""
+
+    def __init__(self, endpoint, source, iterator, first, deadline_at, executor=None):
+        self.endpoint = endpoint
+        self.source = source
+        self._iterator = iterator
+        self._first = first
+        self._deadline_at = deadline_at
+        self._executor = executor
+
+    def __iter__(self):
+        if self._first is _END:
+            return
+        stop = None
+        try:
+            yield self._first
+            if self._deadline_at is None:
+                yield from self._iterator
+                return
+            chunks = queue.Queue()
+            stop = threading.Event()
+            self._executor.submit(_pump, self._iterator, chunks, stop)
+            while True:
+                try:
+                    chunk, error = chunks.get(timeout=max(0.0, self._deadline_at - time.monotonic()))
+                except queue.Empty:
+                    MODEL_DEADLINE_TOTAL.inc(self.endpoint)
+                    raise DeadlineExceeded(f'{self.endpoint} model stream exceeded its deadline') from None
+                if error is not None:
+                    raise error
+                if chunk is _END:
+                    return
+                yield chunk
+        finally:
+            if stop is None:
+                _close_iterator(self._iterator)
+            else:
+                # The pump thread closes the upstream iterator when it next gets control
+                stop.set()
+
+
+def _pump(iterator, chunks, stop):
+    """Read a stream into ``chunks`` until it ends, fails or ``stop`` is set (run in a pool thread)."""
+    try:
+        for chunk in iterator:
+            if stop.is_set():
+                break
+            chunks.put((chunk, None))
+        else:
+            chunks.put((_END, None))
+    except Exception as e:
+        chunks.put((_END, e))
+    finally:
+        _close_iterator(iterator)
+
+
+def _close_iterator(iterator):
+    close = getattr(iterator, 'close', None)
+    if close is not None:
+        close()
+
+
+def _open_stream(start):
+    """Start a stream and wait for its first chunk (run as an attempt)."""
+    source = start()
+    iterator = iter(source)
+    return source, iterator, next(iterator, _END)
+
+
+def _close_stream(opened):
+    _close_iterator(opened[1])
+
+
+class ResilientCaller:
+    """Model calls with per-endpoint deadlines, a hedged second attempt, one retry and a retry budget."""
+
+    def __init__(self, deadlines=None, default_deadline=60.0, hedge_percentile=95.0, hedge_min_seconds=0.05,
+                 max_attempts=2, budget=None, tracker=None, max_workers=64, enabled=True):
+        self.deadlines = deadlines or {}  # endpoint -> seconds
+        self.default_deadline = default_deadline
+        self.hedge_percentile = hedge_percentile  # 0 disables hedging
+        self.hedge_min_seconds = hedge_min_seconds
+        self.max_attempts = max_attempts
+        self.budget = budget or RetryBudget()
+        self.tracker = tracker or LatencyTracker()
+        self.max_workers = max_workers
+        self.enabled = enabled
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        # Pools do not survive fork, so each gunicorn worker builds its own
+        with self._executor_lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='model')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def deadline_for(self, endpoint):
+        return self.deadlines.get(endpoint, self.default_deadline)
+
+    def hedge_delay(self, endpoint):
+        """Seconds after which a second attempt is started, or None when there is no hedging."""
+        if not self.hedge_percentile:
+            return None
+        latency = self.tracker.percentile(endpoint, self.hedge_percentile)
+        return None if latency is None else max(self.hedge_min_seconds, latency)
+
+    def call(self, endpoint, start, discard=None):
+        """Return the first successful ``start()`` result, raising DeadlineExceeded after the endpoint's deadline.
+
+        ``start`` runs in a pool thread. ``discard(result)`` receives the result of
+        every attempt that finishes after another one won or the call gave up.
+        """
+        if not self.enabled:
+            return start()
+        return self._race(endpoint, start, discard)[0]
+
+    def stream(self, endpoint, start):
+        """Race streamed attempts to their first chunk and return a Stream of the winner's chunks.
+
+        ``start()`` returns an iterable of chunks (a streamed generate_content response).
+        """
+        if not self.enabled:
+            source, iterator, first = _open_stream(start)
+            return Stream(endpoint, source, iterator, first, None)
+        (source, iterator, first), deadline_at = self._race(endpoint, lambda: _open_stream(start), _close_stream)
+        return Stream(endpoint, source, iterator, first, deadline_at, self._get_executor())
+
+    def _race(self, endpoint, start, discard):
+        deadline = self.deadline_for(endpoint)
+        started = time.monotonic()
+        deadline_at = started + deadline
+        hedge_delay = self.hedge_delay(endpoint)
+        hedge_at = None if hedge_delay is None or hedge_delay >= deadline else started + hedge_delay
+        race = _Race(endpoint, self.tracker, discard)
+        executor = self._get_executor()
+        self.budget.deposit()
+
+        def launch(kind):
+            attempt = _Attempt(kind)
+            race.attempts.append(attempt)
+            attempt.future = executor.submit(start)
+            attempt.future.add_done_callback(lambda _future: race.settle(attempt))
+
+        with race.changed:
+            launch('primary')
+            while race.winner is None:
+                now = time.monotonic()
+                if now >= deadline_at:
+                    race.closed = True
+                    break
+                extra = len(race.attempts) < self.max_attempts
+                if not any(not attempt.future.done() for attempt in race.attempts):
+                    # Every attempt failed: retry while time and budget allow, else give up
+                    if extra and self._spend(endpoint, 'retry'):
+                        launch('retry')
+                        continue
+                    race.closed = True
+                    break
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    if extra and self._spend(endpoint, 'hedge'):
+                        launch('hedge')
+                wake_at = deadline_at if hedge_at is None else min(deadline_at, hedge_at)
+                race.changed.wait(wake_at - now)
+        race.cancel_pending()
+        tracing.annotate(model_attempts=len(race.attempts))
+
+        if race.winner is not None:
+            return race.winner.future.result(), deadline_at
+        if time.monotonic() >= deadline_at:
+            MODEL_DEADLINE_TOTAL.inc(endpoint)
+            raise DeadlineExceeded(f'{endpoint} model call exceeded its {deadline:g}s deadline')
+        raise race.attempts[-1].future.exception()
+
+    def _spend(self, endpoint, kind):
+        if self.budget.withdraw():
+            return True
+        RETRY_BUDGET_DENIED_TOTAL.inc(endpoint, kind)
+        return False
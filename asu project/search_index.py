@@ -0,0 +1,244 @@
+"""
+Full-text search over chat history for Lumora AI.
+
+``SearchIndex`` keeps an inverted index per user over the text of every chat
+message. It is updated as messages are appended and when sessions are
+cleared or deleted, so a search never scans sessions. Results are ranked
+with BM25 and ``snippet()`` cuts the part of a message around the matched
+terms.
+
+Postings are compact arrays of internal document numbers and term
+frequencies, in the order messages were written. Query terms are processed
+rarest first; once they have produced a page of candidates, commoner terms
+only add to the scores of those candidates (found by binary search) instead
+of scanning their whole posting lists. Removed messages are tombstoned (and
+still counted in the IDF statistics) until a quarter of a user's documents
+are gone; compaction then drops them and renumbers the rest. The index only
+holds ids and counts, not message text, so sessions spilled to disk stay
+searchable without keeping their text in memory.
+"""
+import heapq
+import math
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+
+# Words, including the vowel signs of the Indic scripts between U+0900 and U+0D7F
+_TOKEN = re.compile(r'[\w\u0900-\u0D7F]+')
+
+STOPWORDS = frozenset(
+    'a an and are as at be but by can do does for from how i if in into is it its me my of on or '
+    'so that the their then there these this to was what when where which who why will with you your'.split()
+)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Newest postings scanned for a term found in more messages than this; such a
+# term barely affects ranking, so recent messages are preferred
+SCAN_LIMIT = 10000
+
+
+@lru_cache(maxsize=65536)
+def normalize_term(word):
+    """Casefold and strip a plural 's' so "B-trees" finds "B-tree"."""
+    word = word.casefold()
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Index terms of ``text`` in order, stopwords removed."""
+    terms = [normalize_term(word) for word in _TOKEN.findall(text or '')]
+    return [term for term in terms if term not in STOPWORDS]
+
+
+def snippet(text, terms, width=160):
+    """Return ``(snippet, highlights)`` for the window of ``text`` with the most matched terms.
+
+    ``highlights`` are ``[start, end]`` character ranges of the matches within
+    the snippet. Ellipses mark text cut at either end.
+    """
+    terms = set(terms)
+    hits = [(match.start(), match.end()) for match in _TOKEN.finditer(text)
+            if normalize_term(match.group()) in terms]
+    if not hits:
+        cut = text[:width]
+        return (cut + '...' if len(text) > width else cut), []
+    # Window starting at the hit that has the most other hits after it
+    best, best_count, last = 0, 0, 0
+    for first in range(len(hits)):
+        last = max(last, first)
+        while last + 1 < len(hits) and hits[last + 1][1] - hits[first][0] <= width:
+            last += 1
+        if last - first + 1 > best_count:
+            best, best_count = first, last - first + 1
+    start = max(0, hits[best][0] - width // 4)
+    if start:
+        space = text.rfind(' ', 0, start)
+        start = space + 1 if space >= 0 and start - space < 20 else start
+    end = min(len(text), start + width)
+    if end < len(text):
+        space = text.find(' ', end)
+        end = space if 0 <= space < end + 20 else end
+    prefix = '...' if start else ''
+    cut = prefix + text[start:end].replace('\n', ' ') + ('...' if end < len(text) else '')
+    offset = len(prefix) - start
+    highlights = [[hit_start + offset, hit_end + offset] for hit_start, hit_end in hits
+                  if hit_start >= start and hit_end <= end]
+    return cut, highlights
+
+
+class _UserIndex:
+    """Inverted index of one user's messages."""
+
+    def __init__(self):
+        self.postings = {}  # term -> (array of doc numbers, array of term frequencies)
+        self.doc_message = []  # doc number -> (session id, message id), None once removed
+        self.doc_length = array('I')
+        self.session_docs = {}  # session id -> [doc numbers]
+        self.deleted = set()
+        self.live = 0
+        self.total_length = 0
+
+    def add(self, session_id, message_id, text):
+        terms = tokenize(text)
+        if not terms:
+            return
+        doc = len(self.doc_message)
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = (array('I'), array('H'))
+            entry[0].append(doc)
+            entry[1].append(min(count, 65535))
+        self.doc_message.append((session_id, message_id))
+        self.doc_length.append(len(terms))
+        self.session_docs.setdefault(session_id, []).append(doc)
+        self.live += 1
+        self.total_length += len(terms)
+
+    def remove_session(self, session_id):
+        for doc in self.session_docs.pop(session_id, ()):
+            if self.doc_message[doc] is None:
+                continue
+            self.doc_message[doc] = None
+            self.deleted.add(doc)
+            self.live -= 1
+            self.total_length -= self.doc_length[doc]
+        if len(self.deleted) > max(64, self.live // 3):
+            self._compact()
+
+    def _compact(self):
+        # Renumber the remaining documents in order, so posting lists stay sorted
+        renumbered = array('i', [-1]) * len(self.doc_message)
+        doc_message, doc_length = [], array('I')
+        for doc, message in enumerate(self.doc_message):
+            if message is not None:
+                renumbered[doc] = len(doc_message)
+                doc_message.append(message)
+                doc_length.append(self.doc_length[doc])
+        for term, (docs, frequencies) in list(self.postings.items()):
+            kept = [(renumbered[doc], frequency) for doc, frequency in zip(docs, frequencies)
+                    if renumbered[doc] >= 0]
+            if kept:
+                self.postings[term] = (array('I', [doc for doc, _ in kept]), array('H', [f for _, f in kept]))
+            else:
+                del self.postings[term]
+        self.session_docs = {session_id: [renumbered[doc] for doc in docs]
+                             for session_id, docs in self.session_docs.items()}
+        self.doc_message = doc_message
+        self.doc_length = doc_length
+        self.deleted = set()
+
+    def search(self, terms, limit, session_id=None):
+        if not self.live:
+            return []
+        average_length = self.total_length / self.live
+        # Document frequencies include tombstoned messages until compaction, so count them here too
+        documents = len(self.doc_message)
+        allowed = set(self.session_docs.get(session_id, ())) if session_id else None
+        deleted = self.deleted
+        doc_length = self.doc_length
+        base = K1 * (1 - B)
+        scale = K1 * B / average_length
+        entries = sorted((self.postings[term] for term in set(terms) if term in self.postings),
+                         key=lambda entry: len(entry[0]))
+        scores = {}
+        for docs, frequencies in entries:
+            frequency_in_docs = len(docs)
+            idf = math.log(1 + (documents - frequency_in_docs + 0.5) / (frequency_in_docs + 0.5))
+            weight = idf * (K1 + 1)
+            if len(scores) >= limit and len(scores) * math.log2(len(docs)) < len(docs):
+                # Rarer terms already filled a page: cheaper to look the candidates up than to scan
+                for doc in list(scores):
+                    position = bisect_left(docs, doc)
+                    if position < len(docs) and docs[position] == doc:
+                        frequency = frequencies[position]
+                        scores[doc] += weight * frequency / (frequency + base + scale * doc_length[doc])
+                continue
+            start = max(0, len(docs) - SCAN_LIMIT)
+            get = scores.get
+            for doc, frequency in zip(docs[start:], frequencies[start:]):
+                if (deleted or allowed is not None) and (doc in deleted or (allowed is not None and doc not in allowed)):
+                    continue
+                scores[doc] = get(doc, 0.0) + weight * frequency / (frequency + base + scale * doc_length[doc])
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [self.doc_message[doc] + (score,) for doc, score in best]
+
+
+class SearchIndex:
+    """BM25 index of chat messages, partitioned by user."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}
+
+    def add(self, user, session_id, message_id, text):
+        """Index one message."""
+        with self._lock:
+            index = self._users.get(user)
+            if index is None:
+                index = self._users[user] = _UserIndex()
+            index.add(session_id, message_id, text)
+
+    def add_many(self, user, messages):
+        """Index ``(session_id, message_id, text)`` tuples under one lock acquisition."""
+        with self._lock:
+            index = self._users.get(user)
+            if index is None:
+                index = self._users[user] = _UserIndex()
+            for session_id, message_id, text in messages:
+                index.add(session_id, message_id, text)
+
+    def remove_session(self, user, session_id):
+        """Drop every message of a session (on delete or clear)."""
+        with self._lock:
+            index = self._users.get(user)
+            if index is not None:
+                index.remove_session(session_id)
+
+    def search(self, user, query, limit=20, session_id=None):
+        """Return ``[(session_id, message_id, score), ...]`` best first, and the query terms."""
+        terms = tokenize(query)
+        if not terms:
+            return [], terms
+        with self._lock:
+            index = self._users.get(user)
+            if index is None:
+                return [], terms
+            return index.search(terms, limit, session_id), terms
+
+    def document_count(self, user=None):
+        with self._lock:
+            if user is not None:
+                index = self._users.get(user)
+                return index.live if index else 0
+            return sum(index.live for index in self._users.values())
@@ -0,0 +1,237 @@
+"""
+Server-side Flask sessions for Lumora AI.
+
+Flask's default session serializes everything (the user and the student
+details) into a signed cookie that every request, including each SSE and TTS
+call, sends and re-verifies. ``ServerSessionInterface`` stores the session
+data in SQLite (shared by all gunicorn workers) or in memory, and the cookie
+only carries an opaque ``<random id>.<generation>`` value.
+
+Lookups go through a small per-process cache. The generation is part of the
+cookie and changes on every write, so a worker never serves data older than
+the cookie it was sent. A session deleted by another worker can still be read
+from the cache for up to ``cache_seconds``.
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+import metrics
+
+SESSION_LOOKUP_TOTAL = metrics.Counter('lumora_web_session_lookup_total',
+                                       'Session cookie lookups by result', ('result',))
+
+# Expired sessions are deleted at most this often
+PURGE_SECONDS = 600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS web_sessions (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session data plus the id and generation it was loaded with."""
+
+    def __init__(self, initial=None, sid=None, generation=0, expires=0.0):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.generation = generation
+        self.expires = expires
+        self.modified = False
+        self.rotate = False
+
+    def regenerate(self):
+        """Issue a new session id on save (call when the user logs in)."""
+        self.rotate = True
+        self.modified = True
+
+
+class MemorySessionStore:
+    """Sessions of this process only (single worker or development)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}  # id -> (data json, expires)
+
+    def load(self, sid, now):
+        with self._lock:
+            entry = self._sessions.get(sid)
+        if entry is None or entry[1] <= now:
+            return None
+        return json.loads(entry[0]), entry[1]
+
+    def save(self, sid, data, expires):
+        with self._lock:
+            self._sessions[sid] = (json.dumps(data), expires)
+
+    def touch(self, sid, expires):
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is not None:
+                self._sessions[sid] = (entry[0], expires)
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def purge(self, now):
+        with self._lock:
+            for sid in [sid for sid, (_, expires) in self._sessions.items() if expires <= now]:
+                del self._sessions[sid]
+
+
+class SQLiteSessionStore:
+    """Sessions in a SQLite table shared by every worker."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        # SQLite connections must not cross threads or forked workers
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, sid, now):
+        row = self._connection().execute(
+            'SELECT data, expires FROM web_sessions WHERE id = ? AND expires > ?', (sid, now)
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def save(self, sid, data, expires):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO web_sessions (id, data, expires) VALUES (?, ?, ?)',
+            (sid, json.dumps(data), expires)
+        )
+
+    def touch(self, sid, expires):
+        self._connection().execute('UPDATE web_sessions SET expires = ? WHERE id = ?', (expires, sid))
+
+    def delete(self, sid):
+        self._connection().execute('DELETE FROM web_sessions WHERE id = ?', (sid,))
+
+    def purge(self, now):
+        self._connection().execute('DELETE FROM web_sessions WHERE expires <= ?', (now,))
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface keeping data server-side behind an opaque cookie."""
+
+    session_class = ServerSession
+
+    def __init__(self, store, lifetime=7 * 86400, cache_seconds=30, cache_size=10000):
+        self.store = store
+        self.lifetime = lifetime
+        self.cache_seconds = cache_seconds
+        self.cache_size = cache_size
+        # Sliding expiry is written back at most this often per session
+        self.refresh_seconds = min(3600, lifetime / 10)
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # cookie value -> (data, expires, cached_at)
+        self._last_purge = time.time()
+
+    def _cache_put(self, cookie, data, expires, now):
+        with self._lock:
+            self._cache[cookie] = (data, expires, now)
+            self._cache.move_to_end(cookie)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cache_drop(self, sid):
+        prefix = sid + '.'
+        with self._lock:
+            for cookie in [cookie for cookie in self._cache if cookie.startswith(prefix)]:
+                del self._cache[cookie]
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        sid, _, generation = (cookie or '').partition('.')
+        if not sid or not generation.isdigit():
+            return self.session_class()
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(cookie)
+        if cached is not None and now - cached[2] < self.cache_seconds and cached[1] > now:
+            SESSION_LOOKUP_TOTAL.inc('cached')
+            return self.session_class(dict(cached[0]), sid, int(generation), cached[1])
+        try:
+            loaded = self.store.load(sid, now)
+        except sqlite3.Error as e:
+            print(f"Error loading session: {str(e)}")
+            loaded = None
+        if loaded is None:
+            SESSION_LOOKUP_TOTAL.inc('missing')
+            return self.session_class()
+        SESSION_LOOKUP_TOTAL.inc('loaded')
+        data, expires = loaded
+        self._cache_put(cookie, data, expires, now)
+        return self.session_class(dict(data), sid, int(generation), expires)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        now = time.time()
+        try:
+            if now - self._last_purge >= PURGE_SECONDS:
+                self._last_purge = now
+                self.store.purge(now)
+            if not session:
+                if session.modified and session.sid:
+                    self.store.delete(session.sid)
+                    self._cache_drop(session.sid)
+                    response.delete_cookie(name, domain=domain, path=path)
+                return
+            if not session.modified:
+                if session.expires - now < self.lifetime - self.refresh_seconds:
+                    session.expires = now + self.lifetime
+                    self.store.touch(session.sid, session.expires)
+                return
+            sid, generation = session.sid, session.generation + 1
+            if sid is None or session.rotate:
+                if sid is not None:
+                    self.store.delete(sid)
+                    self._cache_drop(sid)
+                sid, generation = secrets.token_hex(16), 1
+            data = dict(session)
+            expires = now + self.lifetime
+            self.store.save(sid, data, expires)
+        except sqlite3.Error as e:
+            print(f"Error saving session: {str(e)}")
+            return
+        cookie = f'{sid}.{generation}'
+        self._cache_put(cookie, data, expires, now)
+        response.set_cookie(
+            name, cookie,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
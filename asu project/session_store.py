@@ -0,0 +1,324 @@
+"""
+Resident chat sessions with idle spill to disk for Lumora AI.
+
+``SessionStore`` holds the ``ChatSession`` objects of a worker in memory while
+they are in use. A background sweeper moves sessions that have been idle for
+``idle_ttl`` seconds, and the least recently used ones whenever resident
+sessions exceed ``max_bytes``, into a SQLite table as zlib-compressed JSON.
+``get()`` loads a spilled session back transparently the next time it is
+asked for, so callers never see the difference.
+
+Sessions used in the last ``min_idle`` seconds are never spilled, so a
+request that is still holding a session keeps writing to the live copy.
+Spilled sessions that are not touched for ``max_age`` seconds are deleted.
+``RESIDENT_MESSAGES`` counts the messages of resident sessions as they come
+and go; code that adds or removes messages of a resident session updates it.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import metrics
+from chat_store import ChatSession
+
+SESSION_SPILL_TOTAL = metrics.Counter('lumora_session_spill_total',
+                                      'Chat sessions spilled to disk, loaded back or purged', ('event',))
+RESIDENT_MESSAGES = metrics.Gauge('lumora_chat_messages', 'Chat messages held in memory')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spilled_sessions (
+    id TEXT PRIMARY KEY,
+    user TEXT NOT NULL,
+    title TEXT NOT NULL,
+    created INTEGER NOT NULL,
+    message_count INTEGER NOT NULL,
+    preview TEXT NOT NULL,
+    spilled INTEGER NOT NULL,
+    data BLOB NOT NULL
+)
+"""
+
+
+_INSERT = 'INSERT OR REPLACE INTO spilled_sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+
+
+def _preview(chat_session):
+    messages = chat_session.messages
+    return messages[-1].content[:200] if messages else ''
+
+
+def _row(chat_session, now):
+    data = zlib.compress(json.dumps(chat_session.to_record(), separators=(',', ':')).encode('utf-8'))
+    return (chat_session.id, chat_session.user, chat_session.title, chat_session.created,
+            len(chat_session.messages), _preview(chat_session), int(now), data)
+
+
+class SessionStore:
+    """Chat sessions by id: resident in memory, spilled to SQLite when idle."""
+
+    def __init__(self, path, idle_ttl=1800, max_bytes=0, min_idle=120, sweep_seconds=30, max_age=30 * 86400):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.min_idle = min(min_idle, idle_ttl) if idle_ttl else min_idle
+        self.sweep_seconds = sweep_seconds
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # Loading back is rare; one lock per worker keeps two requests from loading the same session
+        self._load_lock = threading.Lock()
+        self._resident = {}
+        self._used = OrderedDict()  # session id -> last use, least recently used first
+        self._local = threading.local()
+        self._sweeper = None
+        self._sweeper_pid = None
+
+    @property
+    def enabled(self):
+        return bool(self.idle_ttl or self.max_bytes)
+
+    def _connection(self):
+        # SQLite connections must not cross threads or forked workers
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(_SCHEMA)
+            conn.execute('CREATE INDEX IF NOT EXISTS spilled_sessions_spilled ON spilled_sessions (spilled)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _ensure_sweeper(self):
+        # Threads do not survive fork, so each gunicorn worker starts its own sweeper
+        if not self.enabled or (self._sweeper is not None and self._sweeper_pid == os.getpid()):
+            return
+        with self._lock:
+            if self._sweeper is None or self._sweeper_pid != os.getpid():
+                self._sweeper = threading.Thread(target=self._sweep_loop, name='session-sweeper', daemon=True)
+                self._sweeper_pid = os.getpid()
+                self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_seconds)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Error sweeping chat sessions: {str(e)}")
+
+    def _touch_locked(self, session_id, now):
+        self._used[session_id] = now
+        self._used.move_to_end(session_id)
+
+    def add(self, chat_session):
+        with self._lock:
+            previous = self._resident.get(chat_session.id)
+            self._resident[chat_session.id] = chat_session
+            self._touch_locked(chat_session.id, time.time())
+        if previous is not chat_session:
+            RESIDENT_MESSAGES.inc(amount=len(chat_session.messages) - len(previous.messages if previous else ()))
+        self._ensure_sweeper()
+
+    def __setitem__(self, session_id, chat_session):
+        self.add(chat_session)
+
+    def get(self, session_id, default=None):
+        """Return the session, loading it back from disk if it was spilled."""
+        if not session_id:
+            return default
+        with self._lock:
+            chat_session = self._resident.get(session_id)
+            if chat_session is not None:
+                self._touch_locked(session_id, time.time())
+                return chat_session
+        if not self.enabled:
+            return default
+        with self._load_lock:
+            with self._lock:
+                chat_session = self._resident.get(session_id)
+                if chat_session is not None:
+                    self._touch_locked(session_id, time.time())
+                    return chat_session
+            chat_session = self._load(session_id)
+            if chat_session is None:
+                return default
+            self.add(chat_session)
+        return chat_session
+
+    def __getitem__(self, session_id):
+        chat_session = self.get(session_id)
+        if chat_session is None:
+            raise KeyError(session_id)
+        return chat_session
+
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+
+    def __delitem__(self, session_id):
+        self.discard(session_id)
+
+    def discard(self, session_id):
+        """Forget a session, resident or spilled."""
+        with self._lock:
+            chat_session = self._resident.pop(session_id, None)
+            self._used.pop(session_id, None)
+        if chat_session is not None:
+            RESIDENT_MESSAGES.dec(amount=len(chat_session.messages))
+        if self.enabled:
+            try:
+                conn = self._connection()
+                with conn:
+                    conn.execute('DELETE FROM spilled_sessions WHERE id = ?', (session_id,))
+            except sqlite3.Error as e:
+                print(f"Error deleting spilled session: {str(e)}")
+
+    def values(self):
+        """Resident sessions."""
+        with self._lock:
+            return list(self._resident.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._resident)
+
+    def spilled_count(self):
+        if not self.enabled:
+            return 0
+        try:
+            return self._connection().execute('SELECT COUNT(*) FROM spilled_sessions').fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error counting spilled sessions: {str(e)}")
+            return 0
+
+    def describe(self, session_id):
+        """Listing fields of a session without loading it back: user, title, created, count, preview."""
+        with self._lock:
+            chat_session = self._resident.get(session_id)
+            if chat_session is not None:
+                return {
+                    'user': chat_session.user,
+                    'title': chat_session.title,
+                    'created': chat_session.created,
+                    'message_count': len(chat_session.messages),
+                    'preview': _preview(chat_session)
+                }
+        if not self.enabled:
+            return None
+        try:
+            row = self._connection().execute(
+                'SELECT user, title, created, message_count, preview FROM spilled_sessions WHERE id = ?',
+                (session_id,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading spilled session: {str(e)}")
+            return None
+        if row is None:
+            return None
+        return dict(zip(('user', 'title', 'created', 'message_count', 'preview'), row))
+
+    def peek(self, session_id):
+        """Return the session without making it resident: a decoded copy if it is spilled."""
+        with self._lock:
+            chat_session = self._resident.get(session_id)
+        if chat_session is not None or not self.enabled:
+            return chat_session
+        try:
+            row = self._connection().execute('SELECT data FROM spilled_sessions WHERE id = ?',
+                                             (session_id,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading spilled session: {str(e)}")
+            return None
+        if row is None:
+            return None
+        return ChatSession.from_record(json.loads(zlib.decompress(row[0])))
+
+    def add_spilled(self, chat_sessions):
+        """Write sessions straight to disk in one transaction, e.g. when importing.
+
+        Falls back to keeping them in memory when spilling is disabled.
+        """
+        if not self.enabled:
+            for chat_session in chat_sessions:
+                self.add(chat_session)
+            return
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.executemany(_INSERT, [_row(chat_session, now) for chat_session in chat_sessions])
+        SESSION_SPILL_TOTAL.inc('spill', amount=len(chat_sessions))
+
+    def _load(self, session_id):
+        try:
+            conn = self._connection()
+            with conn:
+                # Take the row so no other worker loads the same session
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute('SELECT data FROM spilled_sessions WHERE id = ?', (session_id,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute('DELETE FROM spilled_sessions WHERE id = ?', (session_id,))
+        except sqlite3.Error as e:
+            print(f"Error loading spilled session: {str(e)}")
+            return None
+        SESSION_SPILL_TOTAL.inc('rehydrate')
+        return ChatSession.from_record(json.loads(zlib.decompress(row[0])))
+
+    def _pick_victims_locked(self, now):
+        victims = []
+        for session_id, used in self._used.items():
+            if now - used < self.min_idle:
+                break
+            if self.idle_ttl and now - used >= self.idle_ttl:
+                victims.append(session_id)
+        if self.max_bytes:
+            spilling = set(victims)
+            resident_bytes = sum(chat_session.approx_bytes() for session_id, chat_session in self._resident.items()
+                                 if session_id not in spilling)
+            for session_id, used in self._used.items():
+                if resident_bytes <= self.max_bytes or now - used < self.min_idle:
+                    break
+                if session_id not in spilling:
+                    victims.append(session_id)
+                    resident_bytes -= self._resident[session_id].approx_bytes()
+        return [(session_id, self._used[session_id], self._resident[session_id]) for session_id in victims]
+
+    def sweep(self, now=None):
+        """Spill idle and over-budget sessions and purge old spilled ones; return the number spilled."""
+        if not self.enabled:
+            return 0
+        now = now or time.time()
+        with self._lock:
+            victims = self._pick_victims_locked(now)
+        spilled = 0
+        conn = self._connection()
+        for session_id, used, chat_session in victims:
+            with conn:
+                conn.execute(_INSERT, _row(chat_session, now))
+            with self._lock:
+                unchanged = self._used.get(session_id) == used
+                if unchanged:
+                    del self._resident[session_id]
+                    del self._used[session_id]
+            if unchanged:
+                spilled += 1
+                RESIDENT_MESSAGES.dec(amount=len(chat_session.messages))
+            else:
+                # Used again while it was being written; the resident copy stays authoritative
+                with conn:
+                    conn.execute('DELETE FROM spilled_sessions WHERE id = ?', (session_id,))
+        if spilled:
+            SESSION_SPILL_TOTAL.inc('spill', amount=spilled)
+        if self.max_age:
+            with conn:
+                purged = conn.execute('DELETE FROM spilled_sessions WHERE spilled < ?',
+                                      (int(now - self.max_age),)).rowcount
+            if purged:
+                SESSION_SPILL_TOTAL.inc('purge', amount=purged)
+        return spilled
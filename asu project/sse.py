@@ -0,0 +1,148 @@
+"""
+Server-sent event helpers for Lumora AI chat streams.
+
+Answers are streamed as ``token`` frames whose event id is the number of
+characters of the answer delivered so far. ``coalesce()`` batches the small
+pieces an answer is produced in (words, paragraph breaks) into frames on a
+size/time flush policy, so an answer costs tens of writes instead of one per
+word.
+
+Every frame sent for a message is also kept in a ``ReplayBuffer``. A client
+whose connection drops can reconnect with ``Last-Event-ID`` and receive the
+rest of the answer from the buffer, following it live if the original stream
+is still running, without generating the answer again. Buffers are kept per
+worker in a ``ReplayStore`` for a limited time.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def sse_event(payload, event_id=None):
+    """Format one SSE frame carrying ``payload`` as JSON."""
+    frame = f"data: {json.dumps(payload)}\n\n"
+    if event_id is not None:
+        frame = f"id: {event_id}\n{frame}"
+    return frame
+
+
+def coalesce(pieces, max_chars=64, max_delay=0.05):
+    """Join text pieces into batches of up to ``max_chars`` or ``max_delay`` seconds.
+
+    A batch is emitted once it reaches ``max_chars`` characters or when a
+    piece arrives ``max_delay`` seconds after the previous batch was emitted;
+    whatever is left is emitted at the end.
+    """
+    batch = []
+    size = 0
+    last_flush = time.perf_counter()
+    for piece in pieces:
+        batch.append(piece)
+        size += len(piece)
+        now = time.perf_counter()
+        if size >= max_chars or now - last_flush >= max_delay:
+            yield ''.join(batch)
+            batch = []
+            size = 0
+            last_flush = now
+    if batch:
+        yield ''.join(batch)
+
+
+def parse_last_event_id(value):
+    """Return the character offset carried by a Last-Event-ID value (0 if unusable)."""
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+class ReplayBuffer:
+    """Token frames of one streamed answer, readable from any offset while it is written."""
+
+    def __init__(self, message_id, session_id):
+        self.message_id = message_id
+        self.session_id = session_id
+        self.offsets = []  # character offset after each chunk
+        self.chunks = []
+        self.done = False
+        self.updated = time.time()
+        self._condition = threading.Condition()
+
+    @property
+    def length(self):
+        return self.offsets[-1] if self.offsets else 0
+
+    def append(self, text):
+        """Add one frame's text and return its event id (the new offset)."""
+        with self._condition:
+            offset = self.length + len(text)
+            self.chunks.append(text)
+            self.offsets.append(offset)
+            self.updated = time.time()
+            self._condition.notify_all()
+            return offset
+
+    def finish(self):
+        with self._condition:
+            self.done = True
+            self.updated = time.time()
+            self._condition.notify_all()
+
+    def read_from(self, offset, timeout=30.0):
+        """Yield ``(event_id, text)`` for everything after ``offset``, waiting for live frames.
+
+        Stops when the buffer is finished or nothing new arrives for ``timeout`` seconds.
+        """
+        index = 0
+        while True:
+            with self._condition:
+                if index >= len(self.chunks) and not self.done:
+                    self._condition.wait(timeout)
+                    if index >= len(self.chunks) and not self.done:
+                        return
+                pending = list(zip(self.offsets[index:], self.chunks[index:]))
+                index = len(self.chunks)
+                done = self.done
+            for end, text in pending:
+                if end <= offset:
+                    continue
+                start = end - len(text)
+                # Resume mid-frame when the client's offset is not a frame boundary
+                yield end, text[max(0, offset - start):]
+            if done:
+                return
+
+
+class ReplayStore:
+    """Recent replay buffers by message id, bounded in count and age."""
+
+    def __init__(self, max_buffers=500, ttl=600):
+        self.max_buffers = max_buffers
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._buffers = OrderedDict()
+
+    def create(self, message_id, session_id):
+        buffer = ReplayBuffer(message_id, session_id)
+        with self._lock:
+            self._buffers[message_id] = buffer
+            self._expire_locked()
+        return buffer
+
+    def get(self, message_id):
+        with self._lock:
+            buffer = self._buffers.get(message_id)
+            if buffer is not None and buffer.done and time.time() - buffer.updated > self.ttl:
+                del self._buffers[message_id]
+                return None
+            return buffer
+
+    def _expire_locked(self):
+        now = time.time()
+        while self._buffers:
+            oldest = next(iter(self._buffers.values()))
+            if len(self._buffers) <= self.max_buffers and not (oldest.done and now - oldest.updated > self.ttl):
+                break
+            self._buffers.popitem(last=False)
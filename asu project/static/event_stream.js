@@ -0,0 +1,48 @@
+// Read server-sent events from a POST request.
+//
+// EventSource can only issue GET requests, so the generator pages post their
+// content with fetch and read the "data: {...}" frames from the response body.
+// onEvent is called with each parsed frame as soon as it arrives. A frame of
+// type "error" rejects the returned promise; it resolves once the stream ends.
+async function postEventStream(url, body, onEvent) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(body)
+    });
+
+    if (!response.ok) {
+        let message = `API request failed: ${response.status}`;
+        try {
+            const data = await response.json();
+            message = data.message || message;
+        } catch (error) {
+            // Not a JSON error body
+        }
+        throw new Error(message);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split('\n\n');
+        buffer = frames.pop();
+
+        for (const frame of frames) {
+            if (!frame.startsWith('data: ')) continue;
+            const data = JSON.parse(frame.slice(6));
+            if (data.type === 'error') {
+                throw new Error(data.error);
+            }
+            onEvent(data);
+        }
+    }
+}
@@ -0,0 +1,1170 @@
+// Voice Assistant JavaScript for Standalone Page
+class StandaloneVoiceAssistant {
+    constructor() {
+        this.isListening = false;
+        this.isSpeaking = false;
+        this.recognition = null;
+        this.synthesis = null;
+        this.currentLanguage = 'en';
+        this.sessionId = 'voice_' + Date.now();
+        this.voices = [];
+        this.settings = {
+            speed: 0.95,   // Slightly slower for smooth, clear speech (like ChatGPT)
+            pitch: 1.05,   // Slightly higher pitch for pleasant female voice
+            volume: 0.9
+        };
+
+        this.init();
+    }
+
+    init() {
+        this.setupSpeechRecognition();
+        this.setupSpeechSynthesis();
+        this.setupEventListeners();
+        this.updateRangeValues();
+        this.showDebugInfo();
+        console.log('Standalone Voice Assistant initialized successfully!');
+    }
+
+    showDebugInfo() {
+        // Show browser and speech recognition support info
+        const browserInfo = document.getElementById('browserInfo');
+        const speechRecognitionInfo = document.getElementById('speechRecognitionInfo');
+        const microphoneInfo = document.getElementById('microphoneInfo');
+
+        if (browserInfo) {
+            browserInfo.textContent = navigator.userAgent.includes('Chrome') ? 'Chrome ✅' : 
+                                    navigator.userAgent.includes('Edge') ? 'Edge ✅' : 
+                                    navigator.userAgent.includes('Safari') ? 'Safari ⚠️' : 'Other ⚠️';
+        }
+
+        if (speechRecognitionInfo) {
+            const hasRecognition = 'webkitSpeechRecognition' in window || 'SpeechRecognition' in window;
+            speechRecognitionInfo.textContent = hasRecognition ? 'Supported ✅' : 'Not Supported ❌';
+        }
+
+        if (microphoneInfo) {
+            microphoneInfo.textContent = navigator.mediaDevices ? 'Available ✅' : 'Not Available ❌';
+        }
+
+        // Show debug info if there are issues
+        if (!('webkitSpeechRecognition' in window) && !('SpeechRecognition' in window)) {
+            document.getElementById('debugInfo').style.display = 'block';
+        }
+    }
+
+    setupSpeechRecognition() {
+        if ('webkitSpeechRecognition' in window) {
+            this.recognition = new webkitSpeechRecognition();
+        } else if ('SpeechRecognition' in window) {
+            this.recognition = new SpeechRecognition();
+        } else {
+            console.warn('Speech recognition not supported in this browser');
+            this.updateStatus('Speech recognition not supported. Please use Chrome or Edge.');
+            return;
+        }
+
+        if (this.recognition) {
+            // Enhanced speech recognition settings for better waiting
+            this.recognition.continuous = false;
+            this.recognition.interimResults = true;
+            this.recognition.lang = this.getLanguageCode(this.currentLanguage);
+            this.recognition.maxAlternatives = 3; // Increased for better accuracy
+            this.recognitionTimeout = null;
+            this.silenceTimeout = null; // New timeout for silence detection
+            this.lastSpeechTime = null; // Track last speech activity
+
+            // Add service URI for better recognition
+            if ('webkitSpeechRecognition' in window) {
+                this.recognition.serviceURI = 'wss://www.google.com/speech-api/full-duplex/v1/up';
+            }
+
+            this.recognition.onstart = () => {
+                console.log('Speech recognition started');
+                this.updateStatus('Listening... Speak now!');
+                this.startListeningAnimation();
+                this.lastSpeechTime = Date.now();
+
+                // Extended timeout for longer listening (30 seconds)
+                this.recognitionTimeout = setTimeout(() => {
+                    if (this.isListening) {
+                        console.log('Speech recognition timeout after 30 seconds');
+                        this.recognition.stop();
+                    }
+                }, 30000);
+
+                // Start silence detection
+                this.startSilenceDetection();
+            };
+
+            this.recognition.onresult = (event) => {
+                console.log('Speech recognition result:', event.results);
+
+                let finalTranscript = '';
+                let interimTranscript = '';
+
+                for (let i = event.resultIndex; i < event.results.length; i++) {
+                    const transcript = event.results[i][0].transcript;
+                    if (event.results[i].isFinal) {
+                        finalTranscript += transcript;
+                    } else {
+                        interimTranscript += transcript;
+                    }
+                }
+
+                // Update last speech time when we detect speech
+                if (interimTranscript || finalTranscript) {
+                    this.lastSpeechTime = Date.now();
+                    this.resetSilenceTimeout();
+                }
+
+                if (interimTranscript) {
+                    this.updateStatus(`Listening: "${interimTranscript}"`);
+                }
+
+                if (finalTranscript) {
+                    console.log('Final speech recognized:', finalTranscript);
+                    // Wait a bit more to see if there's more speech coming
+                    setTimeout(() => {
+                        this.handleVoiceInput(finalTranscript.trim());
+                    }, 500); // 500ms delay to catch additional speech
+                }
+            };
+
+            this.recognition.onerror = (event) => {
+                console.error('Speech recognition error:', event.error, event);
+                let errorMessage = 'Speech recognition error. Please try again.';
+
+                if (this.recognitionTimeout) {
+                    clearTimeout(this.recognitionTimeout);
+                    this.recognitionTimeout = null;
+                }
+
+                switch(event.error) {
+                    case 'no-speech':
+                        errorMessage = 'No speech detected. Please speak louder and try again.';
+                        break;
+                    case 'audio-capture':
+                        errorMessage = 'Microphone not found. Please check your microphone connection.';
+                        break;
+                    case 'not-allowed':
+                        errorMessage = 'Microphone permission denied. Please allow microphone access and refresh the page.';
+                        break;
+                    case 'network':
+                        errorMessage = 'Network error. Please check your internet connection.';
+                        break;
+                    case 'aborted':
+                        console.log('Speech recognition aborted - this is normal');
+                        return; // Don't show error for aborted
+                    case 'service-not-allowed':
+                        errorMessage = 'Speech recognition service not allowed. Please check browser settings.';
+                        break;
+                    case 'bad-grammar':
+                        errorMessage = 'Speech recognition grammar error. Please try again.';
+                        break;
+                    default:
+                        errorMessage = `Speech recognition error: ${event.error}. Please try again.`;
+                }
+
+                this.updateStatus(errorMessage);
+                this.stopListeningAnimation();
+                this.isListening = false;
+
+                // Auto-retry for certain errors
+                if (['no-speech', 'network'].includes(event.error)) {
+                    setTimeout(() => {
+                        this.updateStatus('Click the microphone to try again');
+                    }, 2000);
+                }
+            };
+
+            this.recognition.onend = () => {
+                console.log('Speech recognition ended');
+
+                // Clear all timeouts
+                if (this.recognitionTimeout) {
+                    clearTimeout(this.recognitionTimeout);
+                    this.recognitionTimeout = null;
+                }
+
+                if (this.silenceTimeout) {
+                    clearTimeout(this.silenceTimeout);
+                    this.silenceTimeout = null;
+                }
+
+                this.stopListeningAnimation();
+                this.isListening = false;
+                this.updateStatus('Click the microphone to start talking');
+            };
+        }
+    }
+
+    getLanguageCode(lang) {
+        const languageMap = {
+            'en': 'en-US',
+            'ta': 'ta-IN',
+            'hi': 'hi-IN',
+            'te': 'te-IN',
+            'kn': 'kn-IN',
+            'ml': 'ml-IN'
+        };
+        return languageMap[lang] || 'en-US';
+    }
+
+    setupSpeechSynthesis() {
+        this.synthesis = window.speechSynthesis;
+        this.voices = this.synthesis.getVoices();
+
+        if (this.voices.length === 0) {
+            this.synthesis.onvoiceschanged = () => {
+                this.voices = this.synthesis.getVoices();
+                console.log('Voices loaded:', this.voices.length);
+            };
+        }
+    }
+
+    getVoiceForLanguage(lang) {
+        const preferredVoices = {
+            'en': [
+                // ChatGPT-style smooth female voices (most natural first)
+                'Microsoft Hazel Desktop',        // Smooth, warm female voice
+                'Microsoft Zira Desktop',         // Clear, natural female voice
+                'Microsoft Susan Desktop',        // Soft, pleasant female voice
+                'Microsoft Catherine Desktop',    // Professional female voice
+                'Google UK English Female',       // Natural British female
+                'Google US English Female',       // Natural American female
+                'Samantha',                       // macOS smooth female voice
+                'Victoria',                       // macOS clear female voice
+                'Alex',                           // macOS natural voice
+                'Microsoft Mark Desktop',         // Natural male fallback
+                'Google UK English Male',         // British male fallback
+                'Daniel',                         // macOS male fallback
+                'Google US English Male',         // American male fallback
+                'Microsoft David Desktop'         // Professional male fallback
+            ],
+            'ta': ['Google தமிழ் (India)', 'Microsoft Valluvar Desktop'],
+            'hi': ['Google हिन्दी (India)', 'Microsoft Hemant Desktop'],
+            'te': ['Google తెలుగు (India)', 'Microsoft Chitra Desktop'],
+            'kn': ['Google ಕನ್ನಡ (India)', 'Microsoft Gagan Desktop'],
+            'ml': ['Google മലയാളം (India)', 'Microsoft Ravi Desktop']
+        };
+
+        const langCode = this.getLanguageCode(lang);
+        const preferred = preferredVoices[lang] || [];
+
+        // First, try to find the best female voice (ChatGPT-style)
+        for (const preferredName of preferred) {
+            const voice = this.voices.find(v => 
+                v.name.includes(preferredName) || 
+                v.name.toLowerCase().includes(preferredName.toLowerCase())
+            );
+            if (voice) {
+                // Check if it's a female voice (ChatGPT-style preference)
+                const isFemaleVoice = preferredName.toLowerCase().includes('female') || 
+                                    preferredName.toLowerCase().includes('hazel') ||
+                                    preferredName.toLowerCase().includes('zira') ||
+                                    preferredName.toLowerCase().includes('susan') ||
+                                    preferredName.toLowerCase().includes('catherine') ||
+                                    preferredName.toLowerCase().includes('samantha') ||
+                                    preferredName.toLowerCase().includes('victoria');
+
+                if (isFemaleVoice) {
+                    console.log(`Using ChatGPT-style female voice: ${voice.name} (${voice.lang})`);
+                    return voice;
+                }
+            }
+        }
+
+        // If no preferred female voice found, try any preferred voice
+        for (const preferredName of preferred) {
+            const voice = this.voices.find(v => 
+                v.name.includes(preferredName) || 
+                v.name.toLowerCase().includes(preferredName.toLowerCase())
+            );
+            if (voice) {
+                console.log(`Using preferred voice: ${voice.name} (${voice.lang})`);
+                return voice;
+            }
+        }
+
+        const voice = this.voices.find(v => v.lang === langCode) || 
+                     this.voices.find(v => v.lang.startsWith(lang.split('-')[0])) ||
+                     this.voices.find(v => v.lang.includes('en')) ||
+                     this.voices[0];
+
+        if (voice) {
+            console.log(`Using fallback voice: ${voice.name} (${voice.lang})`);
+        }
+
+        return voice;
+    }
+
+    setupEventListeners() {
+        // Voice button
+        document.getElementById('voiceButton').addEventListener('click', () => this.toggleListening());
+
+        // Stop button
+        document.getElementById('stopButton').addEventListener('click', () => this.stopSpeaking());
+
+        // Language selector
+        document.getElementById('languageSelect').addEventListener('change', (e) => this.setLanguage(e.target.value));
+
+        // Settings button
+        document.getElementById('settingsBtn').addEventListener('click', () => this.toggleSettings());
+
+        // Settings close
+        document.getElementById('settingsClose').addEventListener('click', () => this.toggleSettings());
+
+        // Range sliders
+        document.getElementById('voiceSpeed').addEventListener('input', (e) => {
+            this.settings.speed = parseFloat(e.target.value);
+            this.updateRangeValues();
+        });
+
+        document.getElementById('voicePitch').addEventListener('input', (e) => {
+            this.settings.pitch = parseFloat(e.target.value);
+            this.updateRangeValues();
+        });
+
+        document.getElementById('voiceVolume').addEventListener('input', (e) => {
+            this.settings.volume = parseFloat(e.target.value);
+            this.updateRangeValues();
+        });
+    }
+
+    updateRangeValues() {
+        document.getElementById('speedValue').textContent = this.settings.speed.toFixed(1) + 'x';
+        document.getElementById('pitchValue').textContent = this.settings.pitch.toFixed(1);
+        document.getElementById('volumeValue').textContent = Math.round(this.settings.volume * 100) + '%';
+    }
+
+    toggleSettings() {
+        const panel = document.getElementById('voiceSettingsPanel');
+        panel.classList.toggle('show');
+    }
+
+    async toggleListening() {
+        console.log('Toggle listening called, current state:', this.isListening);
+
+        if (!this.recognition) {
+            alert('Speech recognition not supported in this browser. Please use Chrome or Edge.');
+            return;
+        }
+
+        if (this.isListening) {
+            console.log('Stopping listening...');
+            this.stopListening();
+        } else {
+            console.log('Starting listening...');
+            await this.startListeningWithPermission();
+        }
+    }
+
+    async startListeningWithPermission() {
+        try {
+            console.log('Requesting microphone permission...');
+            this.updateStatus('Requesting microphone permission...');
+
+            // Request microphone permission with better error handling
+            const stream = await navigator.mediaDevices.getUserMedia({ 
+                audio: {
+                    echoCancellation: true,
+                    noiseSuppression: true,
+                    autoGainControl: true,
+                    sampleRate: 44100
+                }
+            });
+
+            console.log('Microphone permission granted');
+            this.updateStatus('Microphone ready. Starting speech recognition...');
+
+            // Stop the stream immediately after getting permission
+            stream.getTracks().forEach(track => {
+                track.stop();
+                console.log('Microphone stream stopped');
+            });
+
+            // Small delay to ensure permission is fully granted
+            setTimeout(() => {
+                this.startListening();
+            }, 100);
+
+        } catch (error) {
+            console.error('Microphone permission error:', error);
+
+            let errorMessage = 'Microphone permission is required for voice input. ';
+            if (error.name === 'NotAllowedError') {
+                errorMessage += 'Please click "Allow" when prompted for microphone access, then refresh the page.';
+                this.updateStatus('Microphone permission denied. Please allow access and refresh.');
+            } else if (error.name === 'NotFoundError') {
+                errorMessage += 'No microphone found. Please connect a microphone and try again.';
+                this.updateStatus('No microphone found. Please connect a microphone.');
+            } else if (error.name === 'NotReadableError') {
+                errorMessage += 'Microphone is being used by another application. Please close other apps and try again.';
+                this.updateStatus('Microphone busy. Please close other apps.');
+            } else {
+                errorMessage += 'Please check your microphone settings and try again.';
+                this.updateStatus('Microphone error. Please check settings.');
+            }
+
+            alert(errorMessage);
+            return;
+        }
+    }
+
+    startListening() {
+        if (this.isListening) {
+            console.log('Already listening, ignoring start request');
+            return;
+        }
+
+        console.log('Starting speech recognition...');
+        this.isListening = true;
+        this.recognition.lang = this.getLanguageCode(this.currentLanguage);
+
+        try {
+            // Reset recognition state
+            this.recognition.abort();
+
+            // Small delay before starting
+            setTimeout(() => {
+                try {
+                    this.recognition.start();
+                    console.log('Speech recognition start() called successfully');
+
+                    const voiceButton = document.getElementById('voiceButton');
+                    voiceButton.classList.add('listening');
+
+                    // Set a longer timeout for better listening (30 seconds)
+                    this.recognitionTimeout = setTimeout(() => {
+                        if (this.isListening) {
+                            console.log('Speech recognition timeout - stopping');
+                            this.recognition.stop();
+                        }
+                    }, 30000); // Increased to 30 seconds
+
+                } catch (startError) {
+                    console.error('Error in delayed start:', startError);
+                    this.isListening = false;
+                    this.updateStatus('Error starting speech recognition. Please try again.');
+                }
+            }, 200);
+
+        } catch (error) {
+            console.error('Error starting speech recognition:', error);
+            this.isListening = false;
+            this.updateStatus('Error starting speech recognition. Please try again.');
+        }
+    }
+
+    stopListening() {
+        if (!this.isListening) return;
+
+        console.log('Stopping speech recognition...');
+        this.isListening = false;
+
+        // Clear all timeouts
+        if (this.recognitionTimeout) {
+            clearTimeout(this.recognitionTimeout);
+            this.recognitionTimeout = null;
+        }
+
+        if (this.silenceTimeout) {
+            clearTimeout(this.silenceTimeout);
+            this.silenceTimeout = null;
+        }
+
+        try {
+            this.recognition.stop();
+        } catch (error) {
+            console.log('Error stopping recognition (this is normal):', error);
+        }
+
+        const voiceButton = document.getElementById('voiceButton');
+        voiceButton.classList.remove('listening');
+
+        this.updateStatus('Click the microphone to start talking');
+    }
+
+    /**
+     * Start silence detection to wait for user to finish speaking
+     */
+    startSilenceDetection() {
+        this.silenceTimeout = setTimeout(() => {
+            if (this.isListening && this.lastSpeechTime) {
+                const silenceDuration = Date.now() - this.lastSpeechTime;
+                console.log(`Silence detected for ${silenceDuration}ms`);
+
+                // If silence for more than 3 seconds, stop listening
+                if (silenceDuration > 3000) {
+                    console.log('Stopping due to silence timeout');
+                    this.recognition.stop();
+                } else {
+                    // Continue checking
+                    this.startSilenceDetection();
+                }
+            }
+        }, 1000); // Check every second
+    }
+
+    /**
+     * Reset silence timeout when speech is detected
+     */
+    resetSilenceTimeout() {
+        if (this.silenceTimeout) {
+            clearTimeout(this.silenceTimeout);
+            this.silenceTimeout = null;
+        }
+
+        // Restart silence detection
+        if (this.isListening) {
+            this.startSilenceDetection();
+        }
+    }
+
+    startListeningAnimation() {
+        const voiceButton = document.getElementById('voiceButton');
+        voiceButton.classList.add('listening');
+    }
+
+    stopListeningAnimation() {
+        const voiceButton = document.getElementById('voiceButton');
+        voiceButton.classList.remove('listening');
+    }
+
+    setLanguage(lang) {
+        this.currentLanguage = lang;
+        console.log('Language changed to:', lang);
+        this.updateStatus(`Language changed to ${lang}`);
+    }
+
+    updateStatus(message) {
+        const statusElement = document.getElementById('statusDisplay');
+        if (statusElement) {
+            statusElement.querySelector('span').textContent = message;
+        }
+    }
+
+    async handleVoiceInput(transcript) {
+        console.log('Processing voice input:', transcript);
+        this.updateStatus('Processing your message...');
+
+        try {
+            // Regional languages get server-side gTTS audio in the same stream
+            const withAudio = ['ta', 'hi', 'te', 'kn', 'ml'].includes(this.currentLanguage);
+
+            const response = await fetch('/api/voice-chat/stream', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    message: transcript,
+                    session_id: this.sessionId,
+                    language: this.currentLanguage,
+                    audio: withAudio
+                })
+            });
+
+            console.log('Response status:', response.status);
+
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+
+            await this.speakStream(response, withAudio);
+        } catch (error) {
+            console.error('Error processing voice input:', error);
+            this.updateStatus('Error processing your message: ' + error.message);
+        }
+    }
+
+    async speakStream(response, withAudio) {
+        // Speak each sentence as soon as it arrives instead of waiting for the whole reply
+        if (this.isSpeaking) {
+            this.stopSpeaking();
+        }
+
+        this.isSpeaking = true;
+        this.updateStatus('Speaking...');
+
+        const stopButton = document.getElementById('stopButton');
+        const voiceButton = document.getElementById('voiceButton');
+        stopButton.style.display = 'flex';
+        voiceButton.style.display = 'none';
+        voiceButton.classList.add('speaking');
+
+        let playback = Promise.resolve();
+        const enqueue = (speakPart) => {
+            playback = playback.then(() => this.isSpeaking ? speakPart() : null)
+                .catch((error) => console.error('Error speaking:', error));
+        };
+
+        try {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+
+                buffer += decoder.decode(value, { stream: true });
+                const frames = buffer.split('\n\n');
+                buffer = frames.pop();
+
+                for (const frame of frames) {
+                    if (!frame.startsWith('data: ')) continue;
+                    const data = JSON.parse(frame.slice(6));
+
+                    if (data.type === 'sentence' && !withAudio) {
+                        const text = this.cleanTextForSpeech(data.text);
+                        enqueue(() => this.speakWithBrowser(text));
+                    } else if (data.type === 'audio') {
+                        enqueue(() => this.playAudioSegment(data.mime, data.data));
+                    } else if (data.type === 'error') {
+                        throw new Error(data.error);
+                    }
+                }
+            }
+
+            await playback;
+        } catch (error) {
+            console.error('Error speaking:', error);
+            this.updateStatus('Error speaking response');
+        } finally {
+            this.isSpeaking = false;
+            stopButton.style.display = 'none';
+            voiceButton.style.display = 'flex';
+            voiceButton.classList.remove('speaking');
+            this.updateStatus('Click the microphone to start talking');
+        }
+    }
+
+    playAudioSegment(mime, base64Audio) {
+        return new Promise((resolve, reject) => {
+            const audio = new Audio(`data:${mime};base64,${base64Audio}`);
+            audio.volume = this.settings.volume;
+            // Stopping pauses the segment, which must also release the queue
+            audio.onended = audio.onpause = () => {
+                this.currentAudio = null;
+                resolve();
+            };
+            audio.onerror = (error) => {
+                this.currentAudio = null;
+                reject(error);
+            };
+            this.currentAudio = audio;
+            audio.play().catch(reject);
+        });
+    }
+
+    async speakResponse(text) {
+        if (this.isSpeaking) {
+            this.stopSpeaking();
+        }
+
+        this.isSpeaking = true;
+        this.updateStatus('Speaking...');
+
+        const stopButton = document.getElementById('stopButton');
+        const voiceButton = document.getElementById('voiceButton');
+        stopButton.style.display = 'flex';
+        voiceButton.style.display = 'none';
+
+        voiceButton.classList.add('speaking');
+
+        try {
+            const cleanText = this.cleanTextForSpeech(text);
+            console.log('Speaking cleaned text:', cleanText);
+
+            if (['ta', 'hi', 'te', 'kn', 'ml'].includes(this.currentLanguage)) {
+                await this.speakWithGTTS(cleanText);
+            } else {
+                await this.speakWithBrowser(cleanText);
+            }
+        } catch (error) {
+            console.error('Error speaking:', error);
+            this.updateStatus('Error speaking response');
+        } finally {
+            this.isSpeaking = false;
+            stopButton.style.display = 'none';
+            voiceButton.style.display = 'flex';
+            voiceButton.classList.remove('speaking');
+            this.updateStatus('Click the microphone to start talking');
+        }
+    }
+
+    cleanTextForSpeech(text) {
+        if (!text) return '';
+
+        let cleanText = text
+            // Remove markdown formatting
+            .replace(/\*\*(.*?)\*\*/g, '$1')
+            .replace(/\*(.*?)\*/g, '$1')
+            .replace(/`(.*?)`/g, '$1')
+            .replace(/```[\s\S]*?```/g, '')
+            .replace(/`[\s\S]*?`/g, '')
+            .replace(/#{1,6}\s+/g, '')
+            .replace(/\[([^\]]+)\]\([^)]+\)/g, '$1')
+            .replace(/!\[([^\]]*)\]\([^)]+\)/g, '$1')
+            .replace(/^\s*[-*+]\s+/gm, '')
+            .replace(/^\s*\d+\.\s+/gm, '')
+            // Convert technical symbols to natural speech
+            .replace(/&/g, ' and ')
+            .replace(/@/g, ' at ')
+            .replace(/#/g, ' hash ')
+            .replace(/\$/g, ' dollar ')
+            .replace(/%/g, ' percent ')
+            .replace(/\*/g, ' ')
+            .replace(/\+/g, ' plus ')
+            .replace(/=/g, ' equals ')
+            .replace(/</g, ' less than ')
+            .replace(/>/g, ' greater than ')
+            .replace(/\|/g, ' or ')
+            .replace(/\\/g, ' ')
+            .replace(/\//g, ' ')
+            .replace(/\[/g, ' ')
+            .replace(/\]/g, ' ')
+            .replace(/\{/g, ' ')
+            .replace(/\}/g, ' ')
+            .replace(/\(/g, ' ')
+            .replace(/\)/g, ' ')
+            .replace(/~/g, ' ')
+            .replace(/`/g, ' ')
+            .replace(/"/g, ' ')
+            .replace(/'/g, ' ')
+            .replace(/;/g, ' ')
+            .replace(/:/g, ' ')
+            .replace(/,/g, ' ')
+            .replace(/\./g, ' ')
+            .replace(/\?/g, ' ')
+            .replace(/!/g, ' ')
+            .replace(/-/g, ' ')
+            .replace(/_/g, ' ')
+            // Clean up spacing and formatting
+            .replace(/\n{3,}/g, '\n\n')
+            .replace(/\s+/g, ' ')
+            .trim();
+
+        // Limit text length for better speech
+        if (cleanText.length > 500) {
+            cleanText = cleanText.substring(0, 500) + '...';
+        }
+
+        return cleanText;
+    }
+
+    async speakWithGTTS(text) {
+        try {
+            // Post the text for a short audio URL, then let the browser stream the MP3
+            // from it so playback starts after the first sentence
+            const response = await fetch('/api/gtts-speak/request', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    text: text,
+                    language: this.currentLanguage
+                })
+            });
+            const data = await response.json();
+            if (!response.ok || !data.success) {
+                throw new Error(data.message || 'GTTS request failed');
+            }
+            const audio = new Audio(data.url);
+
+            audio.volume = this.settings.volume;
+
+            await audio.play();
+        } catch (error) {
+            console.error('GTTS error:', error);
+            await this.speakWithBrowser(text);
+        }
+    }
+
+    async speakWithBrowser(text) {
+        return new Promise((resolve, reject) => {
+            const utterance = new SpeechSynthesisUtterance(text);
+
+            utterance.lang = this.getLanguageCode(this.currentLanguage);
+
+            const voice = this.getVoiceForLanguage(this.currentLanguage);
+            if (voice) {
+                utterance.voice = voice;
+                console.log('Using voice:', voice.name, voice.lang);
+            } else {
+                console.log('Using default voice for language:', utterance.lang);
+            }
+
+            // Enhanced settings for natural speech
+            utterance.rate = this.settings.speed;
+            utterance.pitch = this.settings.pitch;
+            utterance.volume = this.settings.volume;
+
+            // Add natural pauses and improve text flow
+            utterance.text = this.addNaturalSpeechPauses(text);
+
+            utterance.onstart = () => {
+                console.log('Speech synthesis started with natural voice');
+            };
+
+            utterance.onend = () => {
+                console.log('Speech synthesis ended');
+                resolve();
+            };
+
+            utterance.onerror = (error) => {
+                console.error('Speech synthesis error:', error);
+                reject(error);
+            };
+
+            this.synthesis.cancel();
+            this.synthesis.speak(utterance);
+        });
+    }
+
+    addNaturalSpeechPauses(text) {
+        // ChatGPT-style smooth speech processing
+        let naturalText = text
+            // Add smooth pauses after sentences (like ChatGPT)
+            .replace(/\./g, '. ')
+            .replace(/\?/g, '? ')
+            .replace(/!/g, '! ')
+            // Add gentle pauses for commas and colons
+            .replace(/,/g, ', ')
+            .replace(/:/g, ': ')
+            .replace(/;/g, '; ')
+            // Add smooth pauses for conjunctions (like ChatGPT's natural flow)
+            .replace(/\b(and|but|or|so|yet|for|nor)\b/g, ' $1 ')
+            // Add pauses for transitions (ChatGPT-style)
+            .replace(/\b(however|therefore|moreover|furthermore|meanwhile|consequently|additionally|furthermore)\b/g, ' $1 ')
+            // Add smooth pauses for lists (ChatGPT-style)
+            .replace(/\b(first|second|third|finally|lastly|next|then|also|plus|moreover)\b/g, ' $1 ')
+            // Add pauses for conversational words (like ChatGPT)
+            .replace(/\b(well|actually|basically|essentially|obviously|clearly|indeed|certainly)\b/g, ' $1 ')
+            // Clean up multiple spaces
+            .replace(/\s+/g, ' ')
+            .trim();
+
+        // Add smooth breathing pauses for longer sentences (ChatGPT-style)
+        const sentences = naturalText.split(/[.!?]+/);
+        if (sentences.length > 1) {
+            naturalText = sentences
+                .map(sentence => sentence.trim())
+                .filter(sentence => sentence.length > 0)
+                .join('. ')
+                + (naturalText.endsWith('.') || naturalText.endsWith('!') || naturalText.endsWith('?') ? '' : '.');
+        }
+
+        return naturalText;
+    }
+
+    addSpeechPauses(text) {
+        // Keep the old function for backward compatibility
+        return this.addNaturalSpeechPauses(text);
+    }
+
+    stopSpeaking() {
+        if (this.synthesis) {
+            this.synthesis.cancel();
+        }
+        if (this.currentAudio) {
+            this.currentAudio.pause();
+            this.currentAudio = null;
+        }
+        this.isSpeaking = false;
+
+        const stopButton = document.getElementById('stopButton');
+        const voiceButton = document.getElementById('voiceButton');
+        stopButton.style.display = 'none';
+        voiceButton.style.display = 'flex';
+        voiceButton.classList.remove('speaking');
+
+        this.updateStatus('Click the microphone to start talking');
+    }
+
+    /**
+     * Universal speak function for any assistant message
+     * Uses browser's speechSynthesis API with optimized female voice
+     * @param {string} text - The text to speak
+     * @param {Object} options - Optional settings (voice, rate, pitch, volume)
+     * @returns {Promise} - Resolves when speech is complete
+     */
+    async speak(text, options = {}) {
+        if (!text || typeof text !== 'string') {
+            console.warn('Speak function called with invalid text:', text);
+            return Promise.resolve();
+        }
+
+        // Default options for natural female voice
+        const defaultOptions = {
+            voice: 'Google UK English Female', // Preferred female voice
+            rate: 0.95,    // Slightly slower for natural speech
+            pitch: 1.05,   // Slightly higher for pleasant female voice
+            volume: 0.9,   // Clear and audible
+            lang: 'en-GB'  // British English for better pronunciation
+        };
+
+        // Merge with provided options
+        const settings = { ...defaultOptions, ...options };
+
+        return new Promise((resolve, reject) => {
+            try {
+                // Wait for voices to load if not already loaded
+                this.waitForVoices().then(() => {
+                    const utterance = new SpeechSynthesisUtterance(text);
+
+                    // Set language
+                    utterance.lang = settings.lang;
+
+                    // Find the best female voice
+                    const selectedVoice = this.getBestFemaleVoice(settings.voice);
+                    if (selectedVoice) {
+                        utterance.voice = selectedVoice;
+                        console.log(`Speaking with voice: ${selectedVoice.name} (${selectedVoice.lang})`);
+                    } else {
+                        console.log('Using default voice for language:', utterance.lang);
+                    }
+
+                    // Apply natural voice settings
+                    utterance.rate = settings.rate;
+                    utterance.pitch = settings.pitch;
+                    utterance.volume = settings.volume;
+
+                    // Process text for natural speech
+                    utterance.text = this.processTextForNaturalSpeech(text);
+
+                    // Event handlers
+                    utterance.onstart = () => {
+                        console.log('Speech started:', text.substring(0, 50) + '...');
+                        this.isSpeaking = true;
+                    };
+
+                    utterance.onend = () => {
+                        console.log('Speech completed');
+                        this.isSpeaking = false;
+                        resolve();
+                    };
+
+                    utterance.onerror = (error) => {
+                        console.error('Speech synthesis error:', error);
+                        this.isSpeaking = false;
+                        reject(error);
+                    };
+
+                    // Cancel any ongoing speech and start new one
+                    this.synthesis.cancel();
+                    this.synthesis.speak(utterance);
+
+                }).catch(error => {
+                    console.error('Error waiting for voices:', error);
+                    reject(error);
+                });
+
+            } catch (error) {
+                console.error('Error in speak function:', error);
+                reject(error);
+            }
+        });
+    }
+
+    /**
+     * Wait for voices to load properly
+     * @returns {Promise} - Resolves when voices are available
+     */
+    waitForVoices() {
+        return new Promise((resolve) => {
+            if (this.voices && this.voices.length > 0) {
+                resolve();
+                return;
+            }
+
+            // If voices are not loaded, wait for them
+            const checkVoices = () => {
+                this.voices = this.synthesis.getVoices();
+                if (this.voices && this.voices.length > 0) {
+                    console.log(`Voices loaded: ${this.voices.length} voices available`);
+                    resolve();
+                } else {
+                    // Retry after a short delay
+                    setTimeout(checkVoices, 100);
+                }
+            };
+
+            // Listen for voices changed event
+            this.synthesis.onvoiceschanged = () => {
+                this.voices = this.synthesis.getVoices();
+                if (this.voices && this.voices.length > 0) {
+                    console.log(`Voices loaded via event: ${this.voices.length} voices available`);
+                    resolve();
+                }
+            };
+
+            // Start checking
+            checkVoices();
+        });
+    }
+
+    /**
+     * Get the best available female voice
+     * @param {string} preferredVoice - Preferred voice name
+     * @returns {SpeechSynthesisVoice|null} - Best female voice or null
+     */
+    getBestFemaleVoice(preferredVoice = 'Google UK English Female') {
+        if (!this.voices || this.voices.length === 0) {
+            return null;
+        }
+
+        // List of preferred female voices in order of preference
+        const femaleVoices = [
+            'Google UK English Female',
+            'Google US English Female', 
+            'Microsoft Hazel Desktop',
+            'Microsoft Zira Desktop',
+            'Microsoft Susan Desktop',
+            'Microsoft Catherine Desktop',
+            'Samantha',
+            'Victoria',
+            'Alex',
+            'Karen',
+            'Moira',
+            'Tessa'
+        ];
+
+        // First, try to find the exact preferred voice
+        let voice = this.voices.find(v => 
+            v.name === preferredVoice || 
+            v.name.includes(preferredVoice)
+        );
+
+        if (voice) {
+            return voice;
+        }
+
+        // Then try other female voices
+        for (const voiceName of femaleVoices) {
+            voice = this.voices.find(v => 
+                v.name.includes(voiceName) || 
+                v.name.toLowerCase().includes(voiceName.toLowerCase())
+            );
+            if (voice) {
+                return voice;
+            }
+        }
+
+        // Fallback: find any English female voice
+        voice = this.voices.find(v => 
+            v.lang.startsWith('en') && 
+            (v.name.toLowerCase().includes('female') || 
+             v.name.toLowerCase().includes('woman') ||
+             v.name.toLowerCase().includes('lady'))
+        );
+
+        if (voice) {
+            return voice;
+        }
+
+        // Last resort: any English voice
+        voice = this.voices.find(v => v.lang.startsWith('en'));
+
+        return voice || this.voices[0] || null;
+    }
+
+    /**
+     * Process text for natural speech delivery
+     * @param {string} text - Input text
+     * @returns {string} - Processed text for natural speech
+     */
+    processTextForNaturalSpeech(text) {
+        if (!text) return '';
+
+        return text
+            // Remove markdown formatting
+            .replace(/\*\*(.*?)\*\*/g, '$1')
+            .replace(/\*(.*?)\*/g, '$1')
+            .replace(/`(.*?)`/g, '$1')
+            .replace(/```[\s\S]*?```/g, '')
+            .replace(/#{1,6}\s+/g, '')
+            .replace(/\[([^\]]+)\]\([^)]+\)/g, '$1')
+            .replace(/!\[([^\]]*)\]\([^)]+\)/g, '$1')
+            // Convert symbols to words for better pronunciation
+            .replace(/&/g, ' and ')
+            .replace(/@/g, ' at ')
+            .replace(/#/g, ' hash ')
+            .replace(/\$/g, ' dollar ')
+            .replace(/%/g, ' percent ')
+            .replace(/\+/g, ' plus ')
+            .replace(/=/g, ' equals ')
+            .replace(/</g, ' less than ')
+            .replace(/>/g, ' greater than ')
+            .replace(/\|/g, ' or ')
+            // Add natural pauses
+            .replace(/\./g, '. ')
+            .replace(/\?/g, '? ')
+            .replace(/!/g, '! ')
+            .replace(/,/g, ', ')
+            .replace(/:/g, ': ')
+            .replace(/;/g, '; ')
+            // Clean up spacing
+            .replace(/\s+/g, ' ')
+            .trim();
+    }
+}
+
+// Initialize when DOM is loaded
+document.addEventListener('DOMContentLoaded', function() {
+    console.log('Standalone Voice Assistant page loaded!');
+    window.voiceAssistant = new StandaloneVoiceAssistant();
+});
+
+/**
+ * Global speak function - can be called from anywhere in the project
+ * @param {string} text - The text to speak
+ * @param {Object} options - Optional settings (voice, rate, pitch, volume)
+ * @returns {Promise} - Resolves when speech is complete
+ */
+window.speak = async function(text, options = {}) {
+    // If voice assistant is available, use it
+    if (window.voiceAssistant && typeof window.voiceAssistant.speak === 'function') {
+        return await window.voiceAssistant.speak(text, options);
+    }
+
+    // Fallback: create a simple speech synthesis
+    return new Promise((resolve, reject) => {
+        try {
+            const utterance = new SpeechSynthesisUtterance(text);
+
+            // Default settings for natural female voice
+            utterance.rate = options.rate || 0.95;
+            utterance.pitch = options.pitch || 1.05;
+            utterance.volume = options.volume || 0.9;
+            utterance.lang = options.lang || 'en-GB';
+
+            // Try to find a female voice
+            const voices = speechSynthesis.getVoices();
+            const femaleVoice = voices.find(v => 
+                v.name.includes('Female') || 
+                v.name.includes('Hazel') ||
+                v.name.includes('Zira') ||
+                v.name.includes('Samantha') ||
+                v.name.includes('Victoria')
+            );
+
+            if (femaleVoice) {
+                utterance.voice = femaleVoice;
+                console.log(`Speaking with voice: ${femaleVoice.name}`);
+            }
+
+            utterance.onend = () => resolve();
+            utterance.onerror = (error) => reject(error);
+
+            speechSynthesis.speak(utterance);
+
+        } catch (error) {
+            console.error('Error in global speak function:', error);
+            reject(error);
+        }
+    });
+};
@@ -0,0 +1,180 @@
+"""
+Per-request tracing and on-demand profiling for Lumora AI.
+
+Every request gets a Trace stored on ``flask.g``. Code wraps interesting
+stages in ``span('name')`` blocks; when the response is closed (after the
+last SSE frame for streamed responses) the trace is appended as one JSON line
+to TRACE_LOG_PATH. Outside a request ``span()`` is a no-op.
+
+A request can also be profiled with cProfile, either because the caller sent
+the admin profile header or because it was picked by PROFILE_SAMPLE_RATE. The
+stats file is written to PROFILE_DIR for later analysis with pstats/snakeviz.
+"""
+import cProfile
+import functools
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+
+from flask import g, has_app_context
+
+TRACE_LOG_PATH = os.getenv('TRACE_LOG_PATH', os.path.join('logs', 'traces.jsonl'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join('logs', 'profiles'))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0') or 0)
+PROFILE_HEADER = 'X-Lumora-Profile'
+
+_log_lock = threading.Lock()
+_log_file = None
+_log_pid = None
+
+
+class Trace:
+    """Spans recorded while serving one request."""
+
+    __slots__ = ('request_id', 'started', 'wall_started', 'spans', 'attrs', 'profiler')
+
+    def __init__(self, request_id=None, **attrs):
+        self.request_id = request_id or uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.spans = []
+        self.attrs = attrs
+        self.profiler = None
+
+    def add_span(self, name, started, duration, attrs):
+        span = {
+            'name': name,
+            'start_ms': round((started - self.started) * 1000, 3),
+            'duration_ms': round(duration * 1000, 3),
+        }
+        if attrs:
+            span.update(attrs)
+        self.spans.append(span)
+
+    def to_dict(self, **extra):
+        record = {
+            'request_id': self.request_id,
+            'ts': self.wall_started,
+            'duration_ms': round((time.perf_counter() - self.started) * 1000, 3),
+        }
+        record.update(self.attrs)
+        record.update(extra)
+        record['spans'] = self.spans
+        return record
+
+
+class _Span:
+    """Context manager timing one stage of the current request."""
+
+    __slots__ = ('_trace', '_name', '_attrs', '_start')
+
+    def __init__(self, trace, name, attrs):
+        self._trace = trace
+        self._name = name
+        self._attrs = attrs
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._trace is not None:
+            if exc_type is not None:
+                self._attrs['error'] = exc_type.__name__
+            self._trace.add_span(self._name, self._start, time.perf_counter() - self._start, self._attrs)
+        return False
+
+
+def current_trace():
+    """Return the Trace of the active request, or None."""
+    if not has_app_context():
+        return None
+    return g.get('trace')
+
+
+def span(name, **attrs):
+    """Time a ``with`` block as a span of the current request's trace."""
+    return _Span(current_trace(), name, attrs)
+
+
+def annotate(**attrs):
+    """Attach extra attributes to the current request's trace record."""
+    trace = current_trace()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+def traced(name):
+    """Decorator recording every call of the function as a span."""
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_trace(request_id=None, profile=False, **attrs):
+    """Begin tracing the current request, optionally under cProfile."""
+    # Caller-supplied ids end up in file names, so keep them to a safe alphabet
+    if request_id and not re.fullmatch(r'[A-Za-z0-9_.-]{1,64}', request_id):
+        request_id = None
+    trace = Trace(request_id, **attrs)
+    if profile or (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            trace.profiler = profiler
+        except ValueError as e:
+            # Another profiler is already active on this thread
+            print(f"Profiling unavailable for request {trace.request_id}: {str(e)}")
+    g.trace = trace
+    return trace
+
+
+def finish_trace(trace, **extra):
+    """Stop profiling, save the profile and append the trace to the log."""
+    profile_path = None
+    if trace.profiler is not None:
+        trace.profiler.disable()
+        profile_path = _save_profile(trace)
+    if profile_path:
+        extra['profile'] = profile_path
+    _write_record(trace.to_dict(**extra))
+
+
+def _save_profile(trace):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(trace.wall_started))
+        endpoint = str(trace.attrs.get('endpoint') or 'request').replace('/', '_')
+        path = os.path.join(PROFILE_DIR, f'{stamp}-{endpoint}-{trace.request_id}.prof')
+        trace.profiler.dump_stats(path)
+        return path
+    except Exception as e:
+        print(f"Error saving profile: {str(e)}")
+        return None
+
+
+def _write_record(record):
+    global _log_file, _log_pid
+    if not TRACE_LOG_PATH:
+        return
+    line = json.dumps(record, default=str) + '\n'
+    try:
+        with _log_lock:
+            # Reopen after a fork so each worker appends through its own handle
+            if _log_file is None or _log_pid != os.getpid():
+                directory = os.path.dirname(TRACE_LOG_PATH)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                _log_file = open(TRACE_LOG_PATH, 'a', buffering=1, encoding='utf-8')
+                _log_pid = os.getpid()
+            _log_file.write(line)
+    except OSError as e:
+        print(f"Error writing trace log: {str(e)}")
@@ -0,0 +1,378 @@
+"""
+Text-to-speech backends for Lumora AI.
+
+``synthesize()`` turns cleaned text into MP3 bytes. The backend is chosen with
+the TTS_BACKEND environment variable:
+
+    gtts  - Google Text-to-Speech through the gTTS package (default)
+    stub  - local silent MP3 sized to the text, no network, for load tests
+
+``AudioCache`` keeps synthesized audio on disk keyed by the normalized text,
+language and speed, so repeated phrases never go back to gTTS. It also holds
+text posted for synthesis under the same key until the audio is fetched.
+``synthesize_segments()`` synthesizes sentences concurrently and yields the
+MP3 segments in order, so playback can start after the first sentence.
+``pop_complete_sentences()`` does the same splitting on text that is still
+arriving from a streamed model reply.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# One silent MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, 417 bytes, ~26 ms of audio
+_SILENT_FRAME = bytes.fromhex('fffb9064') + b'\x00' * 413
+_FRAME_SECONDS = 1152 / 44100.0
+# Average speaking rate used to size stub audio
+_CHARS_PER_SECOND = 14.0
+
+# Upper bound on concurrent sentence syntheses per worker process
+TTS_MAX_WORKERS = int(os.getenv('TTS_MAX_WORKERS', '4'))
+
+# Text posted for later synthesis is dropped if its audio is not fetched within this time;
+# expired requests are swept at most every TTS_REQUEST_SWEEP_SECONDS
+TTS_REQUEST_MAX_AGE = int(os.getenv('TTS_REQUEST_MAX_AGE', '3600'))
+TTS_REQUEST_SWEEP_SECONDS = int(os.getenv('TTS_REQUEST_SWEEP_SECONDS', '60'))
+
+# Sentence ends, including the Devanagari danda used in Hindi replies
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?;\u0964])\s+')
+
+TTS_CACHE_TOTAL = metrics.Counter('lumora_tts_cache_total', 'TTS audio cache lookups', ('result',))
+TTS_CACHE_BYTES = metrics.Gauge('lumora_tts_cache_bytes', 'Bytes of audio held in the TTS cache', aggregate='max')
+
+
+def clean_text_for_speech(text):
+    """Strip formatting and symbols that should not be read aloud."""
+    clean_text = text.replace('\n', ' ').replace('\r', ' ').strip()
+    # Remove special characters that shouldn't be spoken
+    clean_text = re.sub(r'[^\w\s.,!?;:()\-]', '', clean_text)
+    # Remove extra spaces
+    return re.sub(r'\s+', ' ', clean_text).strip()
+
+
+def synthesize_gtts(text, lang, slow=False):
+    """Synthesize speech through gTTS and return MP3 bytes."""
+    from gtts import gTTS
+
+    tts = gTTS(text=text, lang=lang, slow=slow)
+    audio_buffer = io.BytesIO()
+    tts.write_to_fp(audio_buffer)
+    return audio_buffer.getvalue()
+
+
+def synthesize_stub(text, lang, slow=False):
+    """Return deterministic silent MP3 audio roughly as long as the spoken text.
+
+    STUB_TTS_LATENCY_MS adds a fixed delay to imitate the gTTS round-trip.
+    """
+    latency_ms = float(os.getenv('STUB_TTS_LATENCY_MS', '0') or 0)
+    if latency_ms:
+        time.sleep(latency_ms / 1000.0)
+    seconds = max(len(text), 1) / _CHARS_PER_SECOND * (1.5 if slow else 1.0)
+    frames = max(1, int(seconds / _FRAME_SECONDS))
+    return _SILENT_FRAME * frames
+
+
+BACKENDS = {
+    'gtts': synthesize_gtts,
+    'stub': synthesize_stub,
+}
+
+
+def preload():
+    """Import the gTTS client ahead of the first synthesis (it is otherwise imported on first use)."""
+    if os.getenv('TTS_BACKEND', 'gtts').strip().lower() == 'gtts':
+        import gtts  # noqa: F401
+
+
+def synthesize(text, lang, slow=False):
+    """Synthesize ``text`` with the backend named by TTS_BACKEND."""
+    name = os.getenv('TTS_BACKEND', 'gtts').strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown TTS_BACKEND '{name}'. Choose one of: {', '.join(sorted(BACKENDS))}")
+    return BACKENDS[name](text, lang, slow)
+
+
+def normalize_for_cache(text):
+    """Normalize cleaned text so trivially different strings share a cache entry."""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def cache_key(text, lang, slow=False):
+    """Cache key for (normalized text, language, slow flag)."""
+    material = f"{lang}\0{int(bool(slow))}\0{normalize_for_cache(text)}"
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()[:32]
+
+
+class AudioCache:
+    """Disk-backed MP3 cache with size-bounded LRU eviction.
+
+    Files live at ``<directory>/<key[:2]>/<key>.mp3`` and are written
+    atomically, so several gunicorn workers can share one directory. Each
+    worker keeps its own LRU index (seeded from file mtimes at startup) and
+    touches files on every hit so recency survives restarts.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # key -> size, least recently used first
+        self._total_bytes = 0
+        self._key_locks = {}
+        self._requests_swept = 0.0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+        self._sweep_requests(time.time())
+
+    def _sweep_requests(self, now):
+        """Delete requests whose audio was never fetched within TTS_REQUEST_MAX_AGE."""
+        self._requests_swept = now
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    if now - os.stat(path).st_mtime > TTS_REQUEST_MAX_AGE:
+                        os.unlink(path)
+                except OSError:
+                    # Fetched or swept by another worker
+                    pass
+
+    def _load_index(self):
+        entries = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.mp3'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _mtime, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+        TTS_CACHE_BYTES.set(self._total_bytes)
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.mp3')
+
+    def request_path_for(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.json')
+
+    def _write_atomic(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, path)
+
+    def put_request(self, text, lang, slow=False):
+        """Keep ``text`` for synthesis on a later get_request() and return its cache key."""
+        key = cache_key(text, lang, slow)
+        request = {'text': text, 'lang': lang, 'slow': bool(slow)}
+        self._write_atomic(self.request_path_for(key), json.dumps(request).encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            sweep = now - self._requests_swept >= TTS_REQUEST_SWEEP_SECONDS
+            if sweep:
+                self._requests_swept = now
+        if sweep:
+            self._sweep_requests(now)
+        return key
+
+    def get_request(self, key):
+        """Return ``(text, lang, slow)`` stored by put_request(), or None."""
+        path = self.request_path_for(key)
+        try:
+            with open(path, 'rb') as request_file:
+                expired = time.time() - os.fstat(request_file.fileno()).st_mtime > TTS_REQUEST_MAX_AGE
+                request = None if expired else json.loads(request_file.read())
+        except (OSError, ValueError):
+            return None
+        if request is None:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+        return request['text'], request['lang'], request['slow']
+
+    def get(self, key):
+        """Return the cached file path for ``key``, or None."""
+        path = self.path_for(key)
+        with self._lock:
+            if key not in self._index:
+                # Another worker may have written it since our index was built
+                if not os.path.exists(path):
+                    return None
+                self._index[key] = os.path.getsize(path)
+                self._total_bytes += self._index[key]
+            self._index.move_to_end(key)
+        try:
+            os.utime(path)
+        except OSError:
+            # Evicted by another worker
+            with self._lock:
+                self._total_bytes -= self._index.pop(key, 0)
+            return None
+        return path
+
+    def put(self, key, audio):
+        """Store ``audio`` under ``key`` and return its path."""
+        path = self.path_for(key)
+        self._write_atomic(path, audio)
+        try:
+            # The posted text is no longer needed once its audio is cached
+            os.unlink(self.request_path_for(key))
+        except OSError:
+            pass
+        with self._lock:
+            self._total_bytes += len(audio) - self._index.pop(key, 0)
+            self._index[key] = len(audio)
+            evicted = self._evict_locked()
+        for old_key in evicted:
+            try:
+                os.unlink(self.path_for(old_key))
+            except OSError:
+                pass
+        TTS_CACHE_BYTES.set(self._total_bytes)
+        return path
+
+    def _evict_locked(self):
+        evicted = []
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            old_key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            evicted.append(old_key)
+        return evicted
+
+    def get_or_synthesize(self, text, lang, slow=False, synthesize_func=None):
+        """Return ``(key, path, hit)``, synthesizing and storing on a miss."""
+        key = cache_key(text, lang, slow)
+        path = self.get(key)
+        if path:
+            TTS_CACHE_TOTAL.inc('hit')
+            return key, path, True
+        # Only one thread per worker synthesizes a given phrase
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            path = self.get(key)
+            if path:
+                TTS_CACHE_TOTAL.inc('hit')
+                return key, path, True
+            TTS_CACHE_TOTAL.inc('miss')
+            audio = (synthesize_func or synthesize)(text, lang, slow)
+            path = self.put(key, audio)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return key, path, False
+
+    def get_or_synthesize_bytes(self, text, lang, slow=False, synthesize_func=None):
+        """Return the MP3 bytes for ``text``, going through the cache."""
+        _key, path, _hit = self.get_or_synthesize(text, lang, slow, synthesize_func)
+        try:
+            with open(path, 'rb') as audio_file:
+                return audio_file.read()
+        except OSError:
+            # Evicted by another worker between lookup and read
+            return (synthesize_func or synthesize)(text, lang, slow)
+
+
+def split_sentences(text, min_chars=20, max_chars=300):
+    """Split cleaned text into sentences for pipelined synthesis.
+
+    Fragments shorter than ``min_chars`` (like "Hi!") are merged into the next
+    sentence and anything longer than ``max_chars`` is cut at a word boundary.
+    """
+    sentences = []
+    pending = ''
+    for piece in _SENTENCE_BREAK.split(text):
+        piece = piece.strip()
+        if not piece:
+            continue
+        piece = f'{pending} {piece}'.strip() if pending else piece
+        pending = ''
+        while len(piece) > max_chars:
+            cut = piece.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            sentences.append(piece[:cut].strip())
+            piece = piece[cut:].strip()
+        if len(piece) < min_chars:
+            pending = piece
+        else:
+            sentences.append(piece)
+    if pending:
+        if sentences and len(sentences[-1]) + len(pending) < max_chars:
+            sentences[-1] = f'{sentences[-1]} {pending}'
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+def pop_complete_sentences(buffer, min_chars=20):
+    """Split finished sentences off the front of streamed text.
+
+    Returns ``(sentences, rest)``. A sentence is finished once whitespace
+    follows its terminator; fragments shorter than ``min_chars`` stay in
+    ``rest`` so they are spoken together with the next sentence.
+    """
+    pieces = _SENTENCE_BREAK.split(buffer)
+    sentences = []
+    pending = ''
+    for piece in pieces[:-1]:
+        piece = f'{pending} {piece.strip()}'.strip() if pending else piece.strip()
+        if len(piece) < min_chars:
+            pending = piece
+        else:
+            sentences.append(piece)
+            pending = ''
+    rest = f'{pending} {pieces[-1]}' if pending else pieces[-1]
+    return sentences, rest
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    # Pools do not survive fork, so each gunicorn worker builds its own
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS, thread_name_prefix='tts')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def synthesize_async(text, lang, slow, cache, synthesize_func=None):
+    """Start synthesizing ``text`` through ``cache`` and return a Future of the MP3 bytes."""
+    return _get_executor().submit(cache.get_or_synthesize_bytes, text, lang, slow, synthesize_func)
+
+
+def synthesize_segments(sentences, lang, slow, cache, synthesize_func=None):
+    """Yield MP3 bytes for each sentence in order, synthesizing them concurrently.
+
+    Every sentence goes through ``cache``, so common sentences are reused
+    across replies. Pending work is cancelled if the consumer stops early.
+    """
+    futures = [synthesize_async(sentence, lang, slow, cache, synthesize_func) for sentence in sentences]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
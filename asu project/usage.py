@@ -0,0 +1,220 @@
+"""
+Token usage and cost accounting for Lumora AI.
+
+Every model call is recorded as (user, endpoint, hour bucket) counters of
+requests, prompt tokens and output tokens. Records are aggregated in memory
+and flushed to a small SQLite table every few seconds and at exit, so all
+gunicorn workers share the same totals and restarts keep the history. Daily
+quotas are checked against the flushed totals plus whatever this worker has
+not flushed yet. Reports price the tokens with the configured per-million
+prompt and output token prices.
+"""
+import atexit
+import os
+import sqlite3
+import threading
+import time
+
+BUCKET_SECONDS = 3600
+DAY_SECONDS = 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    user TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 0,
+    estimated_requests INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user, endpoint, bucket)
+) WITHOUT ROWID
+"""
+
+_UPSERT = """
+INSERT INTO usage (user, endpoint, bucket, requests, estimated_requests, prompt_tokens, output_tokens)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (user, endpoint, bucket) DO UPDATE SET
+    requests = requests + excluded.requests,
+    estimated_requests = estimated_requests + excluded.estimated_requests,
+    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+    output_tokens = output_tokens + excluded.output_tokens
+"""
+
+GROUP_COLUMNS = {
+    'user': 'user',
+    'endpoint': 'endpoint',
+    'hour': 'bucket',
+    'day': f'(bucket / {DAY_SECONDS}) * {DAY_SECONDS}',
+}
+
+
+def parse_quotas(spec):
+    """Parse "chat=200000,mcqs=50000" into {'chat': 200000, 'mcqs': 50000}."""
+    quotas = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            name, _, value = item.partition('=')
+            try:
+                quotas[name.strip()] = int(value)
+            except ValueError:
+                print(f"Ignoring invalid usage quota '{item}'")
+    return quotas
+
+
+class UsageStore:
+    """Time-bucketed token counters with optional daily quotas."""
+
+    def __init__(self, path, daily_quota=0, endpoint_quotas=None, flush_seconds=5.0,
+                 prompt_price=0.0, output_price=0.0):
+        self.path = path
+        self.daily_quota = daily_quota
+        self.endpoint_quotas = endpoint_quotas or {}
+        self.flush_seconds = flush_seconds
+        self.prompt_price = prompt_price  # per million prompt tokens
+        self.output_price = output_price  # per million output tokens
+        self._lock = threading.Lock()
+        # (user, endpoint, bucket) -> [requests, estimated_requests, prompt_tokens, output_tokens]
+        self._pending = {}
+        self._local = threading.local()
+        self._flusher = None
+        self._flusher_pid = None
+        # Forked workers inherit this, so each one writes its own counters on exit
+        atexit.register(self.flush)
+
+    def _connection(self):
+        # SQLite connections must not cross threads or forked workers
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _ensure_flusher(self):
+        # Threads do not survive fork, so each gunicorn worker starts its own flusher
+        if self._flusher is not None and self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher is None or self._flusher_pid != os.getpid():
+                self._flusher = threading.Thread(target=self._flush_loop, name='usage-flush', daemon=True)
+                self._flusher_pid = os.getpid()
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing usage records: {str(e)}")
+
+    def cost(self, prompt_tokens, output_tokens):
+        """Price of the given token counts."""
+        return (prompt_tokens * self.prompt_price + output_tokens * self.output_price) / 1_000_000
+
+    def record(self, user, endpoint, prompt_tokens, output_tokens, estimated=False, now=None):
+        """Add one model call to the current hour bucket."""
+        now = now or time.time()
+        key = (user or 'anonymous', endpoint, int(now) // BUCKET_SECONDS * BUCKET_SECONDS)
+        with self._lock:
+            counters = self._pending.get(key)
+            if counters is None:
+                counters = self._pending[key] = [0, 0, 0, 0]
+            counters[0] += 1
+            counters[1] += 1 if estimated else 0
+            counters[2] += int(prompt_tokens or 0)
+            counters[3] += int(output_tokens or 0)
+        self._ensure_flusher()
+
+    def flush(self):
+        """Write pending counters to SQLite."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        rows = [key + tuple(counters) for key, counters in pending.items()]
+        try:
+            conn = self._connection()
+            with conn:
+                conn.executemany(_UPSERT, rows)
+        except sqlite3.Error as e:
+            print(f"Error flushing usage records: {str(e)}")
+            # Put the counters back so the next flush retries them
+            with self._lock:
+                for key, counters in pending.items():
+                    current = self._pending.setdefault(key, [0, 0, 0, 0])
+                    for i, value in enumerate(counters):
+                        current[i] += value
+
+    def tokens_today(self, user, endpoint=None, now=None):
+        """Total tokens used by ``user`` since midnight UTC (optionally for one endpoint)."""
+        now = now or time.time()
+        day_start = int(now) // DAY_SECONDS * DAY_SECONDS
+        total = 0
+        with self._lock:
+            for (pending_user, pending_endpoint, bucket), counters in self._pending.items():
+                if pending_user == user and bucket >= day_start and endpoint in (None, pending_endpoint):
+                    total += counters[2] + counters[3]
+        sql = 'SELECT COALESCE(SUM(prompt_tokens + output_tokens), 0) FROM usage WHERE user = ? AND bucket >= ?'
+        params = [user, day_start]
+        if endpoint is not None:
+            sql += ' AND endpoint = ?'
+            params.append(endpoint)
+        try:
+            total += self._connection().execute(sql, params).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error reading usage totals: {str(e)}")
+        return total
+
+    def quota_exceeded(self, user, endpoint):
+        """Return a description of the exceeded quota, or None."""
+        if self.daily_quota and self.tokens_today(user) >= self.daily_quota:
+            return f"daily token quota of {self.daily_quota} reached"
+        endpoint_quota = self.endpoint_quotas.get(endpoint)
+        if endpoint_quota and self.tokens_today(user, endpoint) >= endpoint_quota:
+            return f"daily token quota of {endpoint_quota} for {endpoint} reached"
+        return None
+
+    def query(self, user=None, endpoint=None, since=None, until=None, group_by=('user', 'endpoint')):
+        """Aggregate usage rows, grouped by any of user, endpoint, hour and day."""
+        self.flush()
+        group_by = [column for column in group_by if column in GROUP_COLUMNS]
+        selected = [f'{GROUP_COLUMNS[column]} AS {column}' for column in group_by]
+        sql = ('SELECT ' + ', '.join(selected + [
+            'SUM(requests)', 'SUM(estimated_requests)', 'SUM(prompt_tokens)', 'SUM(output_tokens)'
+        ]) + ' FROM usage WHERE 1 = 1')
+        params = []
+        for column, value in (('user', user), ('endpoint', endpoint)):
+            if value:
+                sql += f' AND {column} = ?'
+                params.append(value)
+        if since is not None:
+            sql += ' AND bucket >= ?'
+            params.append(int(since) // BUCKET_SECONDS * BUCKET_SECONDS)
+        if until is not None:
+            sql += ' AND bucket < ?'
+            params.append(int(until))
+        if group_by:
+            sql += ' GROUP BY ' + ', '.join(group_by)
+        sql += ' ORDER BY SUM(prompt_tokens + output_tokens) DESC'
+
+        results = []
+        for row in self._connection().execute(sql, params):
+            item = dict(zip(group_by, row[:len(group_by)]))
+            requests, estimated, prompt_tokens, output_tokens = row[len(group_by):]
+            item.update({
+                'requests': requests or 0,
+                'estimated_requests': estimated or 0,
+                'prompt_tokens': prompt_tokens or 0,
+                'output_tokens': output_tokens or 0,
+                'total_tokens': (prompt_tokens or 0) + (output_tokens or 0),
+                'cost': round(self.cost(prompt_tokens or 0, output_tokens or 0), 6),
+            })
+            results.append(item)
+        return results